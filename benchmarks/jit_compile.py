@@ -0,0 +1,56 @@
+"""
+Times one gradient step of Optimizer.get_grads with the eager tape and with jit_compile=True, on dimers and trimers of
+growing dimension.
+
+    python benchmarks/jit_compile.py [--steps 200]
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import numpy as np
+import tensorflow as tf
+
+from tet.basis import getDimension
+from tet.constants import system_constants
+from tet.Optimizer import Optimizer
+
+SYSTEMS = [
+    ('dimer', [-3, 3], 3), ('dimer', [-3, 3], 10), ('dimer', [-3, 3], 30),
+    ('trimer', [-3, 0, 3], 3), ('trimer', [-3, 0, 3], 6), ('trimer', [-3, 0, 3], 10),
+]
+
+
+def optimizer(omegas, max_N, jit_compile):
+    const = copy.deepcopy(system_constants)
+    const.update(omegas=omegas, chis=[0] * len(omegas), sites=len(omegas), max_N=max_N)
+    opt = Optimizer(
+        const=const, target_site=len(omegas) - 1, Print=False, train_sites=list(range(len(omegas))),
+        jit_compile=jit_compile
+    )
+    opt.vars = [tf.Variable(chi, dtype=tf.float64) for chi in np.linspace(-1.3, 2.1, len(omegas))]
+    return opt
+
+
+def msPerStep(opt, steps):
+    # The first call traces, and compiles with XLA
+    opt.get_grads()
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        opt.get_grads()
+    return 1e3 * (time.perf_counter() - t0) / steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=200)
+    args = parser.parse_args()
+
+    print('ms per gradient step (eager tape / XLA)')
+    for name, omegas, max_N in SYSTEMS:
+        eager, xla = (msPerStep(optimizer(omegas, max_N, jit_compile), args.steps) for jit_compile in (False, True))
+        print(f'{name:<6} N={max_N:<2} dim={getDimension(max_N, len(omegas)):<3} {eager:6.2f} / {xla:6.2f}', flush=True)
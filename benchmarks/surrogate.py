@@ -0,0 +1,48 @@
+"""
+Compares the initial guesses of the 'surrogate' method with the ones of 'bins' on a trimer: the best loss of the
+acceptor that solver_mp reaches in 6 iterations of 27 optimizers, for a few seeds. The optimizers train for too few
+epochs to reach TET from the first grid, so the later iterations decide.
+
+    python benchmarks/surrogate.py [--seeds 10] [--max_N 3 4 5] [--epochs 100] [--cpus 1]
+"""
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from tet.constants import system_constants
+from tet.solver_mp import solver_mp
+
+
+def run(method, max_N, seed, cpus, epochs):
+    const = copy.deepcopy(system_constants)
+    const.update(max_N=max_N, omegas=[-3, 0, 3], chis=[0, 0, 0], sites=3)
+    np.random.seed(seed)
+    with tempfile.TemporaryDirectory() as data_path:
+        result = solver_mp(
+            {'x0lims': [-10, 10], 'x1lims': [-10, 10], 'x2lims': [-10, 10]}, const, grid=3, iterations=6,
+            method=method, epochs_bins=epochs, target_site=2, data_path=data_path, cpu_count=cpus, backend='numpy'
+        )
+    return float(result['min_n'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seeds', type=int, default=10)
+    parser.add_argument('--cpus', type=int, default=1)
+    parser.add_argument('--max_N', type=int, nargs='+', default=[3, 4, 5])
+    parser.add_argument('--epochs', type=int, default=100)
+    args = parser.parse_args()
+
+    for max_N in args.max_N:
+        for method in ('bins', 'surrogate'):
+            t0 = time.time()
+            losses = [run(method, max_N, seed, args.cpus, args.epochs) for seed in range(args.seeds)]
+            print(f'N={max_N} {method:>9}: ' + ', '.join(f'{loss:.3f}' for loss in losses) +
+                  f' | mean {np.mean(losses):.3f} | {time.time() - t0:.0f} s', flush=True)
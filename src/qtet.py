@@ -4,25 +4,53 @@ import pathlib
 from os import makedirs
 from datetime import datetime
 import argparse
+import json
 import multiprocessing as mp
 
 import tet.constants
-from tet.solver_mp import solver_mp
 from tet.data_process import createDir
 
 def run():
 
     parser = argparse.ArgumentParser(description="python3 array_solver.py")
-    parser.add_argument('-p', '--data_path', type=pathlib.Path,
-                        required=True, help='Path to create data dir.')
+    paths = parser.add_mutually_exclusive_group(required=True)
+    paths.add_argument('-p', '--data_path', type=pathlib.Path,
+                       help='Path to create data dir.')
+    paths.add_argument('-r', '--resume', type=pathlib.Path, metavar='DATA_DIR',
+                       help='Continue the interrupted run or scan of a data dir created by a previous call, with its parameters. Only the --ncpus option, and --backend for a scan, apply.')
     parser.add_argument('-c', '--constants', type=pathlib.Path,
                         required=False, help='Path to constants json file. If not provided then the application will use the default parameters provided by the tet package.')
     parser.add_argument('-n', '--ncpus', default=mp.cpu_count(), type=int, required=False,
                         help='Number of cpus to use in the process pool. Default option is to use all available cpus.')
     parser.add_argument('-m', '--method', default='bins', choices=tet.constants.solver_params['methods'], type=str,
                         required=False, help='Method of optimization to use. Default option is "bins".')
+    parser.add_argument('-b', '--batched', action='store_true', required=False,
+                        help='Train all the initial guesses of an iteration together in one process, instead of one optimizer per guess in the process pool.')
+    parser.add_argument('--backend', default='tensorflow', choices=tet.constants.backends, type=str, required=False,
+                        help='Implementation of the loss function and of the optimizers. The numpy backend only uses NumPy and SciPy. Default option is "tensorflow".')
+
+    parser.add_argument('--search', default='full', choices=tet.constants.searches, type=str, required=False,
+                        help='How to spend the epochs of every iteration. "halving" trains all the initial guesses briefly and keeps training only the best ones (successive halving). Default option is "full".')
+    parser.add_argument('--eta', default=3, type=int, required=False,
+                        help='Reduction factor of the "halving" search, every round keeps the best 1/eta of the optimizers. Must be at least 2. Default option is 3.')
+    parser.add_argument('--rungs', default=3, type=int, required=False,
+                        help='Number of rounds of the "halving" search. Must be at least 1. Default option is 3.')
+    parser.add_argument('--time_search', default='grid', choices=tet.constants.time_searches, type=str, required=False,
+                        help='How the loss function finds the extremum of the average occupation in time. "refine" refines the best points of a coarse grid with Newton steps, for an accuracy that does not depend on the timesteps. Needs the tensorflow backend. Default option is "grid".')
+    parser.add_argument('--samples', type=int, required=False, metavar='N',
+                        help='Number of initial guesses per iteration of the "sobol", "lhs", "stratified" and "surrogate" methods. Default option is Npoints to the power of the number of trainable parameters.')
+    parser.add_argument('-s', '--scan', type=int, required=False, metavar='N',
+                        help='Instead of optimizing, evaluate the loss function on a grid of N points per trainable parameter within the limits, and save it in landscape.npy.')
 
     cmd_args = parser.parse_args()
+    if cmd_args.eta < 2:
+        parser.error('argument --eta: must be at least 2')
+    if cmd_args.rungs < 1:
+        parser.error('argument --rungs: must be at least 1')
+
+    if cmd_args.resume is not None:
+        return resume(cmd_args.resume, cmd_args.ncpus, cmd_args.backend)
+
     data_path = cmd_args.data_path.joinpath(
         f'data_{datetime.now().strftime("%Y_%h_%d_%T")}')
 
@@ -44,6 +72,9 @@ def run():
         key: value for key, value in tet.constants.solver_params.items() if key != 'methods'
     }
     temporary_solver_params_dict['method'] = cmd_args.method
+    temporary_solver_params_dict['time_search'] = cmd_args.time_search
+    if cmd_args.samples is not None:
+        temporary_solver_params_dict['samples'] = cmd_args.samples
 
     if cmd_args.constants != None:
         if not pathlib.Path.exists(cmd_args.constants):
@@ -76,19 +107,113 @@ def run():
     keys = [f'x{k}lims' for k in tet.constants.TensorflowParams['train_sites']]
     trainable_vars_lims = dict(zip(keys, lims))
 
-    result = solver_mp(
-        const=tet.constants.system_constants,
-        trainable_vars_limits=trainable_vars_lims,
-        lr=tet.constants.TensorflowParams['lr'],
-        beta_1=tet.constants.TensorflowParams['beta_1'],
-        amsgrad=tet.constants.TensorflowParams['amsgrad'],
-        target_site=tet.constants.solver_params['target'],
-        data_path=data_path,
-        method=cmd_args.method,
-        write_data=True,
-        cpu_count=cmd_args.ncpus
+    # ! Imported here so that --help and argument errors do not wait for TensorFlow
+    if cmd_args.scan is not None:
+        from tet.landscape import scan
+        scan_result = scan(
+            trainable_vars_limits=trainable_vars_lims,
+            const=tet.constants.system_constants,
+            grid=cmd_args.scan,
+            target_site=tet.constants.solver_params['target'],
+            data_path=data_path,
+            cpu_count=cmd_args.ncpus,
+            backend=cmd_args.backend
+        )
+        print(f"Minimum of the landscape: loss={scan_result['min_n']}, chis = {scan_result['chis']}")
+        result = {**tet.constants.system_constants, 'chis': scan_result['chis'], 'min_n': scan_result['min_n']}
+        temporary_solver_params_dict['method'] = 'scan'
+        temporary_solver_params_dict['Npoints'] = cmd_args.scan
+    else:
+        from tet.solver_mp import solver_mp
+        result = solver_mp(
+            const=tet.constants.system_constants,
+            trainable_vars_limits=trainable_vars_lims,
+            lr=tet.constants.TensorflowParams['lr'],
+            beta_1=tet.constants.TensorflowParams['beta_1'],
+            amsgrad=tet.constants.TensorflowParams['amsgrad'],
+            target_site=tet.constants.solver_params['target'],
+            data_path=data_path,
+            method=cmd_args.method,
+            write_data=True,
+            cpu_count=cmd_args.ncpus,
+            batched=cmd_args.batched,
+            backend=cmd_args.backend,
+            search=cmd_args.search,
+            eta=cmd_args.eta,
+            rungs=cmd_args.rungs,
+            samples=cmd_args.samples,
+            time_search=cmd_args.time_search
+        )
+
+    final_parameters = {
+        'constants': result,
+        'tensorflow_params': temporary_tensorflow_params_dict,
+        'solver_params': temporary_solver_params_dict
+    }
+
+    tet.constants.dumpConstants(
+        dictionary=final_parameters, path=data_path, name='parameters'
     )
 
+def resume(data_path, ncpus, backend='tensorflow'):
+    """
+    Continues the run of solver_mp or the scan of a data directory created by qtet, from the checkpoint of the run or
+    the completed tiles of the scan.
+
+    Args:
+        data_path (pathlib.Path): The data directory.
+        ncpus (int): Number of cpus to use in the process pool.
+        backend (str, optional): Implementation of the loss function of a scan. Defaults to 'tensorflow'.
+    """
+    from tet.data_process import CHECKPOINT_FILE, readCheckpoint
+
+    temporary_tensorflow_params_dict = {
+        key: value for key, value in tet.constants.TensorflowParams.items() if key != 'DTYPE'
+    }
+    temporary_solver_params_dict = {
+        key: value for key, value in tet.constants.solver_params.items() if key != 'methods'
+    }
+
+    if pathlib.Path.exists(data_path.joinpath(CHECKPOINT_FILE)):
+        from tet.solver_mp import solver_mp
+        state = readCheckpoint(data_path)
+        arguments = state['arguments']
+        result = solver_mp(
+            **arguments, iterations=state['iterations'], data_path=data_path, cpu_count=ncpus, resume=True
+        )
+        temporary_tensorflow_params_dict.update(
+            lr=arguments['lr'], beta_1=arguments['beta_1'], amsgrad=arguments['amsgrad']
+        )
+        temporary_solver_params_dict.update(
+            method=arguments['method'], target=arguments['target_site'], Npoints=arguments['grid'],
+            epochs_grid=arguments['epochs_grid'], epochs_bins=arguments['epochs_bins']
+        )
+        if arguments['samples'] is not None:
+            temporary_solver_params_dict['samples'] = arguments['samples']
+
+    else:
+        from tet.landscape import META_FILE, scan
+        if not pathlib.Path.exists(data_path.joinpath(META_FILE)):
+            raise OSError(f'{data_path} holds neither a solver checkpoint nor a scan.')
+        with open(data_path.joinpath(META_FILE), 'r') as f:
+            meta = json.load(f)
+        const = {**tet.constants.system_constants, **meta['const']}
+        scan_result = scan(
+            trainable_vars_limits={
+                f'x{site}lims': [axis[0], axis[-1]] for site, axis in zip(meta['train_sites'], meta['axes'])
+            },
+            const=const,
+            grid=[len(axis) for axis in meta['axes']],
+            target_site=meta['target_site'],
+            data_path=data_path,
+            cpu_count=ncpus,
+            tile_size=meta['tile_size'],
+            backend=backend
+        )
+        print(f"Minimum of the landscape: loss={scan_result['min_n']}, chis = {scan_result['chis']}")
+        result = {**const, 'chis': scan_result['chis'], 'min_n': scan_result['min_n']}
+        temporary_solver_params_dict.update(method='scan', Npoints=[len(axis) for axis in meta['axes']])
+
     final_parameters = {
         'constants': result,
         'tensorflow_params': temporary_tensorflow_params_dict,
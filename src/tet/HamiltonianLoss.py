@@ -1,12 +1,108 @@
 import os
+import json
+import hashlib
+import tempfile
+import uuid
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
 import tensorflow as tf
-from math import factorial
 import numpy as np
 
-from .constants import TensorflowParams
+from .constants import TensorflowParams, time_searches
+from .basis import getBasis, getDimension, getRankTable, getHoppingArrays, getConstantOperators
+from .numerics import DEGENERACY_TOL, TRIDIAGONAL_MIN_DIM
+
+try:
+    from scipy.linalg import eigh_tridiagonal
+except ImportError:
+    eigh_tridiagonal = None
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '1'
-DTYPE = TensorflowParams['DTYPE']
+DTYPE = tf.as_dtype(TensorflowParams['DTYPE'])
+# Complex dtype with the same precision as DTYPE, used for the time evolution
+CDTYPE = tf.complex128 if DTYPE == tf.float64 else tf.complex64
+
+# Chi independent operators, shared by every Loss with the same (max_N, sites, omegas, coupling)
+_operator_cache = {}
+_operator_names = (
+    'states', 'rank_table', 'hop_indices', 'hop_values', 'omega_diagonal',
+    'offdiagonal', 'chi_diagonals', 'init_idx'
+)
+# Handles and shared memory blocks of the operators published by this process, and blocks of other processes attached
+# to by this process
+_published_operators = {}
+_attached_blocks = []
+
+# Available engines for the computation of the time evolution
+engines = ['dense', 'tridiagonal', 'chebyshev']
+# Above this dimension the Hamiltonian is kept sparse and only the initial state is propagated
+CHEBYSHEV_MIN_DIM = 3000
+# Relative accuracy of the truncated Chebyshev expansion of the propagator
+CHEBYSHEV_TOL = 1e-14
+
+# Eigenstates with a smaller overlap with the initial state do not contribute frequencies to the search
+SPECTRAL_WEIGHT_TOL = 1e-12
+# Coarse grid points per the shortest period of the oscillations, and upper limit of the coarse grid size
+COARSE_SAMPLING = 8
+MAX_COARSE_POINTS = 4096
+# Number of local maxima of the coarse grid that are refined, and Newton iterations per maximum
+REFINE_CANDIDATES = 8
+NEWTON_STEPS = 8
+
+
+def _eighTridiagonal(diagonal, offdiagonal):
+    # Diagonalize every symmetric tridiagonal matrix of a batch with LAPACK
+    shape = diagonal.shape
+    diagonals = diagonal.reshape(-1, shape[-1])
+    eigvals = np.empty_like(diagonals)
+    eigvecs = np.empty(diagonals.shape + (shape[-1],), dtype=diagonal.dtype)
+    for i, d in enumerate(diagonals):
+        eigvals[i], eigvecs[i] = eigh_tridiagonal(d, offdiagonal)
+    return eigvals.reshape(shape), eigvecs.reshape(shape + (shape[-1],))
+
+
+def _refineEigh(h, eigvecs):
+    # ! One Newton step on the eigenvectors of the symmetric h: with A = V^T H V, V (I + E) where
+    # E_ij = A_ij / (A_jj - A_ii) is antisymmetric, so the error of the eigenvectors squares and they stay orthonormal
+    # to that order. Degenerate pairs are left as they are, as in the analytic gradient
+    a = tf.matmul(eigvecs, tf.matmul(h, eigvecs), transpose_a=True)
+    eigvals = tf.linalg.diag_part(a)
+    delta = tf.expand_dims(eigvals, -2) - tf.expand_dims(eigvals, -1)
+    tol = DEGENERACY_TOL * tf.maximum(tf.reduce_max(tf.abs(eigvals), axis=-1, keepdims=True), 1.)
+    delta = tf.where(tf.abs(delta) <= tf.expand_dims(tol, -1), tf.zeros_like(delta), delta)
+    return eigvals, eigvecs + tf.matmul(eigvecs, tf.math.divide_no_nan(a, delta))
+
+
+def _operatorKey(const):
+    return const['max_N'], const['sites'], tuple(const['omegas']), const['coupling']
+
+
+def _chebyshevCoefficients(x):
+    # Bessel functions J_n(x) of the expansion exp(-ix cos(theta)) = sum_n (2-delta_n0) (-i)^n J_n(x) T_n(cos(theta)),
+    # truncated where they drop below CHEBYSHEV_TOL. Computed with Miller's backward recurrence.
+    x = float(x)
+    if x < 1e-12:
+        return np.ones(1, dtype=np.float64)
+    terms = int(np.ceil(x + 15 * (x / 2) ** (1 / 3) + 15))
+    start = terms + 2 * int(np.sqrt(40 * terms))
+    j = np.zeros(start + 2)
+    j[start] = 1e-300
+    for n in range(start, 0, -1):
+        j[n - 1] = 2 * n / x * j[n] - j[n + 1]
+        # Rescale to avoid overflow
+        if abs(j[n - 1]) > 1e250:
+            j[n - 1:] *= 1e-250
+    j /= j[0] + 2 * np.sum(j[2::2])
+    j = j[:terms + 1]
+    significant = np.nonzero(np.abs(j) > CHEBYSHEV_TOL)[0]
+    return j[:significant[-1] + 1]
+
+
+def _toDtype(value):
+    if tf.is_tensor(value) or isinstance(value, tf.Variable):
+        return tf.cast(value, dtype=DTYPE)
+    return tf.convert_to_tensor(value, dtype=DTYPE)
 
 
 class Loss:
@@ -15,10 +111,26 @@ class Loss:
 
     Args:
         const (dict):  Refer to the system_constants dictionary in constants.py.
+        analytic_grad (bool, optional): If True, differentiate the loss with the closed form perturbative gradient
+        instead of backpropagating through tf.linalg.eigh. Defaults to True.
+        engine (str, optional): Method of computing the time evolution, one of 'dense', 'tridiagonal' or 'chebyshev'.
+        The 'tridiagonal' engine is only available for dimers, whose Hamiltonian is tridiagonal in the Fock basis, and
+        needs scipy. The 'chebyshev' engine keeps the Hamiltonian sparse and propagates the initial state without
+        diagonalizing. Defaults to 'chebyshev' when dim > CHEBYSHEV_MIN_DIM, 'tridiagonal' for dimers with
+        dim > TRIDIAGONAL_MIN_DIM and 'dense' otherwise.
+        time_search (str, optional): Method of finding the extremum of the average occupation in time, one of 'grid'
+        or 'refine'. 'grid' uses the timesteps grid. 'refine' samples a coarse grid whose resolution follows the
+        spread of the spectrum, and refines its best points with Newton steps on the analytic form of <n(t)>.
+        'refine' is not available for the 'chebyshev' engine. Defaults to 'grid'.
+        refine_eigh (bool, optional): If True, refine the eigenvectors of the 'dense' engine with one Newton step. The
+        eigensolver of XLA stops at a looser tolerance than LAPACK, and leaves errors of about 1e-7 in the eigenvectors
+        of Hamiltonians of dimension 10 and more. Defaults to False.
     """
 
-    def __init__(self, const):
+    def __init__(self, const, analytic_grad=True, engine=None, time_search='grid', refine_eigh=False):
         # Import the parameters of the problem
+        self.analytic_grad = analytic_grad
+        self.refine_eigh = refine_eigh
         self.bcoeffs = None
         self.ccoeffs = None
         self.initial_state = None
@@ -36,18 +148,108 @@ class Loss:
         self.targetState = const['sites'] - 1
 
         # Define some other helpful variables
-        self.dim = int(factorial(const['max_N'] + const['sites'] - 1) / (
-                factorial(const['max_N']) * factorial(const['sites'] - 1)))
-
-        # Initialize states array
-        self.states = np.zeros((self.dim, self.sites))
-        self.T = np.zeros(self.dim)
-        self.sorted_indices = np.empty(self.T.shape)
-        self.derive()
-        self.getHashArray()
+        self.dim = getDimension(const['max_N'], const['sites'])
+
+        # Choose how to compute the time evolution
+        if engine is None:
+            if self.dim > CHEBYSHEV_MIN_DIM:
+                engine = 'chebyshev'
+            elif self.sites == 2 and self.dim > TRIDIAGONAL_MIN_DIM and eigh_tridiagonal is not None:
+                engine = 'tridiagonal'
+            else:
+                engine = 'dense'
+        if engine not in engines:
+            raise ValueError(f'Provided engine not in list of supported engines {engines}')
+        if engine == 'tridiagonal' and self.sites != 2:
+            raise ValueError('The tridiagonal engine is only available for dimers.')
+        self.engine = engine
+
+        if time_search not in time_searches:
+            raise ValueError(f'Provided time search not in list of supported methods {time_searches}')
+        if time_search == 'refine' and engine == 'chebyshev':
+            raise ValueError('The refine time search needs the eigenvalues, which the chebyshev engine does not compute.')
+        self.time_search = time_search
+
+        # Everything that determines the value of the loss apart from the chis and the target site
+        self.system_key = (
+            const['max_N'], const['sites'], tuple(const['omegas']), const['coupling'], const['max_t'],
+            const['timesteps'], engine, time_search, refine_eigh
+        )
+
+        # Reuse the basis and the chi independent part of the Hamiltonian if they have already been computed
+        key = _operatorKey(const)
+        if key not in _operator_cache:
+            self.derive()
+            self.rank_table = getRankTable(self.max_N_np, self.sites)
+            self.getHoppingArrays()
+            self.getConstantOperator()
+            _operator_cache[key] = {name: getattr(self, name) for name in _operator_names}
+        else:
+            for name, value in _operator_cache[key].items():
+                setattr(self, name, value)
+
+        # Tensors used in every evaluation of the Hamiltonian
+        self._h_constant = None
+        if self.engine != 'chebyshev':
+            if 'h_constant' not in _operator_cache[key]:
+                self.getDenseOperator()
+                _operator_cache[key]['h_constant'] = self.h_constant
+            self._h_constant = tf.constant(self.h_constant, dtype=DTYPE)
+        self._chi_diagonals = tf.constant(self.chi_diagonals, dtype=DTYPE)
+        self.initial_state = tf.one_hot(self.init_idx, self.dim, dtype=DTYPE)
+        self._states = tf.constant(self.states, dtype=DTYPE)
+        self.t_span = tf.constant(np.linspace(0, tf.get_static_value(self.max_t), self.NpointsT), dtype=DTYPE)
 
     def __call__(self, chis, site=0, single_value=True) -> tf.Tensor:
         self.chis = chis
+        self.setTarget(site)
+        return self.loss(single_value)
+
+    def batch_loss(self, chis, site=0, single_value=True) -> tf.Tensor:
+        """
+        Computes the loss function for a batch of nonlinearity parameters, using a single batched diagonalization.
+
+        Args:
+            chis (tf.Tensor): Tensor of shape [B, sites] with one combination of nonlinearity parameters per row.
+            site (int, optional): The target site. Defaults to 0.
+            single_value (bool, optional): If False, return the average occupation of the target site at every time step. Defaults to True.
+
+        Returns:
+            tf.Tensor: The B values of the loss function, or a [B, timesteps] tensor if single_value is False.
+        """
+        self.chis = tf.convert_to_tensor(chis, dtype=DTYPE)
+        self.setTarget(site)
+        return self.loss(single_value)
+
+    def evaluate(self, chis, site=0, cache=None) -> float:
+        """
+        Computes the value of the loss function for one combination of nonlinearity parameters, without gradients.
+
+        Args:
+            chis (list): The nonlinearity parameters.
+            site (int, optional): The target site. Defaults to 0.
+            cache (LossCache, optional): Cache to look the evaluation up in and to store it to. Defaults to None.
+
+        Returns:
+            float: The value of the loss function.
+        """
+        if cache is not None:
+            key = cache.key(self.system_key, chis, site, kind='loss')
+            entry = cache.get(key, fields=('loss',))
+            if entry is not None:
+                return float(entry['loss'])
+
+        loss = self(tf.constant(chis, dtype=DTYPE), site=site)
+
+        if cache is not None:
+            entry = {'loss': loss.numpy()}
+            if self.engine != 'chebyshev':
+                entry['eigvals'] = self.eigvals.numpy()
+                entry['ccoeffs'] = self.ccoeffs.numpy()
+            cache.put(key, entry)
+        return float(loss)
+
+    def setTarget(self, site):
         try:
             if type(site) != int:
                 raise ValueError
@@ -57,177 +259,665 @@ class Loss:
                 self.targetState = int(site[-1])
             else:
                 raise ValueError("Invalid type for site variable. Must be int.")
-        return self.loss(single_value)
 
     def derive(self):
         """
-        A function that generates all the possible configurations of distributing N indistinguishable bosons in f distinguishable sites.
-        """
-
-        # Initially, all the bosons belong to the donor site.
-        self.states[0, 0] = tf.get_static_value(self.max_N)
-
-        v, k = 0, 0
-        while v < self.dim - 1:
-
-            for i in range(k):
-                self.states[v + 1, i] = self.states[v, i]
-
-            self.states[v + 1, k] = self.states[v, k] - 1
-            s = 0
-            for i in range(k + 1):
-                s += self.states[(v + 1), i]
-            self.states[v + 1, k + 1] = tf.get_static_value(self.max_N) - s
-
-            for j in range(k + 2, self.sites):
-                self.states[v + 1, j] = 0
-
-            _k = 0
-            condition = True
-            while _k < self.sites - 1:
-                _i = _k + 1
-                if _i >= self.sites - 1:
-                    _i = self.sites - 1
-                    if self.states[v + 1, _i] != 0:
-                        condition = False
-                    else:
-                        condition = True
-                else:
-                    while _i < self.sites - 1:
-                        if self.states[v + 1, _i] != 0:
-                            condition = False
-                            break
-                        else:
-                            condition = True
-                        _i += 1
-
-                if not condition:
-                    _k += 1
-                else:
-                    break
-            if condition:
-                k = _k
-            v += 1
-
-    def getHash(self, state):
-        s = 0
-        for i in range(self.sites):
-            s += np.sqrt(100 * (i + 1) + 3) * state[i]
-        return s
-
-    def getHashArray(self):
-        for i in range(self.dim):
-            self.T[i] = self.getHash(self.states[i])
-        self.sorted_indices = np.argsort(self.T)
-
-    # Deduce the Hnm element of the Hamiltonian
-    def ConstructElement(self, n, m):
-
-        # * First Term. Contributions due to the Kronecker(n,m) elements
-        term1 = tf.constant(0, dtype=DTYPE)
-        # * Second Term. Various contributions
-        term2a, term2b = tf.constant(0, dtype=DTYPE), tf.constant(0, dtype=DTYPE)
-
-        if n == m:
-            for k in range(self.sites):
-                term1 += self.omegas[k] * self.states[m, k] + \
-                         0.5 * self.chis[k] * (self.states[m, k]) ** 2
-        else:
-            for k in range(self.sites - 1):
-                # Find the number of bosons
-                nk = self.states[m, k]
-                nkplusone = self.states[m, k + 1]
-                _maxN = tf.get_static_value(self.max_N)
-
-                # Term 2a/Important check
-                if (nkplusone != _maxN) and (nk != 0):
-                    m1_tilda_state = self.states[m].copy()
-                    m1_tilda_state[k] = nk - 1
-                    m1_tilda_state[k + 1] = nkplusone + 1
-                    state_hash = self.getHash(m1_tilda_state)
-                    _idx = self.sorted_indices[np.searchsorted(self.T, state_hash, sorter=self.sorted_indices)]
-
-                    if _idx == n:
-                        term2a -= self.coupling_lambda * np.sqrt((nkplusone + 1) * nk)
-
-                # Term 2b/Important check
-                if (nkplusone != 0) and (nk != _maxN):
-                    # Find the new state/vol2
-                    m2_tilda_state = self.states[m].copy()
-                    m2_tilda_state[k] = nk + 1
-                    m2_tilda_state[k + 1] = nkplusone - 1
-                    state_hash = self.getHash(m2_tilda_state)
-                    _idx = self.sorted_indices[np.searchsorted(self.T, state_hash, sorter=self.sorted_indices)]
-
-                    if _idx == n:
-                        term2b -= self.coupling_lambda * np.sqrt(nkplusone * (nk + 1))
-
-        return term1 + term2a + term2b
+        A function that loads all the possible configurations of distributing N indistinguishable bosons in f distinguishable sites.
+        """
+        self.states = getBasis(self.max_N_np, self.sites)
+
+    def getHoppingArrays(self):
+        """
+        Builds the connectivity of the coupling term of the Hamiltonian once, in coordinate (COO) format.
+        Refer to getHoppingArrays in basis.py.
+        """
+        self.hop_indices, self.hop_values = getHoppingArrays(
+            self.states, self.rank_table, tf.get_static_value(self.coupling_lambda))
+
+    def getConstantOperator(self):
+        """
+        Precomputes the diagonal of the part of the Hamiltonian that does not depend on the nonlinearity parameters,
+        along with the per-site diagonals 0.5*n_k^2 that multiply each chi_k and the index of the initial state
+        (all bosons on the donor site). Refer to getConstantOperators in basis.py.
+        """
+        self.omega_diagonal, self.chi_diagonals, self.offdiagonal, self.init_idx = getConstantOperators(
+            self.states, self.rank_table, self.hop_indices, self.hop_values, tf.get_static_value(self.omegas))
+
+    def getDenseOperator(self):
+        """
+        Builds the dense matrix of the chi independent part of the Hamiltonian, H_omega + H_coupling.
+        """
+        self.h_constant = np.zeros((self.dim, self.dim))
+        self.h_constant[self.hop_indices[:, 0], self.hop_indices[:, 1]] = self.hop_values
+        self.h_constant[np.diag_indices(self.dim)] = self.omega_diagonal
+
+    # ! Python numbers are converted straight to DTYPE, tf.cast would first make them float32 constants
+    def _chiVector(self):
+        if isinstance(self.chis, (list, tuple)):
+            return tf.stack([_toDtype(chi) for chi in self.chis])
+        return _toDtype(self.chis)
 
     # ! Constructing the Hamiltonian operator.
-    def createHamiltonian(self):
+    def createHamiltonian(self, sparse=False):
+        """
+        Assembles the Hamiltonian for the current nonlinearity parameters by adding the chi dependent
+        diagonal to the cached constant operator.
+
+        Args:
+            sparse (bool, optional): If True, return a tf.sparse.SparseTensor instead of a dense matrix. Only supported
+            for a single combination of chis. Defaults to False.
 
-        h = tf.TensorArray(dtype=DTYPE, size=self.dim * self.dim)
-        for n in range(self.dim):
-            for m in range(self.dim):
-                h = h.write(n * self.dim + m, self.ConstructElement(n, m))
-        h = h.stack()
-        h = tf.reshape(h, shape=[self.dim, self.dim])
-        return h
+        Returns:
+            tf.Tensor: The dim x dim Hamiltonian, or a [B, dim, dim] tensor for a batch of chis, differentiable with
+            respect to the chis.
+        """
+        chi_diagonal = tf.linalg.matvec(self._chi_diagonals, self._chiVector())
+
+        if sparse:
+            diag_indices = np.stack([np.arange(self.dim), np.arange(self.dim)], axis=1)
+            h = tf.sparse.SparseTensor(
+                indices=np.concatenate([diag_indices, self.hop_indices]),
+                values=tf.concat([
+                    tf.constant(self.omega_diagonal, dtype=DTYPE) + chi_diagonal,
+                    tf.constant(self.hop_values, dtype=DTYPE)
+                ], axis=0),
+                dense_shape=[self.dim, self.dim]
+            )
+            return tf.sparse.reorder(h)
+
+        if self._h_constant is None:
+            return tf.sparse.to_dense(self.createHamiltonian(sparse=True))
+        return self._h_constant + tf.linalg.diag(chi_diagonal)
 
     # ! Given a set of nonlinearity parameters, compute the coefficients needed according to PRL.
     def setCoefs(self):
-        problem_hamiltonian = self.createHamiltonian()
+        # The LAPACK tridiagonal solver is not differentiable, so it relies on the analytic gradient
+        if self.engine == 'tridiagonal' and self.analytic_grad and eigh_tridiagonal is not None:
+            diagonal = tf.constant(self.omega_diagonal, dtype=DTYPE) + tf.linalg.matvec(
+                self._chi_diagonals, self._chiVector())
+            eigvals, eigvecs = tf.numpy_function(
+                _eighTridiagonal, [diagonal, tf.constant(self.offdiagonal, dtype=DTYPE)], [DTYPE, DTYPE],
+                stateful=False
+            )
+            eigvals = tf.ensure_shape(eigvals, diagonal.shape)
+            eigvecs = tf.ensure_shape(eigvecs, diagonal.shape + [self.dim])
+        else:
+            h = self.createHamiltonian()
+            eigvals, eigvecs = tf.linalg.eigh(h)
+            if self.refine_eigh:
+                eigvals, eigvecs = _refineEigh(h, eigvecs)
 
-        eigvals, eigvecs = tf.linalg.eigh(problem_hamiltonian)
         self.eigvals = tf.cast(eigvals, dtype=DTYPE)
         eigvecs = tf.cast(eigvecs, dtype=DTYPE)
 
-        self.initial_state = np.zeros(self.sites)
-        self.initial_state[0] = tf.get_static_value(self.max_N)
-        state_hash = self.getHash(self.initial_state)
-        init_idx = np.searchsorted(self.T, state_hash, sorter=self.sorted_indices)
-        self.initial_state = np.identity(self.dim)[init_idx]
-        self.initial_state = tf.convert_to_tensor(self.initial_state, dtype=DTYPE)
-
-        coeff_c = tf.TensorArray(DTYPE, size=self.dim)
-        for i in range(self.dim):
-            coeff_c = coeff_c.write(i, tf.tensordot(tf.cast(eigvecs[:, i], dtype=DTYPE),
-                                                    tf.cast(self.initial_state, dtype=DTYPE), 1))
-
-        coeff_c = coeff_c.stack()
+        # Overlaps of the eigenvectors with the initial state
+        coeff_c = eigvecs[..., self.init_idx, :]
 
         self.ccoeffs = coeff_c
         self.bcoeffs = eigvecs
 
-    # ! Computing the loss function given the time step .
-    def _computeAverageCalculation(self, t):
-        sum_j = tf.TensorArray(dtype=tf.complex64, size=self.dim)
-        for j in range(self.dim):
-            c = tf.cast(self.ccoeffs, dtype=tf.complex64)
-            b = tf.cast(self.bcoeffs, dtype=tf.complex64)
-            e = tf.cast(self.eigvals, dtype=tf.complex64)
-            _t = tf.cast(t, dtype=tf.complex64)
-            sum_i = tf.reduce_sum(c * b[j, :] * tf.exp(tf.complex(0., -1.) * e * _t))
-            sum_k = tf.reduce_sum(tf.math.conj(c) * tf.math.conj(b[j, :]) * tf.exp(tf.complex(0., 1.) * e * _t) * sum_i)
-            sum_j = sum_j.write(j, value=sum_k * self.states[j][self.targetState])
-        sum_j = tf.reduce_sum(sum_j.stack())
-        return tf.cast(tf.math.real(sum_j), dtype=DTYPE)
+    # ! Computing the loss function for every time step at once.
+    def _computeAverageCalculation(self, t_span):
+        """
+        Computes the average number of bosons of the target site for all the times in t_span, using
+        <n(t)> = sum_j n_j |sum_i c_i b_ji exp(-i E_i t)|^2.
+
+        Args:
+            t_span (tf.Tensor): 1D tensor of times.
+
+        Returns:
+            tf.Tensor: The average occupation of the target site at each time.
+        """
+        # Phase matrix exp(-iEt) of shape [..., T, dim]
+        phases = tf.expand_dims(t_span, -1) * tf.expand_dims(self.eigvals, -2)
+        evolution = tf.exp(tf.complex(tf.zeros_like(phases), -phases)) * tf.cast(
+            tf.expand_dims(self.ccoeffs, -2), dtype=CDTYPE)
+
+        # Amplitudes of every basis state at every time
+        amplitudes = tf.matmul(evolution, tf.cast(self.bcoeffs, dtype=CDTYPE), transpose_b=True)
+        probabilities = tf.math.real(amplitudes * tf.math.conj(amplitudes))
+        return tf.linalg.matvec(probabilities, self._states[:, self.targetState])
+
+    # ! Time evolution of the initial state with the sparse Hamiltonian.
+    def _evolveChebyshev(self):
+        """
+        Computes the average occupation of the target site on the time grid by propagating the initial state from
+        one time step to the next with a Chebyshev expansion of exp(-iH dt). Only sparse matrix-vector products
+        with H are needed, so the cost is proportional to the number of nonzero elements of H and the spectral
+        width of H times dt, instead of dim^3. The spectrum is bounded with the Gershgorin circles.
+
+        The result is differentiable with respect to the chis. The gradient of each step is computed by running
+        the Chebyshev recurrence backwards, which is possible because it can be inverted, so the memory needed does
+        not grow with the number of terms of the expansion.
+
+        Returns:
+            tf.Tensor: The average occupation of the target site at every time step, of shape [..., timesteps].
+        """
+        chis = self._chiVector()
+        batch_shape = tf.shape(chis)[:-1]
+
+        # Diagonal of H for every combination of chis, as columns of shape [dim, B]
+        chi_matrix = tf.reshape(chis, [-1, self.sites])
+        diagonal = tf.expand_dims(tf.constant(self.omega_diagonal, dtype=DTYPE), -1) + tf.matmul(
+            self._chi_diagonals, chi_matrix, transpose_b=True)
+        hopping = tf.sparse.reorder(tf.sparse.SparseTensor(
+            indices=self.hop_indices, values=tf.constant(self.hop_values, dtype=DTYPE),
+            dense_shape=[self.dim, self.dim]
+        ))
+
+        # Map the spectrum of every H in the batch to [-1, 1]
+        radius = tf.constant(
+            np.bincount(self.hop_indices[:, 0], weights=np.abs(self.hop_values), minlength=self.dim)[:, None],
+            dtype=DTYPE
+        )
+        lower = tf.stop_gradient(tf.reduce_min(diagonal - radius))
+        upper = tf.stop_gradient(tf.reduce_max(diagonal + radius))
+        half_width = 0.5 * (upper - lower) * 1.01 + 1e-12
+        center = 0.5 * (upper + lower)
+
+        dt = (self.t_span[-1] - self.t_span[0]) / max(self.NpointsT - 1, 1)
+        coeffs = tf.numpy_function(_chebyshevCoefficients, [half_width * dt], DTYPE, stateful=False)
+        coeffs = tf.ensure_shape(coeffs, [None])
+        # Pad the coefficients so the first two terms always exist
+        coeffs = tf.concat([coeffs, tf.zeros(2 - tf.minimum(tf.shape(coeffs)[0], 2), dtype=DTYPE)], axis=0)
+        terms = tf.shape(coeffs)[0]
+        weights = tf.concat([coeffs[:1], 2 * coeffs[1:]], axis=0)
+        cos, sin = tf.cos(center * dt), tf.sin(center * dt)
+
+        # States are stored as real matrices [dim, 2B], with the real parts of the batch followed by the imaginary
+        def times_i(v, sign):
+            re, im = tf.split(v, 2, axis=1)
+            return tf.concat([-sign * im, sign * re], axis=1)
+
+        @tf.custom_gradient
+        def step(psi, d):
+            d = tf.concat([d, d], axis=1)
+
+            # -i times the rescaled Hamiltonian, which is antisymmetric as a real operator
+            def a(v):
+                return times_i((tf.sparse.sparse_dense_matmul(hopping, v) + (d - center) * v) / half_width, -1)
+
+            # u_0 = psi, u_1 = -iH psi, u_(n+1) = -2iH u_n + u_(n-1)
+            def recurrence(u0):
+                u1 = a(u0)
+
+                def body(n, u0, u1, acc):
+                    u2 = 2 * a(u1) + u0
+                    return n + 1, u1, u2, acc + weights[n] * u2
+
+                _, u0, u1, acc = tf.while_loop(
+                    lambda n, *_: n < terms, body, (tf.constant(2), u0, u1, weights[0] * u0 + weights[1] * u1)
+                )
+                return u0, u1, acc
+
+            *_, acc = recurrence(psi)
+
+            def grad(out_bar):
+                # Adjoint of the phase of the center of the spectrum
+                acc_bar = cos * out_bar + sin * times_i(out_bar, 1)
+
+                # Walk the recurrence backwards, rebuilding u_(n-1) from u_n and u_(n+1) instead of storing them.
+                # b_n = w_n acc_bar - 2a(b_(n+1)) + b_(n+2) is the adjoint of u_n, since a^T = -a.
+                u_prev, u_last, _ = recurrence(psi)
+
+                def body(n, b_next, b, u, u_prev, d_bar):
+                    d_bar += 2 * times_i(b, 1) * u_prev / half_width
+                    u_prevprev = u - 2 * a(u_prev)
+                    b_prev = weights[n - 1] * acc_bar - 2 * a(b) + b_next
+                    return n - 1, b, b_prev, u_prev, u_prevprev, d_bar
+
+                b_last = weights[terms - 1] * acc_bar
+                _, b2, b1, u1, u0, d_bar = tf.while_loop(
+                    lambda n, *_: n > 1, body,
+                    (terms - 1, tf.zeros_like(b_last), b_last, u_last, u_prev, tf.zeros_like(b_last))
+                )
+                d_bar += times_i(b1, 1) * u0 / half_width
+                psi_bar = weights[0] * acc_bar - a(b1) + b2
+                d_bar_re, d_bar_im = tf.split(d_bar, 2, axis=1)
+                return psi_bar, d_bar_re + d_bar_im
+
+            return cos * acc + sin * times_i(acc, -1), grad
+
+        target = tf.expand_dims(self._states[:, self.targetState], -1)
+        psi = tf.tile(tf.expand_dims(self.initial_state, -1), [1, tf.shape(chi_matrix)[0]])
+        psi = tf.concat([psi, tf.zeros_like(psi)], axis=1)
+        data = []
+        for i in range(self.NpointsT):
+            if i > 0:
+                psi = step(psi, diagonal)
+            re, im = tf.split(psi, 2, axis=1)
+            data.append(tf.reduce_sum(target * (re ** 2 + im ** 2), axis=0))
+
+        return tf.reshape(tf.stack(data, axis=-1), tf.concat([batch_shape, [self.NpointsT]], axis=0))
+
+    # ! Time evolution of the average occupation with a closed form gradient.
+    def _evolve(self, chis, refine=False):
+        """
+        Computes the average occupation of the target site on the time grid, as a function of the chis with a
+        custom gradient. Since dH/dchi_k = diag(0.5*n_k^2), the derivative of the propagator U(t) = exp(-iHt) is
+        V (G(t) o V^T dH V) V^T, where G_il(t) are the divided differences of exp(-iEt) over the eigenvalues.
+        Degenerate pairs of eigenvalues use the derivative -it exp(-iEt) instead, so the gradient stays finite
+        where backpropagating through the eigenvectors does not.
+
+        Args:
+            chis (tf.Tensor): Tensor of shape [..., sites].
+            refine (bool, optional): If True, evaluate at the candidate extrema of _refineExtremum instead of the
+            time grid. Defaults to False.
+
+        Returns:
+            tf.Tensor: The average occupation of the target site at every time step, of shape [..., timesteps].
+        """
+
+        @tf.custom_gradient
+        def evolve(_chis):
+            self.chis = _chis
+            self.setCoefs()
+            t_span = self._refineExtremum() if refine else self.t_span
+            data = self._computeAverageCalculation(t_span)
+            eigvals, eigvecs, ccoeffs = self.eigvals, self.bcoeffs, self.ccoeffs
+
+            def grad(upstream):
+                return self._evolveGradient(upstream, t_span, eigvals, eigvecs, ccoeffs)
+
+            return data, grad
+
+        return evolve(chis)
+
+    def _evolveGradient(self, upstream, t_span, eigvals, eigvecs, ccoeffs):
+        """
+        Backward pass of _evolve. For every time step, the derivative of <n(t)> is 2Re(p^T (G o V^T dH V) c), with
+        p = V^T (n o conj(psi(t))). Weighting by the upstream gradient and summing over the time steps gives a single
+        matrix W, built with one matrix product since G_il = (f_i - f_l)/(E_i - E_l). The gradient with respect to
+        chi_k is then the diagonal of V W V^T projected on 0.5*n_k^2.
+        """
+        states = tf.cast(self._states[:, self.targetState], dtype=CDTYPE)
+        b = tf.cast(eigvecs, dtype=CDTYPE)
+        c = tf.cast(ccoeffs, dtype=CDTYPE)
+        g = tf.cast(upstream, dtype=CDTYPE)
+        t = tf.cast(tf.expand_dims(t_span, -1), dtype=CDTYPE)
+
+        # Phases f_i(t) = exp(-iE_it), amplitudes psi(t) and their projections p(t), all of shape [..., T, dim]
+        phases = tf.exp(-1j * t * tf.cast(tf.expand_dims(eigvals, -2), dtype=CDTYPE))
+        psi = tf.matmul(phases * tf.expand_dims(c, -2), b, transpose_b=True)
+        p = tf.expand_dims(g, -1) * tf.matmul(states * tf.math.conj(psi), b)
+
+        # Time sums of the two terms of the divided differences, and of the derivative for degenerate pairs
+        diagonal_term = tf.reduce_sum(p * phases, axis=-2)
+        cross_term = tf.matmul(p, phases, transpose_a=True)
+        degenerate_term = tf.reduce_sum(p * -1j * t * phases, axis=-2)
+
+        delta = tf.expand_dims(eigvals, -1) - tf.expand_dims(eigvals, -2)
+        tol = DEGENERACY_TOL * tf.maximum(tf.reduce_max(tf.abs(eigvals), axis=-1, keepdims=True), 1.)
+        degenerate = tf.abs(delta) <= tf.expand_dims(tol, -1)
+        safe_delta = tf.cast(tf.where(degenerate, tf.ones_like(delta), delta), dtype=CDTYPE)
+        w = tf.where(
+            degenerate,
+            tf.expand_dims(degenerate_term, -1) * tf.ones_like(cross_term),
+            (tf.expand_dims(diagonal_term, -1) - cross_term) / safe_delta
+        ) * tf.expand_dims(c, -2)
+
+        diagonal = tf.reduce_sum(tf.matmul(eigvecs, tf.math.real(w)) * eigvecs, axis=-1)
+        return 2 * tf.linalg.matvec(self._chi_diagonals, diagonal, transpose_a=True)
+
+    # ! Search of the extremum of the average occupation in continuous time.
+    def _refineExtremum(self):
+        """
+        Finds the times where the average occupation of the target site is extremal in [0, max_t] (maximal for the
+        acceptor, minimal otherwise). <n(t)> only oscillates with the differences of the eigenvalues that overlap
+        with the initial state, so a grid with COARSE_SAMPLING points per the shortest period resolves every
+        extremum. The REFINE_CANDIDATES highest local maxima of that grid are then refined with Newton steps, limited to
+        one grid spacing, using the analytic time derivatives of <n(t)>.
+
+        Returns:
+            tf.Tensor: The coarse and the refined candidate times, of shape [..., 2*REFINE_CANDIDATES].
+        """
+        sign = 1. if self.targetState == self.sites - 1 else -1.
+        max_t = self.t_span[-1]
+        eigvals = tf.stop_gradient(self.eigvals)
+
+        # Spread of the eigenvalues that take part in the dynamics, over the whole batch
+        significant = tf.stop_gradient(self.ccoeffs) ** 2 > SPECTRAL_WEIGHT_TOL
+        bandwidth = tf.reduce_max(tf.where(significant, eigvals, eigvals[..., :1])) - tf.reduce_min(
+            tf.where(significant, eigvals, eigvals[..., -1:]))
+        points = tf.cast(tf.math.ceil(COARSE_SAMPLING * max_t * bandwidth / (2 * np.pi)), tf.int32) + 1
+        points = tf.clip_by_value(points, 2, MAX_COARSE_POINTS)
+        spacing = max_t / tf.cast(points - 1, dtype=DTYPE)
+
+        coarse = tf.linspace(tf.constant(0, dtype=DTYPE), max_t, points)
+        values = sign * tf.stop_gradient(self._computeAverageCalculation(coarse))
+        # ! Only the local maxima of the coarse grid are candidates, so that every candidate refines a different peak.
+        # They are ranked by the top of the parabola through their neighbours, a much closer estimate of the height
+        # of their peak than the sampled value when several peaks are almost as high
+        left = tf.concat([values[..., :1], values[..., :-1]], axis=-1)
+        right = tf.concat([values[..., 1:], values[..., -1:]], axis=-1)
+        curvature = 2 * values - left - right
+        height = values + tf.math.divide_no_nan((left - right) ** 2, 8 * curvature)
+        peaks = tf.logical_and(values >= left, values >= right)
+        _, indices = tf.math.top_k(
+            tf.where(peaks, height, tf.fill(tf.shape(values), tf.constant(-np.inf, dtype=DTYPE))),
+            k=tf.minimum(REFINE_CANDIDATES, points)
+        )
+        coarse = tf.gather(coarse, indices)
+
+        t = coarse
+        for _ in range(NEWTON_STEPS):
+            d1, d2 = self._occupationDerivatives(t)
+            d1, d2 = sign * d1, sign * d2
+            # Newton step towards a maximum of sign*<n(t)>, or a full step uphill where the curvature is positive
+            newton = tf.where(d2 < 0, -d1 / tf.where(d2 < 0, d2, -tf.ones_like(d2)), tf.sign(d1) * spacing)
+            t = tf.clip_by_value(t + tf.clip_by_value(newton, -spacing, spacing), 0., max_t)
+
+        return tf.stop_gradient(tf.concat([coarse, t], axis=-1))
+
+    def _occupationDerivatives(self, t):
+        """
+        Computes the first and second time derivatives of the average occupation of the target site.
+
+        Args:
+            t (tf.Tensor): Times of shape [..., K].
+
+        Returns:
+            tuple: The first and the second derivatives, each of shape [..., K].
+        """
+        states = self._states[:, self.targetState]
+        b = tf.cast(tf.stop_gradient(self.bcoeffs), dtype=CDTYPE)
+        e = tf.cast(tf.expand_dims(tf.stop_gradient(self.eigvals), -2), dtype=CDTYPE)
+        phases = tf.exp(-1j * tf.cast(tf.expand_dims(t, -1), dtype=CDTYPE) * e) * tf.cast(
+            tf.expand_dims(tf.stop_gradient(self.ccoeffs), -2), dtype=CDTYPE)
+
+        psi = tf.matmul(phases, b, transpose_b=True)
+        d_psi = tf.matmul(-1j * e * phases, b, transpose_b=True)
+        dd_psi = tf.matmul(-e ** 2 * phases, b, transpose_b=True)
+
+        d1 = 2 * tf.linalg.matvec(tf.math.real(tf.math.conj(psi) * d_psi), states)
+        d2 = 2 * tf.linalg.matvec(tf.math.real(tf.math.conj(d_psi) * d_psi + tf.math.conj(psi) * dd_psi), states)
+        return d1, d2
+
+    def compareGradients(self, chis, site=0, single_value=True):
+        """
+        Computes the gradient of the loss with both the analytic formula and automatic differentiation through
+        tf.linalg.eigh, so they can be checked against each other.
+
+        Args:
+            chis (list): The nonlinearity parameters.
+            site (int, optional): The target site. Defaults to 0.
+            single_value (bool, optional): If False, compare the gradients of the sum of the trajectory. Defaults to True.
+
+        Returns:
+            dict: The gradients of both methods, with keys 'analytic' and 'autodiff'.
+        """
+        chis = tf.Variable(_toDtype(chis))
+        analytic_grad = self.analytic_grad
+        grads = {}
+        try:
+            for name, flag in [('analytic', True), ('autodiff', False)]:
+                self.analytic_grad = flag
+                with tf.GradientTape() as t:
+                    value = tf.reduce_sum(self(chis, site=site, single_value=single_value))
+                grads[name] = t.gradient(value, chis)
+        finally:
+            self.analytic_grad = analytic_grad
+        return grads
 
     # ! Computing the loss function given a Hamiltonian corresponding to one combination of nonlinearity parameters
     def loss(self, single_value=True):
-        data = tf.TensorArray(DTYPE, size=self.NpointsT)
-        self.setCoefs()
-        t_span = np.linspace(0, tf.get_static_value(self.max_t), self.NpointsT)
-        for index_t, t in enumerate(t_span):
-            # print('\r t = {}'.format(t),end="")
-            x = self._computeAverageCalculation(t)
-            data = data.write(index_t, value=x)
-        data = data.stack()
+        refine = single_value and self.time_search == 'refine'
+        if self.engine == 'chebyshev':
+            data = self._evolveChebyshev()
+        elif self.analytic_grad:
+            data = self._evolve(self._chiVector(), refine=refine)
+        else:
+            self.setCoefs()
+            data = self._computeAverageCalculation(self._refineExtremum() if refine else self.t_span)
         if single_value:
             if self.targetState == self.sites - 1:
-                return self.max_N - tf.reduce_max(data)
+                return self.max_N - tf.reduce_max(data, axis=-1)
             else:
-                return tf.reduce_min(data)
+                return tf.reduce_min(data, axis=-1)
         else:
             return data
+
+
+# ------------------------- Sharing the operators between processes ------------------------- #
+
+def shareOperators(const) -> dict:
+    """
+    Function that builds the basis and the chi independent part of the Hamiltonian once in this process, and publishes
+    the arrays through multiprocessing.shared_memory so that worker processes attach to them instead of recomputing them.
+    The blocks stay alive until releaseOperators is called.
+
+    Args:
+        const (dict): Refer to the system_constants dictionary in constants.py.
+
+    Returns:
+        dict: Picklable handles of the shared arrays, to be passed to attachOperators.
+    """
+    key = _operatorKey(const)
+    if key in _published_operators:
+        return _published_operators[key][0]
+    Loss(const=const)
+
+    arrays, blocks = {}, []
+    for name, value in _operator_cache[key].items():
+        if isinstance(value, np.ndarray):
+            block = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+            np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+            blocks.append(block)
+            arrays[name] = (block.name, value.shape, value.dtype.str)
+        else:
+            # Plain values such as the index of the initial state
+            arrays[name] = value
+    handles = {'key': key, 'arrays': arrays}
+    _published_operators[key] = (handles, blocks)
+    return handles
+
+
+def attachOperators(handles):
+    """
+    Function that maps the arrays published by shareOperators into this process without copying them, and registers
+    them in the operator cache, so that every following Loss with the same system constants reuses them.
+    Does nothing if the operators of the same system are already known to this process, so workers can call it before every job.
+
+    Args:
+        handles (dict): The handles returned by shareOperators.
+    """
+    if handles['key'] in _operator_cache:
+        return
+
+    entry = {}
+    for name, handle in handles['arrays'].items():
+        if isinstance(handle, tuple):
+            block_name, shape, dtype = handle
+            # Closing the block when the worker exits does not unlink it, the publishing process does in releaseOperators
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            array.setflags(write=False)
+            _attached_blocks.append(block)
+            entry[name] = array
+        else:
+            entry[name] = handle
+    _operator_cache[handles['key']] = entry
+
+
+def releaseOperators(handles=None):
+    """
+    Function that frees the shared memory blocks published by shareOperators in this process. The blocks attached by
+    the workers are closed when the workers exit.
+
+    Args:
+        handles (dict, optional): The handles returned by shareOperators. If None, free every published block. Defaults to None.
+    """
+    keys = list(_published_operators) if handles is None else [handles['key']]
+    for key in keys:
+        if key not in _published_operators:
+            continue
+        for block in _published_operators.pop(key)[1]:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _writeCacheBatch(path, pending):
+    """
+    Writes buffered entries of a LossCache to one .npz file of its directory and empties the buffer.
+
+    Args:
+        path (str): Directory of the on-disk store.
+        pending (dict): The buffered entries, by key.
+
+    Returns:
+        str: Name of the batch file, or None if there was nothing to write.
+    """
+    if not pending:
+        return None
+    arrays = {f'{key}.{field}': value for key, entry in pending.items() for field, value in entry.items()}
+    # Write to a temporary file first so that other processes never read a partial batch
+    fd, tmp_path = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, **arrays)
+    name = f'batch_{os.getpid()}_{uuid.uuid4().hex}.npz'
+    os.replace(tmp_path, os.path.join(path, name))
+    pending.clear()
+    return name
+
+
+class LossCache:
+    """
+    A least recently used cache of evaluations of the loss function. Entries are keyed by their kind, the system
+    constants, the chis rounded to a number of decimals, the target site and the mask of the watched chis, and hold
+    arrays such as the loss, its gradients, the eigenvalues and the overlaps of the eigenvectors with the initial state.
+    Kinds: 'loss' entries of Loss.evaluate, 'grads' entries of Optimizer.get_grads.
+
+    With a path, new entries are buffered and written to the directory in batches of flush_size entries, one .npz
+    file per batch, when the buffer is full, when flush() is called, e.g. at the end of each Optimizer run, and when
+    the cache is garbage collected or the process exits.
+
+    Args:
+        maxsize (int, optional): Maximum number of entries kept in memory. Defaults to 4096.
+        decimals (int, optional): Number of decimals the chis are rounded to. Defaults to 8.
+        path (str, optional): Directory of an on-disk store, that can be shared by processes and runs. Defaults to None.
+        flush_size (int, optional): Number of buffered entries that triggers a write to the on-disk store. Defaults to 1024.
+    """
+
+    def __init__(self, maxsize=4096, decimals=8, path=None, flush_size=1024):
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.path = path
+        self.flush_size = flush_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Entries not written to disk yet, and the batch file and the fields of every entry on disk
+        self.pending = {}
+        self.index = {}
+        self._indexed = set()
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            # Write the buffered entries if the cache is dropped or the process exits before a flush
+            weakref.finalize(self, _writeCacheBatch, self.path, self.pending)
+
+    def key(self, system_key, chis, site, kind='loss', watched=None) -> str:
+        chis = np.round(np.asarray(chis, dtype=np.float64), self.decimals) + 0.
+        watched = None if watched is None else [bool(w) for w in watched]
+        return hashlib.sha1(
+            json.dumps([kind, list(system_key), chis.tolist(), site, watched], default=float).encode()
+        ).hexdigest()
+
+    def get(self, key, fields=()):
+        """
+        Looks an entry up in memory and then on disk.
+
+        Args:
+            key (str): Key produced by LossCache.key.
+            fields (tuple, optional): Arrays the entry must hold, an entry without them counts as a miss. Defaults to ().
+
+        Returns:
+            dict: The arrays of the entry, or None if it is not cached.
+        """
+        entry = self.entries.get(key, self.pending.get(key))
+        if entry is not None and all(field in entry for field in fields):
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+        if self.path is not None:
+            # Batches written by other processes since the last lookup
+            if key not in self.index:
+                self._updateIndex()
+            if key in self.index:
+                name, names = self.index[key]
+                try:
+                    with np.load(os.path.join(self.path, name)) as data:
+                        entry = {field: data[f'{key}.{field}'] for field in names}
+                    if all(field in entry for field in fields):
+                        self.hits += 1
+                        self._remember(key, entry)
+                        return entry
+                except (OSError, ValueError, EOFError, KeyError):
+                    pass
+
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        """
+        Stores an entry in memory, evicting the least recently used one if full, and buffers it for the on-disk store
+        if a path was given.
+
+        Args:
+            key (str): Key produced by LossCache.key.
+            entry (dict): Arrays to store.
+        """
+        self._remember(key, entry)
+        if self.path is not None:
+            self.pending[key] = entry
+            if len(self.pending) >= self.flush_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered entries to the on-disk store as one batch file.
+        """
+        if self.path is None or not self.pending:
+            return
+        name = _writeCacheBatch(self.path, self.pending)
+        self._readIndex(name)
+
+    # Add the entries of the batch files that are not indexed yet
+    def _updateIndex(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.npz') and name not in self._indexed:
+                self._readIndex(name)
+
+    # Only the names of the arrays are read, np.load of a .npz file loads the arrays on access
+    def _readIndex(self, name):
+        try:
+            with np.load(os.path.join(self.path, name)) as data:
+                members = data.files
+        except (OSError, ValueError, EOFError):
+            return
+        fields = {}
+        for member in members:
+            # Files of another layout, e.g. one entry per file, are not read
+            if '.' not in member:
+                continue
+            key, field = member.split('.', 1)
+            fields.setdefault(key, []).append(field)
+        for key, names in fields.items():
+            self.index[key] = (name, names)
+        self._indexed.add(name)
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
@@ -1,13 +1,16 @@
 import sys
 import os
 import time
+from typing import Tuple, Union
 import numpy as np
 import tensorflow as tf
 import keras.backend as K
 
-from .data_process import createDir, writeData
-from .HamiltonianLoss import Loss
+from .data_process import createDir, writeData, ResultStore, RESULTS_FILE
+from .HamiltonianLoss import Loss, LossCache, attachOperators
 from .constants import TensorflowParams
+from .numerics import adamStep
+from .workers import stopRequested
 
 assert tf.__version__ >= "2.0"
 assert sys.version_info >= (3, 6)
@@ -28,6 +31,10 @@ class Optimizer:
         iterations (int, optional): Refer to the argument iterations of the TensorflowParams dictionary in constants.py. Defaults to the value from constants.py.
         opt (tf.keras.optimizers, optional): A tensorflow optimizer which is going to be used for the minimization of the HamiltonianLoss. Defaults to tf.keras.optimizers.Adam().
         data_path (str, optional): Path to save the directory of an optimizer with given initial guesses. Defaults to os.path.join(os.getcwd(), 'data_optimizer').
+        cache (LossCache, optional): Cache of the values and gradients of the loss function, looked up before each evaluation. Defaults to None.
+        graph_loop (bool, optional): If True, run the whole training loop inside one tf.function with tf.while_loop, following the same rules, so that the host only receives the results at the end. The cache is not used in this mode. Defaults to False.
+        jit_compile (bool, optional): If True, compile the loss function and its gradients with XLA. The loss then uses the 'dense' engine and the 'grid' time search, the only graph-pure ones, and refines the eigenvectors of the XLA eigensolver, refer to the refine_eigh argument of HamiltonianLoss.Loss. Pays off for Hilbert spaces of dimension up to about 30, beyond which the XLA eigensolver is slower than LAPACK. Defaults to False.
+        time_search (str, optional): Method of finding the extremum of the average occupation in time, one of 'grid' or 'refine', refer to HamiltonianLoss.Loss. 'refine' can not be compiled with jit_compile. Defaults to 'grid'.
     """
 
     def __init__(
@@ -36,7 +43,8 @@ class Optimizer:
             iterations=TensorflowParams['iterations'],
             train_sites=TensorflowParams['train_sites'],
             opt=tf.keras.optimizers.Adam(),
-            data_path=os.path.join(os.getcwd(), 'data_optimizer')
+            data_path=os.path.join(os.getcwd(), 'data_optimizer'),
+            cache=None, jit_compile=False, graph_loop=False, time_search='grid'
     ):
 
         # ! Import the parameters of the problem
@@ -54,11 +62,25 @@ class Optimizer:
         self.data_path = data_path
         self.iter = iterations
         self.opt = opt
-        self.lr = opt.learning_rate
+        # Keep the initial value, not the variable, so that train() can restore it
+        self.lr = float(K.get_value(opt.learning_rate))
         self.Print = Print
+        self.cache = cache
+        self.graph_loop = graph_loop
 
         self.vars = [None for _ in range(len(self.const['chis']))]
 
+        # The basis and the chi independent part of the Hamiltonian are built once per optimizer
+        self.jit_compile = jit_compile
+        if jit_compile and time_search != 'grid':
+            raise ValueError('The refine time search is not graph-pure, it can not be compiled with jit_compile.')
+        self.loss = Loss(
+            const=self.const, engine='dense' if jit_compile else None, time_search=time_search, refine_eigh=jit_compile
+        )
+
+        # The loss and its gradients are traced together, so that XLA fuses the backward pass too
+        self._compiled_grads = tf.function(self._grads, jit_compile=True) if jit_compile else None
+
         self.DTYPE = tf.float64
 
     def __call__(self, *args, write_data=False):
@@ -83,13 +105,43 @@ class Optimizer:
 
     # Get the gradients
     def get_grads(self):
-        with tf.GradientTape() as t:
-            # t watches the trainable parameters only by default
-            loss = self.compute_loss()
-        grads = t.gradient(loss, self.vars)
-        del t
+        if self.cache is not None:
+            # The gradients depend on which chis are trained
+            watched = [var.trainable for var in self.vars]
+            key = self.cache.key(
+                self.loss.system_key, [var.numpy() for var in self.vars], self.target_site,
+                kind='grads', watched=watched
+            )
+            entry = self.cache.get(key, fields=('loss', 'grads', 'watched'))
+            if entry is not None and list(entry['watched']) == watched:
+                # Non-trainable parameters have no gradient
+                grads = [tf.constant(g, dtype=self.DTYPE) if is_watched else None
+                         for g, is_watched in zip(entry['grads'], entry['watched'])]
+                return grads, tf.constant(entry['loss'], dtype=self.DTYPE)
+
+        if self._compiled_grads is not None:
+            grads, loss = self._compiled_grads()
+        else:
+            with tf.GradientTape() as t:
+                # t watches the trainable parameters only by default
+                loss = self.compute_loss()
+            grads = t.gradient(loss, self.vars)
+            del t
+
+        if self.cache is not None:
+            self.cache.put(key, {
+                'loss': loss.numpy(),
+                'grads': np.array([0. if g is None else g.numpy() for g in grads]),
+                'watched': np.array([g is not None for g in grads])
+            })
         return grads, loss
 
+    # Body of the XLA compiled gradients
+    def _grads(self):
+        with tf.GradientTape() as t:
+            loss = self.loss(self.vars, site=self.target_site)
+        return t.gradient(loss, self.vars), loss
+
     # Apply the gradients
     @tf.function(jit_compile=False)
     def apply_grads(self, grads):
@@ -97,16 +149,11 @@ class Optimizer:
 
     # Running the optimizer given initial guesses for the trainable parameters
     def train(self, initial_chis):
-        # * Reset Optimizer
-        K.clear_session()
+        # * Reset the slots of the optimizer, keeping its variables and traced functions
         for var in self.opt.variables():
             var.assign(tf.zeros_like(var))
         K.set_value(self.opt.learning_rate, self.lr)
 
-        # * Define the object of the Loss class according to the current trainable parameters.
-        # ? ATTENTION
-        self.loss = Loss(const=self.const)
-
         # Save the values of the loss function while proceeding 
         mylosses = []
 
@@ -128,6 +175,12 @@ class Optimizer:
                         initial_value=initial_chis[i], dtype=self.DTYPE,
                         name=f'chi{i}', trainable=False
                     )
+            # Reused optimizer, start from the new initial guesses
+            else:
+                self.vars[i].assign(initial_chis[i])
+
+        if self.graph_loop:
+            return self._trainGraph()
 
         # Nonlinearity parameters that produce the lowest loss function
         best_vars = [tf.Variable(initial_value=0, dtype=self.DTYPE, trainable=False) for _ in range(len(self.vars))]
@@ -195,6 +248,10 @@ class Optimizer:
             if np.abs(loss.numpy()) < 0.1:
                 break
 
+            # Interrupt if the parent process cancelled the job, e.g. because another optimizer has reached TET
+            if stopRequested():
+                break
+
             t1 = time.time()
             dt = t1 - t0
 
@@ -206,45 +263,112 @@ class Optimizer:
                     if var_error_count[j] > 2:
                         if self.Print:
                             print(f'Stopped training because of x{j}_new-x{j}_old =', var_error[j])
-                            print(
-                                *[f"\nApproximate value of chi_{j}: {best_vars[j].numpy()}" for j in
-                                  range(len(self.vars))],
-                                "\nLoss:", best_loss,
-                                "\nOptimizer Iterations:", self.opt.iterations.numpy(),
-                                "\nTraining Time:", dt,
-                                "\n" + 60 * "-",
-                                "\nParameters:",
-                                "\nOmegas", self.omegas,
-                                "| N:", self.max_n,
-                                "| Sites: ", self.sites,
-                                "| Total timesteps:", self.max_t,
-                                "| Coupling Lambda:", self.coupling,
-                                "\n" + 60 * "-"
-                            )
+                            self._printResults(best_vars, best_loss, dt)
                         return mylosses, var_data, best_vars
 
         # Print the outcome of the optimizer
         if self.Print:
-            print(
-                *[f"\nApproximate value of chi_{j}: {best_vars[j].numpy()}" for j in range(len(self.vars))],
-                "\nLoss:", best_loss,
-                "\nOptimizer Iterations:", self.opt.iterations.numpy(),
-                "\nTraining Time:", dt,
-                "\n" + 60 * "-",
-                "\nParameters:",
-                "\nOmegas", self.omegas,
-                "| N:", self.max_n,
-                "| Sites: ", self.sites,
-                "| Total timesteps:", self.max_t,
-                "| Coupling Lambda:", self.coupling,
-                "\n" + 60 * "-"
+            self._printResults(best_vars, best_loss, dt)
+        return mylosses, var_data, best_vars
+
+    def _printResults(self, best_vars, best_loss, dt):
+        print(
+            *[f"\nApproximate value of chi_{j}: {best_vars[j].numpy()}" for j in range(len(self.vars))],
+            "\nLoss:", best_loss,
+            "\nOptimizer Iterations:", self.opt.iterations.numpy(),
+            "\nTraining Time:", dt,
+            "\n" + 60 * "-",
+            "\nParameters:",
+            "\nOmegas", self.omegas,
+            "| N:", self.max_n,
+            "| Sites: ", self.sites,
+            "| Total timesteps:", self.max_t,
+            "| Coupling Lambda:", self.coupling,
+            "\n" + 60 * "-"
+        )
+
+    # The whole training loop of train() as a single graph, the host receives the results once at the end
+    @tf.function
+    def _trainLoop(self, iterations, tol):
+        n_vars = len(self.vars)
+        trainable = tf.constant([i in self.train_sites for i in range(n_vars)])
+
+        def cond(epoch, stop, *_):
+            return tf.logical_and(epoch < iterations, tf.logical_not(stop))
+
+        def body(epoch, stop, prev_loss, best_loss, best_vars, var_error_count, losses, var_data):
+            # The variables before applying gradients
+            _vars = tf.stack([tf.identity(var) for var in self.vars])
+
+            with tf.GradientTape() as t:
+                loss = self.loss(self.vars, site=self.target_site)
+            grads = t.gradient(loss, self.vars)
+
+            if self.Print:
+                tf.cond(epoch % 50 == 0, lambda: tf.print('Loss:', loss, ', vars:', _vars, ', epoch:', epoch),
+                        lambda: tf.no_op())
+
+            # Reduce the learning rate when being close to TET
+            self.opt.learning_rate.assign(tf.where(
+                loss <= 0.1, tf.constant(0.0001, dtype=self.opt.learning_rate.dtype), self.opt.learning_rate))
+
+            # Keep the minimum loss and the corresponding parameters
+            best_vars = tf.where(loss < best_loss, _vars, best_vars)
+            best_loss = tf.minimum(loss, best_loss)
+            losses = losses.write(epoch, loss)
+
+            self.opt.apply_gradients(
+                [(grad, var) for grad, var in zip(grads, self.vars) if grad is not None])
+
+            # Change self.vars to 1 step back if loss is reduced too fast
+            var_error = tf.abs(tf.stack([tf.identity(var) for var in self.vars]) - _vars)
+            jump = tf.logical_and(loss - prev_loss >= 0.5, loss >= 0.5)
+            for i, var in enumerate(self.vars):
+                var.assign(tf.where(jump, _vars[i], var))
+
+            # Keep the changes of the variables per 10 steps for plotting
+            var_data = tf.cond(
+                (epoch + 1) % 10 == 0,
+                lambda: var_data.write((epoch + 1) // 10 - 1, tf.stack([tf.identity(var) for var in self.vars])),
+                lambda: var_data
             )
+
+            # Interrupt in case of TET or of non-progress of a trainable parameter
+            var_error_count += tf.cast(tf.logical_and(var_error < tol, trainable), tf.int32)
+            stop = tf.logical_or(tf.abs(loss) < 0.1, tf.reduce_any(var_error_count > 2))
+            return epoch + 1, stop, loss, best_loss, best_vars, var_error_count, losses, var_data
+
+        max_n = tf.constant(self.max_n, dtype=self.DTYPE)
+        _, _, _, best_loss, best_vars, _, losses, var_data = tf.while_loop(cond, body, (
+            tf.constant(0), tf.constant(False), max_n, max_n, tf.zeros(n_vars, dtype=self.DTYPE),
+            tf.zeros(n_vars, dtype=tf.int32),
+            tf.TensorArray(self.DTYPE, size=0, dynamic_size=True),
+            tf.TensorArray(self.DTYPE, size=0, dynamic_size=True, element_shape=[n_vars])
+        ))
+        return losses.stack(), var_data.stack(), best_vars, best_loss
+
+    # Run _trainLoop and convert its results to the ones of train()
+    def _trainGraph(self):
+        t0 = time.time()
+        losses, var_data, best_vars, best_loss = self._trainLoop(
+            tf.constant(self.iter), tf.constant(self.tol, dtype=self.DTYPE))
+        dt = time.time() - t0
+
+        mylosses = [self.max_n, *losses.numpy()]
+        var_data = [list(var_data.numpy().reshape(-1, len(self.vars))[:, k]) for k in range(len(self.vars))]
+        best_vars = [tf.constant(var) for var in best_vars.numpy()]
+        if self.Print:
+            self._printResults(best_vars, best_loss.numpy(), dt)
         return mylosses, var_data, best_vars
 
     # ! Run the optimizer for given initial guesses and save trajectories.
     def _train(self, write_data: bool) -> any:
         mylosses, var_data, best_vars = self.train(self.init_chis)
 
+        # The cache entries of the run reach the on-disk store in one batch
+        if self.cache is not None:
+            self.cache.flush()
+
         if write_data:
             # Save the evolution of the values of the loss function
             writeData(data=mylosses[1:], destination=self.data_path, name_of_file='losses.txt')
@@ -263,14 +387,204 @@ class Optimizer:
         }
 
 
+class BatchOptimizer:
+    """
+    An optimizer that trains a population of initial guesses at once. The nonlinearity parameters of all the
+    guesses are kept in one [B, sites] array, the loss function and its gradients are computed with a single
+    batched call of the loss, and every row is updated with its own Adam state. Each row follows the rules of
+    Optimizer.train and stops being updated once it reaches TET or the tolerance rule.
+
+    Args:
+        const (dict): Refer to the system_constants dictionary in constants.py.
+        target_site (int): Refer to the argument target of the solver_params dictionary in constants.py
+        iterations (int, optional): Maximum iterations of the optimizer. Defaults to the value from constants.py.
+        train_sites (list, optional): Sites of the nonlinearity parameters to train. Defaults to the value from constants.py.
+        lr (float, optional): Learning rate of Adam. Defaults to the value from constants.py.
+        beta_1 (float, optional): beta_1 parameter of Adam. Defaults to the value from constants.py.
+        beta_2 (float, optional): beta_2 parameter of Adam. Defaults to 0.999.
+        epsilon (float, optional): epsilon parameter of Adam. Defaults to 1e-7.
+        amsgrad (bool, optional): Whether to use the amsgrad version of Adam. Defaults to the value from constants.py.
+        Print (bool, optional): Parameter defining if to print results of optimization on the console. Defaults to True.
+        time_search (str, optional): Method of finding the extremum of the average occupation in time, one of 'grid' or 'refine', refer to HamiltonianLoss.Loss. Defaults to 'grid'.
+    """
+
+    def __init__(
+            self, const: dict, target_site: int,
+            iterations=TensorflowParams['iterations'],
+            train_sites=TensorflowParams['train_sites'],
+            lr=TensorflowParams['lr'], beta_1=TensorflowParams['beta_1'], beta_2=0.999, epsilon=1e-7,
+            amsgrad=TensorflowParams['amsgrad'], Print=True, time_search='grid'
+    ):
+        self.const = const
+        self.max_n = self.const['max_N']
+        self.sites = self.const['sites']
+        self.target_site = target_site
+        self.iter = iterations
+        self.train_sites = train_sites
+        self.lr = lr
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+        self.amsgrad = amsgrad
+        self.Print = Print
+
+        self.loss = Loss(const=self.const, time_search=time_search)
+
+        self.DTYPE = tf.float64
+
+    # Compute the loss function and its gradients for the rows that are still trained
+    @tf.function(reduce_retracing=True)
+    def get_grads(self, chis):
+        with tf.GradientTape() as t:
+            t.watch(chis)
+            loss = self.loss.batch_loss(chis, site=self.target_site)
+        return t.gradient(loss, chis), loss
+
+    def train(self, initial_chis):
+        """
+        Runs the optimizer for every row of initial guesses.
+
+        Args:
+            initial_chis (np.ndarray): Array of shape [B, sites] with the initial values of all the nonlinearity parameters.
+
+        Returns:
+            dict: 'loss' is an array of shape [epochs, B] with the values of the loss function, NaN once a row has
+            stopped, 'var_data' an array of shape [epochs // 10, B, sites] with the parameters every 10 steps,
+            'best_vars' an array of shape [B, sites] and 'min_loss' an array of shape [B].
+        """
+        chis = np.array(initial_chis, dtype=np.float64)
+        B = chis.shape[0]
+        rows = np.arange(B)
+
+        self.tol = TensorflowParams['tol']
+        trainable = np.isin(np.arange(self.sites), self.train_sites)
+
+        # Adam state of every row
+        m = np.zeros_like(chis)
+        v = np.zeros_like(chis)
+        v_hat = np.zeros_like(chis)
+        steps = np.zeros(B)
+        lr = np.full(B, float(self.lr))
+
+        # Rows that are still trained, their last loss and the best results so far
+        active = np.ones(B, dtype=bool)
+        prev_loss = np.full(B, float(self.max_n))
+        best_loss = np.full(B, float(self.max_n))
+        best_vars = np.zeros_like(chis)
+        var_error_count = np.zeros_like(chis, dtype=int)
+
+        mylosses = []
+        var_data = []
+
+        t0 = time.time()
+        for epoch in range(self.iter):
+            idx = rows[active]
+            _chis = chis[idx]
+
+            grads, loss = self.get_grads(tf.constant(_chis, dtype=self.DTYPE))
+            grads, loss = grads.numpy(), loss.numpy()
+
+            epoch_losses = np.full(B, np.nan)
+            epoch_losses[idx] = loss
+            mylosses.append(epoch_losses)
+
+            if self.Print and epoch % 50 == 0:
+                print(f'Best loss:{np.min(loss)}, active rows: {len(idx)}, epoch:{epoch}')
+
+            # Reduce the learning rate of the rows that are close to TET
+            lr[idx[loss <= 0.1]] = 0.0001
+
+            # Keep the minimum loss and the corresponding parameters
+            improved = loss < best_loss[idx]
+            best_vars[idx[improved]] = _chis[improved]
+            best_loss[idx[improved]] = loss[improved]
+
+            # Adam update of the trainable parameters
+            grads = np.where(trainable, grads, 0.)
+            steps[idx] += 1
+            step, m[idx], v[idx], v_hat[idx] = adamStep(
+                grads, m[idx], v[idx], v_hat[idx], steps[idx, None], lr[idx, None],
+                self.beta_1, self.beta_2, self.epsilon, self.amsgrad
+            )
+            new_chis = np.where(trainable, _chis - step, _chis)
+            var_error = np.abs(new_chis - _chis)
+
+            # Go 1 step back if the loss is reduced too fast
+            jump = (loss - prev_loss[idx] >= 0.5) & (loss >= 0.5)
+            new_chis[jump] = _chis[jump]
+            chis[idx] = new_chis
+            prev_loss[idx] = loss
+
+            # Keep the changes of the variables per 10 steps for plotting
+            if (epoch + 1) % 10 == 0:
+                var_data.append(np.where(active[:, None], chis, np.nan))
+
+            # Stop the rows that reached TET or do not progress
+            var_error_count[idx] += (var_error < self.tol) & trainable
+            stop = (np.abs(loss) < 0.1) | np.any(var_error_count[idx] > 2, axis=1)
+            active[idx[stop]] = False
+            if not active.any():
+                break
+
+        min_loss = np.nanmin(np.array(mylosses), axis=0)
+
+        if self.Print:
+            best = np.argmin(min_loss)
+            print(
+                *[f"\nApproximate value of chi_{j}: {best_vars[best, j]}" for j in range(self.sites)],
+                "\nLoss:", best_loss[best],
+                "\nOptimizer Iterations:", epoch + 1,
+                "\nTraining Time:", time.time() - t0,
+                "\n" + 60 * "-"
+            )
+
+        return {
+            'loss': np.array(mylosses),
+            'var_data': np.array(var_data).reshape(-1, B, self.sites),
+            'best_vars': best_vars,
+            'min_loss': min_loss,
+        }
+
+    # ! Append the trajectories of every row to the result store of the iteration, the job id of a row is its index
+    # plus job_offset
+    def saveResults(self, results, initial_chis, iteration_path, job_offset=0):
+        records = []
+        for i in range(len(initial_chis)):
+            losses = results['loss'][:, i]
+            trajectory = results['var_data'][:, i]
+            records.append({
+                'job': job_offset + i,
+                'loss': losses[~np.isnan(losses)],
+                'init_chis': initial_chis[i],
+                'best_vars': results['best_vars'][i],
+                'trajectory': trajectory[~np.isnan(trajectory).any(axis=1)],
+            })
+        ResultStore(os.path.join(iteration_path, RESULTS_FILE), sites=self.sites).write(records)
+
+
 # ----------------------------- Multiprocess Helper Function ----------------------------- #
 
+# Cache of the loss function of each worker process, created by the first job that asks for it
+_worker_cache = None
+
+# Optimizers of each worker process, one per system and optimizer configuration, reused by the following jobs
+_worker_optimizers = {}
+
+
+def _getWorkerCache(cache_path):
+    global _worker_cache
+    if _worker_cache is None or _worker_cache.path != cache_path:
+        _worker_cache = LossCache(path=cache_path)
+    return _worker_cache
+
+
 def mp_opt(
         i: int, combination: list, iteration_path: str,
         const: dict, target_site: int, iterations: int,
         lr: float, beta_1: float, amsgrad_bool: bool,
-        write_data: bool, train_sites: list
-) -> np.ndarray:
+        write_data: bool, train_sites: list,
+        cache=False, cache_path=None, handles=None, jit_compile=False, graph_loop=False, time_search='grid'
+) -> Union[np.ndarray, Tuple[np.ndarray, dict]]:
     """
     A helper function used for multiprocess.
     
@@ -279,29 +593,60 @@ def mp_opt(
         beta_1:
         amsgrad_bool:
         train_sites:
-        write_data:
+        write_data: Whether to also return the losses and the trajectory of the optimizer, for the parent process to
+            append them to the result store of the iteration.
         i (int): Index referring to optimizer with specific initial guesses
         combination (list): The initial guesses(referring to the trainable parameters) of the said optimizer
         iteration_path (str): Path of the iteration directory.
         const (dict): Refer to the constants dictionary in constants.py.
         target_site(int): Refer to the argument target of the solver_params dictionary in constants.py
         iterations(int): Maximum iterations of the optimizer
+        cache (bool, optional): Whether to memoize the evaluations of the loss function in the worker. Defaults to False.
+        cache_path (str, optional): Directory of an on-disk cache shared by the workers. Defaults to None.
+        handles (dict, optional): Handles of the operators shared by the parent process through shareOperators. Defaults to None.
+        jit_compile (bool, optional): Whether to compile the loss function and its gradients with XLA. Defaults to False.
+        graph_loop (bool, optional): Whether to run the training loop inside one tf.function. Defaults to False.
+        time_search (str, optional): Method of finding the extremum of the average occupation in time, one of 'grid' or 'refine'. Defaults to 'grid'.
+
+    Returns:
+        np.ndarray: The best parameters and the minimum loss. If write_data, a tuple of them and of the record of the
+            job for ResultStore.write. None if the job was cancelled before it started.
     """
 
+    # ! Skip the job if it was cancelled before it started
+    if stopRequested():
+        print(f'Job {i}: Cancelled')
+        return None
+
     # ! Import the parameters of the problem
     data_path = os.path.join(iteration_path, f'data_optimizer_{i}')
-
-    # ! Create the current optimizer
-    opt = Optimizer(
-        target_site=target_site,
-        DataExist=False,
-        Print=False,
-        data_path=data_path,
-        train_sites=train_sites,
-        const=const,
-        opt=tf.keras.optimizers.Adam(learning_rate=lr, beta_1=beta_1, amsgrad=amsgrad_bool),
-        iterations=iterations
+    if handles is not None:
+        attachOperators(handles)
+
+    # ! Reuse the optimizer of a previous job with the same configuration, so that its functions are traced once per
+    # worker. Its slots, learning rate and variables are reset by train()
+    key = (
+        const['max_N'], const['sites'], tuple(const['omegas']), const['coupling'], const['max_t'], const['timesteps'],
+        target_site, iterations, tuple(train_sites), beta_1, amsgrad_bool, jit_compile, graph_loop, time_search
     )
+    if key not in _worker_optimizers:
+        _worker_optimizers[key] = Optimizer(
+            target_site=target_site,
+            DataExist=False,
+            Print=False,
+            data_path=data_path,
+            train_sites=train_sites,
+            const=const,
+            opt=tf.keras.optimizers.Adam(learning_rate=lr, beta_1=beta_1, amsgrad=amsgrad_bool),
+            iterations=iterations,
+            jit_compile=jit_compile,
+            graph_loop=graph_loop,
+            time_search=time_search
+        )
+    opt = _worker_optimizers[key]
+    opt.data_path = data_path
+    opt.lr = lr
+    opt.cache = _getWorkerCache(cache_path) if cache else None
 
     # ! Call the optimizer with chis including the given initial guesses
     input_chis = [0] * len(const['chis'])
@@ -311,11 +656,21 @@ def mp_opt(
     for index, case in zip(train_sites, combination):
         input_chis[index] = case
 
-    results = opt(*input_chis, write_data=write_data)
+    # The parent process writes the results, the worker only sends them back
+    results = opt(*input_chis)
 
     # ! Load Data
     loss_data = results['loss']
     best_vars = results['best_vars']
-    print(f'Job {i}: Done')
-
-    return np.array([*best_vars, np.min(loss_data)])
+    if cache:
+        print(f'Job {i}: Done, cache: {opt.cache.stats()}')
+    else:
+        print(f'Job {i}: Done')
+
+    row = np.array([*best_vars, np.min(loss_data)])
+    if write_data:
+        return row, {
+            'job': i, 'loss': loss_data, 'init_chis': input_chis, 'best_vars': best_vars,
+            'trajectory': np.array(results['var_data']).T
+        }
+    return row
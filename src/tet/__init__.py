@@ -1,12 +1,53 @@
+import sys
+import types
+from importlib import import_module
+
 __all__ = [
-    'HamiltonianLoss', 
-    'data_process', 
+    'HamiltonianLoss',
+    'basis',
+    'numpy_backend',
+    'landscape',
+    'surrogate',
+    'sampling',
+    'workers',
+    'data_process',
     'constants',
-    'solver_mp', 
+    'solver_mp',
     'Optimizer'
 ]
 
 from .constants import system_constants, TensorflowParams, solver_params
-from .HamiltonianLoss import Loss
-from .Optimizer import Optimizer
-from .solver_mp import solver_mp
+
+# Names loaded on first access, so that importing the package does not import TensorFlow
+_lazy_names = {
+    'Loss': 'HamiltonianLoss',
+    'Optimizer': 'Optimizer',
+    'solver_mp': 'solver_mp',
+    'scan': 'landscape',
+}
+
+
+def __getattr__(name):
+    if name in _lazy_names:
+        value = getattr(import_module(f'.{_lazy_names[name]}', __name__), name)
+    elif name in __all__:
+        value = import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_lazy_names))
+
+
+class _Package(types.ModuleType):
+    # Importing the Optimizer and solver_mp submodules must not replace the class and the function of the same name
+    def __setattr__(self, name, value):
+        if name in _lazy_names and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -0,0 +1,266 @@
+import os
+import tempfile
+import numpy as np
+from math import comb
+from itertools import chain, combinations
+
+# Directory of the on-disk basis cache, shared by every process that uses the package
+CACHE_DIR = os.environ.get('TET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'tet'))
+
+# Bases already loaded by this process
+_basis_cache = {}
+
+
+# -------------------------------------------------------------------#
+
+def getDimension(max_N, sites):
+    """
+    Function that computes the number of ways to distribute N indistinguishable bosons in f distinguishable sites.
+
+    Args:
+        max_N (int): The number of bosons.
+        sites (int): The number of sites.
+
+    Returns:
+        int: The dimension of the Hilbert space, C(N+f-1, f-1).
+    """
+    return comb(max_N + sites - 1, sites - 1)
+
+
+# -------------------------------------------------------------------#
+
+def createBasis(max_N, sites):
+    """
+    Function that generates all the possible configurations of distributing N indistinguishable bosons in f
+    distinguishable sites, in descending lexicographic order. Each configuration corresponds to a choice of
+    f-1 bar positions among N+f-1 slots (stars and bars), so the occupations are the gaps between bars.
+
+    Args:
+        max_N (int): The number of bosons.
+        sites (int): The number of sites.
+
+    Returns:
+        np.ndarray: Integer array of shape (dim, sites) with the occupation numbers of each state.
+    """
+    dim = getDimension(max_N, sites)
+    bars = np.fromiter(
+        chain.from_iterable(combinations(range(max_N + sites - 1), sites - 1)),
+        dtype=np.int64, count=dim * (sites - 1)
+    ).reshape(dim, sites - 1)
+    edges = np.concatenate([np.full((dim, 1), -1), bars, np.full((dim, 1), max_N + sites - 1)], axis=1)
+
+    # Bars in ascending order give the states in ascending order
+    return np.ascontiguousarray((np.diff(edges, axis=1) - 1)[::-1])
+
+
+# -------------------------------------------------------------------#
+
+def getBasis(max_N, sites, cache_dir=CACHE_DIR):
+    """
+    Function that returns the basis of the problem from the on-disk cache, computing and saving it on the first use.
+    The cached file is memory-mapped read-only, so every process loads it without recomputing it. A truncated or
+    corrupt cache file is replaced.
+
+    Args:
+        max_N (int): The number of bosons.
+        sites (int): The number of sites.
+        cache_dir (str, optional): Directory of the cache. If None, the basis is not saved to disk. Defaults to CACHE_DIR.
+
+    Returns:
+        np.ndarray: Read-only integer array of shape (dim, sites) with the occupation numbers of each state.
+    """
+    key = (max_N, sites)
+    if key in _basis_cache:
+        return _basis_cache[key]
+
+    if cache_dir is None:
+        states = createBasis(max_N, sites)
+        states.setflags(write=False)
+    else:
+        path = os.path.join(cache_dir, f'basis_N{max_N}_f{sites}.npy')
+        try:
+            try:
+                states = _loadBasis(path, max_N, sites) if os.path.exists(path) else None
+            except (ValueError, EOFError):
+                # ! A truncated or corrupt file would make every later run fail, replace it
+                os.remove(path)
+                states = None
+            if states is None:
+                _saveBasis(path, createBasis(max_N, sites))
+                states = _loadBasis(path, max_N, sites)
+        except (OSError, ValueError, EOFError):
+            states = createBasis(max_N, sites)
+            states.setflags(write=False)
+
+    _basis_cache[key] = states
+    return states
+
+
+def _loadBasis(path, max_N, sites):
+    states = np.load(path, mmap_mode='r')
+    if states.shape != (getDimension(max_N, sites), sites):
+        raise ValueError(f'{path} does not hold the basis of {max_N} bosons in {sites} sites.')
+    return states
+
+
+def _saveBasis(path, states):
+    # Write to a temporary file first so that other processes never read a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, states)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# -------------------------------------------------------------------#
+
+def getRankTable(max_N, sites):
+    """
+    Function that builds the lookup table of the combinatorial number system for the bosonic basis.
+    The basis is ordered lexicographically in descending order, starting from the state with all the bosons
+    on the donor site. Element [k, r, n] of the table is the number of states that precede the states with
+    n bosons on site k, among the states that share the same occupations of sites 0..k-1 and have r bosons left.
+
+    Args:
+        max_N (int): The number of bosons.
+        sites (int): The number of sites.
+
+    Returns:
+        np.ndarray: Integer array of shape (sites-1, max_N+1, max_N+1).
+    """
+    table = np.zeros((max(sites - 1, 0), max_N + 1, max_N + 1), dtype=np.int64)
+    for k in range(sites - 1):
+        # Number of sites after site k
+        s = sites - k - 1
+        for r in range(max_N + 1):
+            # Every occupation v > n of site k precedes n and leaves r-v bosons for the remaining sites
+            counts = [comb(r - v + s - 1, s - 1) for v in range(r + 1)]
+            for n in range(r + 1):
+                table[k, r, n] = sum(counts[n + 1:])
+    return table
+
+
+# -------------------------------------------------------------------#
+
+def rankStates(states, table):
+    """
+    Function that maps occupation number states to their index in the basis with O(sites) integer lookups.
+
+    Args:
+        states (np.ndarray): A state of shape (sites,) or an array of states of shape (..., sites).
+        table (np.ndarray): The table produced by getRankTable.
+
+    Returns:
+        np.ndarray: The indices of the states.
+    """
+    states = np.asarray(states).astype(np.int64)
+    remaining = states.sum(axis=-1, keepdims=True) - np.cumsum(states, axis=-1) + states
+    ranks = np.zeros(states.shape[:-1], dtype=np.int64)
+    for k in range(table.shape[0]):
+        ranks += table[k, remaining[..., k], states[..., k]]
+    return ranks
+
+
+# -------------------------------------------------------------------#
+
+def unrankStates(ranks, max_N, table):
+    """
+    Function that maps basis indices back to occupation number states. Inverse of rankStates.
+
+    Args:
+        ranks (np.ndarray): Integer or array of integer indices.
+        max_N (int): The number of bosons.
+        table (np.ndarray): The table produced by getRankTable.
+
+    Returns:
+        np.ndarray: The states, of shape (..., sites).
+    """
+    ranks = np.array(ranks, dtype=np.int64)
+    remaining = np.full(ranks.shape, max_N, dtype=np.int64)
+    states = np.zeros(ranks.shape + (table.shape[0] + 1,), dtype=np.int64)
+    for k in range(table.shape[0]):
+        # The occupation of site k is the smallest n whose preceding states do not exceed the rank
+        row = table[k, remaining]
+        n = np.argmax(row <= ranks[..., None], axis=-1)
+        ranks = ranks - np.take_along_axis(row, n[..., None], axis=-1)[..., 0]
+        remaining = remaining - n
+        states[..., k] = n
+    states[..., -1] = remaining
+    return states
+
+
+# -------------------------------------------------------------------#
+
+def getHoppingArrays(states, table, coupling):
+    """
+    Function that builds the connectivity of the coupling term of the Hamiltonian in coordinate (COO) format.
+    A boson hopping from site k to site k+1 connects the state m to the state n with an amplitude
+    -coupling*sqrt(n_k*(n_{k+1}+1)), and the reverse hop gives the transposed element.
+
+    Args:
+        states (np.ndarray): The basis, of shape (dim, sites).
+        table (np.ndarray): The table produced by getRankTable.
+        coupling (float): The coupling parameter.
+
+    Returns:
+        tuple: The (row, column) indices of shape (nnz, 2) and the values of shape (nnz,) of the nonzero elements.
+    """
+    rows, cols, values = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    for k in range(states.shape[1] - 1):
+        # States with at least one boson on site k
+        m = np.nonzero(states[:, k])[0]
+        nk = states[m, k]
+        nkplusone = states[m, k + 1]
+
+        # Find the indices of the states after the hop
+        m_tilda_states = states[m].copy()
+        m_tilda_states[:, k] = nk - 1
+        m_tilda_states[:, k + 1] = nkplusone + 1
+        n = rankStates(m_tilda_states, table)
+
+        amplitude = -coupling * np.sqrt((nkplusone + 1) * nk)
+        rows += [n, m]
+        cols += [m, n]
+        values += [amplitude, amplitude]
+
+    return np.stack([np.concatenate(rows), np.concatenate(cols)], axis=1).astype(np.int64), np.concatenate(values)
+
+
+# -------------------------------------------------------------------#
+
+def getConstantOperators(states, table, hop_indices, hop_values, omegas):
+    """
+    Function that precomputes the parts of the Hamiltonian that do not depend on the nonlinearity parameters, shared by
+    the backends.
+
+    Args:
+        states (np.ndarray): The basis, of shape (dim, sites).
+        table (np.ndarray): The table produced by getRankTable.
+        hop_indices (np.ndarray): The indices of the coupling term, produced by getHoppingArrays.
+        hop_values (np.ndarray): The values of the coupling term, produced by getHoppingArrays.
+        omegas (list): The frequencies of the oscillators.
+
+    Returns:
+        tuple: The diagonal of the frequency term of shape (dim,), the per-site diagonals 0.5*n_k^2 that multiply each
+        chi_k of shape (dim, sites), the off-diagonal of the coupling term of shape (dim-1,) for a dimer and None
+        otherwise, and the index of the initial state (all bosons on the donor site).
+    """
+    dim, sites = states.shape
+    omega_diagonal = states @ np.asarray(omegas, dtype=np.float64)
+    chi_diagonals = 0.5 * states ** 2
+
+    # In the dimer case the only couplings are between consecutive states |n, N-n> and |n-1, N-n+1>
+    offdiagonal = None
+    if sites == 2:
+        offdiagonal = np.zeros(dim - 1)
+        offdiagonal[np.minimum(hop_indices[:, 0], hop_indices[:, 1])] = hop_values
+
+    initial_state = np.zeros(sites)
+    initial_state[0] = states[0].sum()
+    init_idx = int(rankStates(initial_state, table))
+
+    return omega_diagonal, chi_diagonals, offdiagonal, init_idx
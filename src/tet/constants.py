@@ -1,6 +1,5 @@
 import os
 import json
-from tensorflow import float64
 
 # -------------------------------------------------------------------#
 
@@ -33,13 +32,13 @@ system_constants['sites'] = len(system_constants['omegas'])
 TensorflowParams: A dictionary that includes the parameters used for the commands of the Tensorflow library
 
 Elements:
-    DTYPE: dtype of parameters
+    DTYPE: Name of the dtype of parameters, e.g. 'float64'
     lr: The default value of the learning rate of each optimizer
     iterations: The default number of maximum Iterations of each optimizer
     tol: The tolerance of each optimizer concerning the changes in the nonlinearity parameters
     train_sites: A list including the nonlinearity parameters to be optimized. Counting ranges from 0 to f-1.
 """
-TensorflowParams = {'DTYPE': float64,
+TensorflowParams = {'DTYPE': 'float64',
                     'lr': 0.1,
                     'beta_1': 0.9,
                     'amsgrad': False,
@@ -58,6 +57,7 @@ solver_params: A dictionary that defines a set of parameters used in the solver_
 
 Elements:
     methods: Must remain immutable. A list with the possible methods of setting the initial guesses of the optimizers.
+    'sobol', 'lhs' and 'stratified' draw a given number of spread out guesses in any dimension, refer to sampling.py.
     target: Taking values of the format xk, where k is integer ranging from 0 to f-1. 
     It determines the site of which you desire to compute the loss function.Default value is x{f-1}, 
     referring to the acceptor. 
@@ -66,12 +66,33 @@ Elements:
     epochs_bins: The maximum iterations of each optimizer when using the bins method
 
 """
-solver_params = {'methods': ['grid', 'bins'],
+solver_params = {'methods': ['grid', 'bins', 'surrogate', 'sobol', 'lhs', 'stratified'],
                  'target': acceptor,
                  'Npoints': 2,
                  'epochs_grid': 500,
                  'epochs_bins': 1000}
 
+# -------------------------------------------------------------------#
+"""
+backends: The implementations of the loss function and of the optimizers that solver_mp can use. 'tensorflow' refers
+to HamiltonianLoss.Loss and Optimizer.Optimizer, 'numpy' to the classes of numpy_backend.py, which do not need TensorFlow.
+"""
+backends = ['tensorflow', 'numpy']
+
+# -------------------------------------------------------------------#
+"""
+searches: The ways solver_mp can spend the epochs of an iteration. 'full' trains every initial guess for all the epochs,
+'halving' trains them briefly and keeps training only the best ones (successive halving).
+"""
+searches = ['full', 'halving']
+
+# -------------------------------------------------------------------#
+"""
+time_searches: The methods of finding the extremum of the average occupation in time, refer to HamiltonianLoss.Loss.
+'grid' uses the timesteps grid, 'refine' refines the best points of a coarse grid with Newton steps.
+"""
+time_searches = ['grid', 'refine']
+
 # -------------------------------------------------------------------#
 """
 Create a dictionary with the limits of each trainable nonlinearity parameter.
@@ -1,6 +1,7 @@
 import numpy as np
 import os
 import sys
+import json
 from os.path import exists
 
 
@@ -44,17 +45,7 @@ def write_min_N(xa, xd, min_n, destination, name_of_file):
         name_of_file (str): How to name the file.
     """
 
-    z = min_n.flatten(order='C')
-    x = xd.flatten(order='C')
-    y = xa.flatten(order='C')
-    k = list(np.zeros(len(z)))
-
-    for i in range(len(min_n)):
-        for j in range(len(min_n)):
-            index = len(xa) * i + j
-            k[index] = x[index], y[index], z[index]
-
-    temp_arr = np.array(k)
+    temp_arr = np.column_stack([np.ravel(xd, order='C'), np.ravel(xa, order='C'), np.ravel(min_n, order='C')])
     writeData(data=temp_arr, destination=destination, name_of_file=name_of_file)
 
 
@@ -103,3 +94,196 @@ def createDir(destination, replace_query=True):
                 sys.exit(0)
     else:
         os.makedirs(destination, exist_ok=True)
+
+
+# -------------------------------------------------------------------#
+
+# Name of the result file of each iteration directory of solver_mp
+RESULTS_FILE = 'results.dat'
+
+
+class ResultStore:
+    """
+    Binary store of the results of the optimizers of one solver_mp iteration. Every optimizer is one chunk appended to
+    the file, made of a header with its job id and its sizes and of the float64 arrays of its losses, its initial
+    guesses, its best parameters and its trajectory. The reader side memory-maps the file, so the arrays of a job are
+    views of the file instead of parsed copies.
+
+    File layout (little-endian):
+        b'TETRES01', sites (int64)
+        per job: job, number of losses, number of trajectory points (int64),
+                 losses, init_chis[sites], best_vars[sites], trajectory[points, sites] (float64)
+
+    Args:
+        path (str): Path of the file.
+        sites (int, optional): Number of nonlinearity parameters of the system. Needed to create the file. Defaults to None.
+    """
+
+    MAGIC = b'TETRES01'
+
+    def __init__(self, path, sites=None):
+        self.path = path
+        self.sites = sites
+        self._index = None
+        self._map = None
+        self._size = -1
+        if os.path.exists(path) and os.path.getsize(path) >= 16:
+            with open(path, 'rb') as f:
+                header = f.read(16)
+            if header[:8] != self.MAGIC:
+                raise ValueError(f'{path} is not a result store.')
+            stored_sites = int(np.frombuffer(header[8:], dtype='<i8')[0])
+            if sites is not None and sites != stored_sites:
+                raise ValueError(f'{path} stores {stored_sites} parameters per job, not {sites}.')
+            self.sites = stored_sites
+
+    # ! Append the chunks of a list of jobs with one write. Each record is a dict with the keys job, loss, init_chis,
+    # best_vars and trajectory
+    def write(self, records):
+        if self.sites is None:
+            raise ValueError('The number of sites is needed to create a result store.')
+        chunks = []
+        for record in records:
+            losses = np.asarray(record['loss'], dtype='<f8').ravel()
+            trajectory = np.asarray(record['trajectory'], dtype='<f8').reshape(-1, self.sites)
+            chunks.append(np.array([record['job'], len(losses), len(trajectory)], dtype='<i8').tobytes())
+            chunks.append(np.concatenate([
+                losses,
+                np.asarray(record['init_chis'], dtype='<f8').ravel(),
+                np.asarray(record['best_vars'], dtype='<f8').ravel(),
+                trajectory.ravel()
+            ]).tobytes())
+        with open(self.path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(self.MAGIC + np.array([self.sites], dtype='<i8').tobytes())
+            f.write(b''.join(chunks))
+
+    # Map the file again if chunks were appended since the last read. A chunk cut short by an interrupted write is skipped
+    def _load(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size == self._size:
+            return
+        self._index = {}
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r') if size > 0 else None
+        offset = 16
+        while offset + 24 <= size:
+            job, n_losses, n_points = (int(x) for x in self._map[offset:offset + 24].view('<i8'))
+            end = offset + 24 + 8 * (n_losses + 2 * self.sites + n_points * self.sites)
+            if end > size:
+                break
+            self._index[job] = (offset + 24, n_losses, n_points)
+            offset = end
+        self._size = size
+        # End of the last whole chunk, or 0 if even the file header is incomplete
+        self._end = offset if size >= 16 else 0
+
+    def truncate(self):
+        """
+        Cuts the chunk that an interrupted write left incomplete at the end of the file, so that the chunks appended
+        afterwards are read back. A job written more than once keeps its last chunk.
+        """
+        if not os.path.exists(self.path):
+            return
+        self._load()
+        if self._end < self._size:
+            self._map = None
+            os.truncate(self.path, self._end)
+            self._size = -1
+
+    @property
+    def jobs(self):
+        self._load()
+        return np.array(sorted(self._index), dtype=int)
+
+    def __len__(self):
+        self._load()
+        return len(self._index)
+
+    def __contains__(self, job):
+        self._load()
+        return job in self._index
+
+    def __getitem__(self, job):
+        """
+        Read-only views of the arrays of a job, backed by the memory map of the file.
+
+        Args:
+            job (int): Job id of the optimizer.
+
+        Returns:
+            dict: The losses, init_chis, best_vars and trajectory of the optimizer.
+        """
+        self._load()
+        offset, n_losses, n_points = self._index[job]
+        data = self._map[offset:offset + 8 * (n_losses + 2 * self.sites + n_points * self.sites)].view('<f8')
+        return {
+            'loss': data[:n_losses],
+            'init_chis': data[n_losses:n_losses + self.sites],
+            'best_vars': data[n_losses + self.sites:n_losses + 2 * self.sites],
+            'trajectory': data[n_losses + 2 * self.sites:].reshape(n_points, self.sites),
+        }
+
+    def summary(self):
+        """
+        Returns:
+            np.ndarray: One row per job, sorted by job id, with the best parameters and the minimum loss of the optimizer.
+        """
+        rows = []
+        for job in self.jobs:
+            entry = self[job]
+            rows.append([*entry['best_vars'], np.min(entry['loss']) if len(entry['loss']) else np.nan])
+        return np.array(rows).reshape(-1, self.sites + 1)
+
+
+def readResults(destination):
+    """
+    Opens the result store of an iteration directory of solver_mp for reading.
+
+    Args:
+        destination (str): Path of the iteration directory, or of the result file itself.
+
+    Returns:
+        ResultStore: The memory-mapped store.
+    """
+    path = os.path.join(destination, RESULTS_FILE) if os.path.isdir(destination) else destination
+    if not exists(path):
+        raise OSError(f'No result store at {path}')
+    return ResultStore(path)
+
+
+# -------------------------------------------------------------------#
+
+# Name of the checkpoint file of a solver_mp run in its data directory
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+def writeCheckpoint(state, destination):
+    """
+    Writes the state of a solver_mp run to the checkpoint file of its data directory. The file is replaced in one
+    step, so an interruption leaves either the previous checkpoint or the new one.
+
+    Args:
+        state (dict): JSON serializable state of the run, numpy arrays and numbers are converted.
+        destination (str): Path of the data directory.
+    """
+    path = os.path.join(destination, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, default=lambda value: value.tolist())
+    os.replace(path + '.tmp', path)
+
+
+def readCheckpoint(destination):
+    """
+    Reads the checkpoint of a solver_mp run.
+
+    Args:
+        destination (str): Path of the data directory of the run.
+
+    Returns:
+        dict: The state of the run, refer to solver_mp.
+    """
+    path = os.path.join(destination, CHECKPOINT_FILE)
+    if not exists(path):
+        raise OSError(f'No checkpoint at {path}')
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import multiprocessing as mp
+import numpy as np
+
+from .constants import solver_params, backends
+from .basis import getDimension
+from .data_process import createDir
+from .workers import initWorker, spawnContext
+
+# Number of float64 elements of the largest arrays of one batched evaluation, the points of a tile are evaluated in
+# batches that fit in it
+SCAN_BATCH_ELEMENTS = 2 ** 22
+
+# Files of a scan in its data directory
+LANDSCAPE_FILE = 'landscape.npy'
+PROGRESS_FILE = 'landscape_tiles.npy'
+META_FILE = 'landscape.json'
+
+
+# ----------------------------- Multiprocess Helper Function ----------------------------- #
+
+# Loss functions of each worker process, one per system and backend
+_worker_losses = {}
+
+
+def _workerLossKey(const, backend):
+    return (
+        const['max_N'], const['sites'], tuple(const['omegas']), const['coupling'], const['max_t'], const['timesteps'],
+        backend
+    )
+
+
+def _getWorkerLoss(const, backend):
+    key = _workerLossKey(const, backend)
+    if key not in _worker_losses:
+        # ! Import the backend in the worker, so that the numpy backend does not import TensorFlow
+        if backend == 'numpy':
+            from .numpy_backend import NumpyLoss
+            _worker_losses[key] = NumpyLoss(const=const)
+        else:
+            from .HamiltonianLoss import Loss
+            _worker_losses[key] = Loss(const=const)
+    return _worker_losses[key]
+
+
+def scanTile(
+        tile: int, start: int, stop: int, axes: list, train_sites: list,
+        const: dict, target_site: int, backend: str
+) -> tuple:
+    """
+    A helper function used for multiprocess. Evaluates the loss function on a range of points of the flattened grid.
+
+    Args:
+        tile (int): Index of the tile.
+        start (int): First flat index of the tile in the C ordered grid.
+        stop (int): Flat index following the last point of the tile.
+        axes (list): The values of each scanned nonlinearity parameter.
+        train_sites (list): Sites of the scanned nonlinearity parameters, one per axis.
+        const (dict): Refer to the constants dictionary in constants.py. The chis of the sites that are not scanned
+            keep their value.
+        target_site (int): Refer to the argument target of the solver_params dictionary in constants.py
+        backend (str): Implementation of the loss function, one of 'tensorflow' or 'numpy'.
+
+    Returns:
+        tuple: The index of the tile and the values of the loss function at its points.
+    """
+    loss = _getWorkerLoss(const, backend)
+
+    # ! Nonlinearity parameters of every point of the tile
+    indices = np.unravel_index(np.arange(start, stop), [len(axis) for axis in axes])
+    chis = np.tile(np.asarray(const['chis'], dtype=np.float64), (stop - start, 1))
+    for k, site in enumerate(train_sites):
+        chis[:, site] = np.asarray(axes[k])[indices[k]]
+
+    # The chebyshev engine keeps the Hamiltonian sparse, its arrays hold states instead of dim x dim matrices
+    dim = getDimension(const['max_N'], const['sites'])
+    width = const['timesteps'] if getattr(loss, 'engine', None) == 'chebyshev' else max(dim, const['timesteps'])
+    batch = max(1, SCAN_BATCH_ELEMENTS // (dim * width))
+    values = np.concatenate([
+        np.asarray(loss.batch_loss(chis[k:k + batch], site=target_site)) for k in range(0, len(chis), batch)
+    ])
+
+    return tile, values
+
+
+def _scanTileStar(args):
+    return scanTile(*args)
+
+
+def _scanMeta(axes, train_sites, const, target_site, tile_size) -> dict:
+    return {
+        'axes': [list(map(float, axis)) for axis in axes],
+        'train_sites': list(train_sites),
+        'const': {key: const[key] for key in ('max_N', 'sites', 'max_t', 'omegas', 'chis', 'coupling', 'timesteps')},
+        'target_site': target_site,
+        'tile_size': tile_size,
+    }
+
+
+def scan(
+        trainable_vars_limits: dict, const: dict, grid=solver_params['Npoints'], target_site=solver_params['target'],
+        data_path=os.path.join(os.getcwd(), 'data'), cpu_count=mp.cpu_count() // 2, tile_size=4096,
+        backend='tensorflow', resume=True
+) -> dict:
+    """
+    Evaluates the loss function on a grid of nonlinearity parameters, to map the loss landscape. The grid is split in
+    tiles of consecutive points that the workers evaluate in batches. The values are written to a memory-mapped .npy
+    file as the tiles complete, along with the list of completed tiles, so an interrupted scan resumes where it stopped
+    and the grid never has to fit in memory.
+
+    Args:
+        trainable_vars_limits (dict): The keys are the nonlinearity parameters of each scanned site and the values include a list with the limits of the said variable.
+        const (dict): Dictionary of system parameters that follows the convention used by the tet.constants() module. The chis of the sites that are not scanned keep their value.
+        grid (int or list, optional): Number of points of each axis, or one number per axis. Defaults to 2.
+        target_site (int, optional): Refer to the argument target of the solver_params dictionary in constants.py. Defaults to solver_params['target'].
+        data_path (str, optional): Directory of the scan files. Defaults to os.path.join(os.getcwd(), 'data').
+        cpu_count (int, optional): Number of worker processes. Defaults to mp.cpu_count() // 2.
+        tile_size (int, optional): Number of points of a tile. Defaults to 4096.
+        backend (str, optional): Implementation of the loss function, one of 'tensorflow' or 'numpy'. Defaults to 'tensorflow'.
+        resume (bool, optional): Whether to continue the scan of data_path if it has the same parameters. If False, the scan starts over. Defaults to True.
+
+    Returns:
+        dict: The axes, the memory-mapped landscape of shape [len(axis) for axis in axes], and the chis and value of its minimum.
+    """
+    if backend not in backends:
+        raise ValueError(f'Provided backend not in list of supported backends {backends}')
+
+    # ! Use cpu since we are doing parallelization on the cpu
+    os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+    createDir(destination=data_path, replace_query=False)
+
+    # get train_sites from limits of trainable parameters by parsing elements in strings
+    train_sites = [int(key[1]) for key in trainable_vars_limits.keys()]
+    lims = list(trainable_vars_limits.values())
+    points = list(grid) if np.ndim(grid) else [grid] * len(lims)
+    axes = [np.linspace(lim[0], lim[1], n) for lim, n in zip(lims, points)]
+    shape = tuple(points)
+    size = int(np.prod(shape))
+    n_tiles = -(-size // tile_size)
+
+    landscape_path = os.path.join(data_path, LANDSCAPE_FILE)
+    progress_path = os.path.join(data_path, PROGRESS_FILE)
+    meta_path = os.path.join(data_path, META_FILE)
+    meta = _scanMeta(axes, train_sites, const, target_site, tile_size)
+
+    # ! Continue a previous scan of the same grid, or start a new one
+    resumed = False
+    if resume and all(os.path.exists(path) for path in (landscape_path, progress_path, meta_path)):
+        with open(meta_path, 'r') as f:
+            if json.load(f) != json.loads(json.dumps(meta)):
+                raise ValueError(f'{data_path} holds a scan with different parameters, use resume=False to replace it.')
+        landscape = np.lib.format.open_memmap(landscape_path, mode='r+')
+        done = np.lib.format.open_memmap(progress_path, mode='r+')
+        resumed = True
+    else:
+        landscape = np.lib.format.open_memmap(landscape_path, mode='w+', dtype=np.float64, shape=shape)
+        landscape[...] = np.nan
+        landscape.flush()
+        done = np.lib.format.open_memmap(progress_path, mode='w+', dtype=bool, shape=(n_tiles,))
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    tiles = np.flatnonzero(~done)
+    print(10 * '-', f'Scan: {shape} points, Tiles: {len(tiles)}/{n_tiles}{" (resumed)" if resumed else ""}', 10 * '-')
+
+    t0 = time.time()
+    if len(tiles):
+        args = [
+            (int(tile), int(tile * tile_size), int(min(size, (tile + 1) * tile_size)), axes, train_sites, const,
+             target_site, backend)
+            for tile in tiles
+        ]
+        flat = landscape.reshape(-1)
+
+        pool = spawnContext().Pool(min(cpu_count, len(tiles)), initializer=initWorker, initargs=(None,))
+        try:
+            for k, (tile, values) in enumerate(pool.imap_unordered(_scanTileStar, args)):
+                flat[tile * tile_size:tile * tile_size + len(values)] = values
+
+                # The values reach the file before the tile is marked as done
+                landscape.flush()
+                done[tile] = True
+                done.flush()
+                print(f'Tile {tile}: Done ({k + 1}/{len(tiles)})')
+        except BaseException:
+            # The finished tiles are saved, stop the workers without waiting for the others, refer to solver_mp
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+    print('Scan run time: ', time.time() - t0, ' s')
+
+    # ! Find the minimum tile by tile, without loading the whole landscape
+    flat = landscape.reshape(-1)
+    min_loss, min_index = np.inf, 0
+    for start in range(0, size, tile_size):
+        values = flat[start:start + tile_size]
+        if np.all(np.isnan(values)):
+            continue
+        index = int(np.nanargmin(values))
+        if values[index] < min_loss:
+            min_loss, min_index = float(values[index]), start + index
+    indices = np.unravel_index(min_index, shape)
+    chis = list(map(float, const['chis']))
+    for k, site in enumerate(train_sites):
+        chis[site] = float(axes[k][indices[k]])
+
+    return {
+        'axes': axes,
+        'landscape': np.load(landscape_path, mmap_mode='r'),
+        'chis': chis,
+        'min_n': min_loss,
+    }
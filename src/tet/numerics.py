@@ -0,0 +1,38 @@
+import numpy as np
+
+# Energy differences below this (relative to the spectral scale) are treated as degenerate by the analytic gradient
+DEGENERACY_TOL = 1e-9
+# Below this dimension the dense eigh is faster than the tridiagonal solver for dimers
+TRIDIAGONAL_MIN_DIM = 100
+
+
+def adamStep(grads, m, v, v_hat, step, lr, beta_1, beta_2, epsilon, amsgrad):
+    """
+    One step of Adam, shared by the optimizers of both backends so that they follow the same trajectories. The arrays
+    are not modified in place.
+
+    Args:
+        grads (np.ndarray): The gradients of the loss.
+        m (np.ndarray): The first moment estimates, same shape as grads.
+        v (np.ndarray): The second moment estimates, same shape as grads.
+        v_hat (np.ndarray): The maximum of the second moment estimates, only used if amsgrad is True.
+        step (Union[int, np.ndarray]): The number of the step, starting from 1. Must broadcast against grads.
+        lr (Union[float, np.ndarray]): The learning rate. Must broadcast against grads.
+        beta_1 (float): beta_1 parameter of Adam.
+        beta_2 (float): beta_2 parameter of Adam.
+        epsilon (float): epsilon parameter of Adam.
+        amsgrad (bool): Whether to use the amsgrad version of Adam.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The update to subtract from the parameters and the new
+        m, v and v_hat.
+    """
+    m = m + (grads - m) * (1 - beta_1)
+    v = v + (grads ** 2 - v) * (1 - beta_2)
+    if amsgrad:
+        v_hat = np.maximum(v_hat, v)
+        denominator = np.sqrt(v_hat) + epsilon
+    else:
+        denominator = np.sqrt(v) + epsilon
+    alpha = lr * np.sqrt(1 - beta_2 ** step) / (1 - beta_1 ** step)
+    return alpha * m / denominator, m, v, v_hat
@@ -0,0 +1,360 @@
+import os
+import time
+from typing import Tuple, Union
+import numpy as np
+
+from .basis import getBasis, getDimension, getRankTable, getHoppingArrays, getConstantOperators
+from .constants import TensorflowParams
+from .data_process import createDir, writeData
+from .numerics import DEGENERACY_TOL, TRIDIAGONAL_MIN_DIM, adamStep
+from .workers import stopRequested
+
+try:
+    from scipy.linalg import eigh_tridiagonal
+except ImportError:
+    eigh_tridiagonal = None
+
+
+class NumpyLoss:
+    """
+    A NumPy implementation of the loss function of HamiltonianLoss.Loss, along with its gradient, for processes that
+    should not import TensorFlow. It diagonalizes the Hamiltonian with LAPACK, using the tridiagonal solver of scipy
+    for dimers with dim > TRIDIAGONAL_MIN_DIM, and searches the extremum on the timesteps grid.
+
+    Args:
+        const (dict): Refer to the system_constants dictionary in constants.py.
+    """
+
+    def __init__(self, const):
+        # Import the parameters of the problem
+        self.max_N = const['max_N']
+        self.sites = const['sites']
+        self.dim = getDimension(self.max_N, self.sites)
+        self.targetState = self.sites - 1
+        self.t_span = np.linspace(0, const['max_t'], const['timesteps'])
+
+        # The basis and the chi independent part of the Hamiltonian
+        self.states = getBasis(self.max_N, self.sites)
+        rank_table = getRankTable(self.max_N, self.sites)
+        hop_indices, hop_values = getHoppingArrays(self.states, rank_table, const['coupling'])
+        self.omega_diagonal, self.chi_diagonals, self.offdiagonal, self.init_idx = getConstantOperators(
+            self.states, rank_table, hop_indices, hop_values, const['omegas'])
+
+        # Dimers with large bases are diagonalized with the tridiagonal solver
+        self.tridiagonal = self.sites == 2 and self.dim > TRIDIAGONAL_MIN_DIM and eigh_tridiagonal is not None
+        if not self.tridiagonal:
+            self.h_constant = np.zeros((self.dim, self.dim))
+            self.h_constant[hop_indices[:, 0], hop_indices[:, 1]] = hop_values
+
+    def __call__(self, chis, site=0, single_value=True):
+        self.setTarget(site)
+        self.setCoefs(chis)
+        data = self._computeAverageCalculation(self.t_span)
+        if single_value:
+            if self.targetState == self.sites - 1:
+                return self.max_N - np.max(data)
+            else:
+                return np.min(data)
+        else:
+            return data
+
+    def batch_loss(self, chis, site=0, single_value=True):
+        """
+        Computes the loss function for a batch of nonlinearity parameters, with one stacked diagonalization. Same as
+        Loss.batch_loss.
+
+        Args:
+            chis (np.ndarray): Array of shape [B, sites] with one combination of nonlinearity parameters per row.
+            site (int, optional): The target site. Defaults to 0.
+            single_value (bool, optional): If False, return the average occupation of the target site at every time step. Defaults to True.
+
+        Returns:
+            np.ndarray: The B values of the loss function, or a [B, timesteps] array if single_value is False.
+        """
+        self.setTarget(site)
+        diagonals = self.omega_diagonal + np.asarray(chis, dtype=np.float64) @ self.chi_diagonals.T
+        if self.tridiagonal:
+            eigvals, bcoeffs = zip(*[eigh_tridiagonal(diagonal, self.offdiagonal) for diagonal in diagonals])
+            eigvals, bcoeffs = np.array(eigvals), np.array(bcoeffs)
+        else:
+            h = np.repeat(self.h_constant[None], len(diagonals), axis=0)
+            h[:, np.arange(self.dim), np.arange(self.dim)] = diagonals
+            eigvals, bcoeffs = np.linalg.eigh(h)
+
+        evolution = np.exp(-1j * self.t_span[None, :, None] * eigvals[:, None, :]) * bcoeffs[:, None, self.init_idx, :]
+        amplitudes = evolution @ np.swapaxes(bcoeffs, -1, -2)
+        data = (amplitudes.real ** 2 + amplitudes.imag ** 2) @ self.states[:, self.targetState]
+        if single_value:
+            if self.targetState == self.sites - 1:
+                return self.max_N - np.max(data, axis=-1)
+            else:
+                return np.min(data, axis=-1)
+        else:
+            return data
+
+    def setTarget(self, site):
+        if type(site) == str:
+            site = int(site[-1])
+        elif type(site) != int:
+            raise ValueError("Invalid type for site variable. Must be int.")
+        self.targetState = site
+
+    def setCoefs(self, chis):
+        diagonal = self.omega_diagonal + self.chi_diagonals @ np.asarray(chis, dtype=np.float64)
+        if self.tridiagonal:
+            self.eigvals, self.bcoeffs = eigh_tridiagonal(diagonal, self.offdiagonal)
+        else:
+            h = self.h_constant.copy()
+            h[np.diag_indices(self.dim)] = diagonal
+            self.eigvals, self.bcoeffs = np.linalg.eigh(h)
+
+        # Overlaps of the eigenvectors with the initial state
+        self.ccoeffs = self.bcoeffs[self.init_idx]
+
+    def _computeAverageCalculation(self, t_span):
+        """
+        Computes the average number of bosons of the target site for all the times in t_span, using
+        <n(t)> = sum_j n_j |sum_i c_i b_ji exp(-i E_i t)|^2.
+
+        Args:
+            t_span (np.ndarray): 1D array of times.
+
+        Returns:
+            np.ndarray: The average occupation of the target site at each time.
+        """
+        evolution = np.exp(-1j * np.outer(t_span, self.eigvals)) * self.ccoeffs
+        amplitudes = evolution @ self.bcoeffs.T
+        return (amplitudes.real ** 2 + amplitudes.imag ** 2) @ self.states[:, self.targetState]
+
+    def valueAndGrad(self, chis, site=0):
+        """
+        Computes the loss function and its gradient with respect to the chis. The loss only depends on the average
+        occupation at the extremal time step t, whose derivative is 2Re(p^T (G o V^T dH V) c), with
+        p = V^T (n o conj(psi(t))) and G_il = (f_i - f_l)/(E_i - E_l) the divided differences of f = exp(-iEt).
+        Degenerate pairs of eigenvalues use the derivative -it exp(-iEt) instead. Same as Loss._evolveGradient.
+
+        Args:
+            chis (list): The nonlinearity parameters.
+            site (int, optional): The target site. Defaults to 0.
+
+        Returns:
+            tuple: The value of the loss function and its gradient, of shape (sites,).
+        """
+        data = self(chis, site=site, single_value=False)
+        if self.targetState == self.sites - 1:
+            index, sign = np.argmax(data), -1.
+            loss = self.max_N - data[index]
+        else:
+            index, sign = np.argmin(data), 1.
+            loss = data[index]
+        t = self.t_span[index]
+
+        phases = np.exp(-1j * t * self.eigvals)
+        psi = self.bcoeffs @ (phases * self.ccoeffs)
+        p = (self.states[:, self.targetState] * np.conj(psi)) @ self.bcoeffs
+
+        delta = self.eigvals[:, None] - self.eigvals[None, :]
+        tol = DEGENERACY_TOL * max(np.max(np.abs(self.eigvals)), 1.)
+        degenerate = np.abs(delta) <= tol
+        safe_delta = np.where(degenerate, 1., delta)
+        w = np.where(
+            degenerate,
+            (p * -1j * t * phases)[:, None],
+            ((p * phases)[:, None] - np.outer(p, phases)) / safe_delta
+        ) * self.ccoeffs[None, :]
+
+        diagonal = np.sum((self.bcoeffs @ w.real) * self.bcoeffs, axis=-1)
+        return loss, sign * 2 * diagonal @ self.chi_diagonals
+
+
+class NumpyOptimizer:
+    """
+    An optimizer with the same rules and results as Optimizer.Optimizer, that uses NumpyLoss and its own Adam update,
+    so that it runs without TensorFlow.
+
+    Args:
+        const (dict): Refer to the system_constants dictionary in constants.py.
+        target_site (int): Refer to the argument target of the solver_params dictionary in constants.py
+        Print (bool, optional): Parameter defining if to print results of optimization on the console. Defaults to True.
+        iterations (int, optional): Maximum iterations of the optimizer. Defaults to the value from constants.py.
+        train_sites (list, optional): Sites of the nonlinearity parameters to train. Defaults to the value from constants.py.
+        lr (float, optional): Learning rate of Adam. Defaults to the value from constants.py.
+        beta_1 (float, optional): beta_1 parameter of Adam. Defaults to the value from constants.py.
+        beta_2 (float, optional): beta_2 parameter of Adam. Defaults to 0.999.
+        epsilon (float, optional): epsilon parameter of Adam. Defaults to 1e-7.
+        amsgrad (bool, optional): Whether to use the amsgrad version of Adam. Defaults to the value from constants.py.
+        data_path (str, optional): Path to save the directory of an optimizer with given initial guesses. Defaults to os.path.join(os.getcwd(), 'data_optimizer').
+    """
+
+    def __init__(
+            self, const: dict, target_site: int, Print=True,
+            iterations=TensorflowParams['iterations'],
+            train_sites=TensorflowParams['train_sites'],
+            lr=TensorflowParams['lr'], beta_1=TensorflowParams['beta_1'], beta_2=0.999, epsilon=1e-7,
+            amsgrad=TensorflowParams['amsgrad'],
+            data_path=os.path.join(os.getcwd(), 'data_optimizer')
+    ):
+        self.const = const
+        self.max_n = self.const['max_N']
+        self.sites = self.const['sites']
+        self.target_site = target_site
+        self.Print = Print
+        self.iter = iterations
+        self.train_sites = train_sites
+        self.lr = lr
+        self.beta_1 = beta_1
+        self.beta_2 = beta_2
+        self.epsilon = epsilon
+        self.amsgrad = amsgrad
+        self.data_path = data_path
+
+        self.loss = NumpyLoss(const=self.const)
+
+    def __call__(self, *args, write_data=False):
+        self.init_chis = list(args)
+        if write_data:
+            createDir(self.data_path, replace_query=False)
+        self._train(write_data)
+        return self.results
+
+    def train(self, initial_chis):
+        chis = np.array(initial_chis, dtype=np.float64)
+        trainable = np.isin(np.arange(len(chis)), self.train_sites)
+        self.tol = TensorflowParams['tol']
+
+        # Adam state
+        m = np.zeros_like(chis)
+        v = np.zeros_like(chis)
+        v_hat = np.zeros_like(chis)
+        lr = self.lr
+
+        mylosses = [self.max_n]
+        best_loss = self.max_n
+        best_vars = np.zeros_like(chis)
+        var_data = [[] for _ in range(len(chis))]
+        var_error_count = np.zeros(len(chis), dtype=int)
+
+        t0 = time.time()
+        for epoch in range(self.iter):
+            _chis = chis.copy()
+            loss, grads = self.loss.valueAndGrad(chis, site=self.target_site)
+
+            if self.Print and epoch % 50 == 0:
+                print(f'Loss:{loss}, ', *[f'x{j}: {chis[j]}, ' for j in range(len(chis))], f', epoch:{epoch}')
+
+            # Reduce the learning rate when being close to TET
+            if loss <= 0.1:
+                lr = 0.0001
+
+            # Keep the minimum loss and the corresponding parameters
+            if loss < best_loss:
+                best_vars = _chis
+                best_loss = loss
+            mylosses.append(loss)
+
+            # Adam update of the trainable parameters
+            grads = np.where(trainable, grads, 0.)
+            step, m, v, v_hat = adamStep(
+                grads, m, v, v_hat, epoch + 1, lr, self.beta_1, self.beta_2, self.epsilon, self.amsgrad
+            )
+            chis = np.where(trainable, chis - step, chis)
+            var_error = np.abs(chis - _chis)
+
+            # Go 1 step back if loss is reduced too fast
+            if mylosses[-1] - mylosses[-2] >= 0.5 and loss >= 0.5:
+                chis = _chis
+
+            # Keep the changes of the variables per 10 steps for plotting
+            if (epoch + 1) % 10 == 0:
+                for k in range(len(chis)):
+                    var_data[k].append(chis[k])
+
+            # Interrupt in case of TET
+            if np.abs(loss) < 0.1:
+                break
+
+            # Interrupt if the parent process cancelled the job
+            if stopRequested():
+                break
+
+            # Interrupt in case of non-progress
+            var_error_count += (var_error < self.tol) & trainable
+            if np.any(var_error_count > 2):
+                break
+
+        if self.Print:
+            print(
+                *[f"\nApproximate value of chi_{j}: {best_vars[j]}" for j in range(len(chis))],
+                "\nLoss:", best_loss,
+                "\nOptimizer Iterations:", epoch + 1,
+                "\nTraining Time:", time.time() - t0,
+                "\n" + 60 * "-"
+            )
+        return mylosses, var_data, best_vars
+
+    # ! Run the optimizer for given initial guesses and save trajectories.
+    def _train(self, write_data: bool):
+        mylosses, var_data, best_vars = self.train(self.init_chis)
+
+        if write_data:
+            writeData(data=mylosses[1:], destination=self.data_path, name_of_file='losses.txt')
+            writeData(data=self.init_chis, destination=self.data_path, name_of_file='init_chis.txt')
+            for i in range(len(var_data)):
+                writeData(data=var_data[i], destination=self.data_path, name_of_file=f'x{i}trajectory.txt')
+
+        self.results = {
+            'loss': mylosses[1:],
+            'var_data': var_data,
+            'best_vars': list(best_vars),
+        }
+
+
+# ----------------------------- Multiprocess Helper Function ----------------------------- #
+
+def mp_opt(
+        i: int, combination: list, iteration_path: str,
+        const: dict, target_site: int, iterations: int,
+        lr: float, beta_1: float, amsgrad_bool: bool,
+        write_data: bool, train_sites: list
+) -> Union[np.ndarray, Tuple[np.ndarray, dict]]:
+    """
+    The counterpart of Optimizer.mp_opt for the numpy backend.
+
+    Args:
+        i (int): Index referring to optimizer with specific initial guesses
+        combination (list): The initial guesses(referring to the trainable parameters) of the said optimizer
+        iteration_path (str): Path of the iteration directory.
+        const (dict): Refer to the constants dictionary in constants.py.
+        target_site(int): Refer to the argument target of the solver_params dictionary in constants.py
+        iterations(int): Maximum iterations of the optimizer
+        lr (float): Learning rate of Adam.
+        beta_1 (float): beta_1 parameter of Adam.
+        amsgrad_bool (bool): Whether to use the amsgrad version of Adam.
+        write_data (bool): Whether to also return the record of the job for the result store of the parent process.
+        train_sites (list): Sites of the nonlinearity parameters to train.
+    """
+    # Skip the job if it was cancelled before it started
+    if stopRequested():
+        print(f'Job {i}: Cancelled')
+        return None
+
+    opt = NumpyOptimizer(
+        const=const, target_site=target_site, Print=False, iterations=iterations, train_sites=train_sites,
+        lr=lr, beta_1=beta_1, amsgrad=amsgrad_bool, data_path=os.path.join(iteration_path, f'data_optimizer_{i}')
+    )
+
+    # Non-trainable parameters start from 0, as in Optimizer.mp_opt
+    input_chis = [0] * len(const['chis'])
+    for index, case in zip(train_sites, combination):
+        input_chis[index] = case
+
+    results = opt(*input_chis)
+    print(f'Job {i}: Done')
+
+    row = np.array([*results['best_vars'], np.min(results['loss'])])
+    if write_data:
+        return row, {
+            'job': i, 'loss': results['loss'], 'init_chis': input_chis, 'best_vars': results['best_vars'],
+            'trajectory': np.array(results['var_data']).T
+        }
+    return row
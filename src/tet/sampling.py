@@ -0,0 +1,126 @@
+import warnings
+import numpy as np
+
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+
+def _primes(n):
+    # The first n prime numbers, the bases of the Halton sequence
+    limit = max(16, int(n * (np.log(n + 1) + np.log(np.log(n + 2)))) + 16)
+    while True:
+        sieve = np.ones(limit, dtype=bool)
+        sieve[:2] = False
+        for k in range(2, int(limit ** 0.5) + 1):
+            if sieve[k]:
+                sieve[k * k::k] = False
+        primes = np.flatnonzero(sieve)
+        if len(primes) >= n:
+            return primes[:n]
+        limit *= 2
+
+
+def haltonSamples(n, d):
+    """
+    Randomly shifted Halton sequence in the unit box, the low-discrepancy fallback of sobolSamples without SciPy.
+
+    Args:
+        n (int): Number of points.
+        d (int): Number of dimensions.
+
+    Returns:
+        np.ndarray: Array of shape [n, d].
+    """
+    samples = np.zeros((n, d))
+    for k, base in enumerate(_primes(d)):
+        # ! Radical inverse of the indices 1, ..., n in the base, one digit of all the indices at a time
+        indices = np.arange(1, n + 1)
+        scale = 1.
+        while np.any(indices):
+            scale /= base
+            indices, digits = np.divmod(indices, base)
+            samples[:, k] += digits * scale
+    return (samples + np.random.uniform(size=d)) % 1
+
+
+def sobolSamples(n, d):
+    """
+    Scrambled Sobol sequence in the unit box. Falls back to haltonSamples if SciPy is not installed.
+
+    Args:
+        n (int): Number of points.
+        d (int): Number of dimensions.
+
+    Returns:
+        np.ndarray: Array of shape [n, d].
+    """
+    if qmc is None:
+        return haltonSamples(n, d)
+    # Numbers of points that are not powers of 2 only lose the balance of the last points
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        return qmc.Sobol(d, scramble=True, seed=np.random.randint(2 ** 31)).random(n)
+
+
+def latinHypercubeSamples(n, d):
+    """
+    Latin hypercube in the unit box. Every axis is split in n strata and each stratum holds exactly one point.
+
+    Args:
+        n (int): Number of points.
+        d (int): Number of dimensions.
+
+    Returns:
+        np.ndarray: Array of shape [n, d].
+    """
+    strata = np.argsort(np.random.uniform(size=(n, d)), axis=0)
+    return (strata + np.random.uniform(size=(n, d))) / n
+
+
+def stratifiedSamples(n, d):
+    """
+    Jittered grid in the unit box. The box is split in the k ** d cells of the largest k with k ** d <= n and each
+    cell holds one random point, the remaining points are placed with latinHypercubeSamples.
+
+    Args:
+        n (int): Number of points.
+        d (int): Number of dimensions.
+
+    Returns:
+        np.ndarray: Array of shape [n, d].
+    """
+    k = int(np.floor(n ** (1 / d) + 1e-9))
+    while k ** d > n:
+        k -= 1
+    cells = np.indices((k,) * d).reshape(d, -1).T
+    samples = (cells + np.random.uniform(size=cells.shape)) / k
+    if len(samples) < n:
+        samples = np.concatenate([samples, latinHypercubeSamples(n - len(samples), d)])
+    return samples
+
+
+# The samplers of getCombinations, by method name
+samplers = {
+    'sobol': sobolSamples,
+    'lhs': latinHypercubeSamples,
+    'stratified': stratifiedSamples,
+}
+
+
+def sampleCombinations(limits, n, method='sobol'):
+    """
+    Draws n initial guesses spread over the limits of the parameters with one of the samplers.
+
+    Args:
+        limits (list): The [lower, upper] limits of each parameter.
+        n (int): Number of initial guesses.
+        method (str, optional): One of the keys of samplers. Defaults to 'sobol'.
+
+    Returns:
+        list: A list of n tuples of initial guesses.
+    """
+    limits = np.asarray(limits, dtype=np.float64)
+    samples = samplers[method](n, limits.shape[0])
+    return list(map(tuple, limits[:, 0] + samples * (limits[:, 1] - limits[:, 0])))
@@ -2,21 +2,25 @@ from typing import Any
 import numpy as np
 import os
 import gc
+import json
 import time
 import multiprocessing as mp
+import queue
 from itertools import product
-import tensorflow as tf
 
-from .Optimizer import mp_opt, Optimizer
-from .data_process import createDir, read_1D_data
-from .constants import solver_params, TensorflowParams, dumpConstants
-
-tf.compat.v1.logging.set_verbosity(tf.compat.v1.logging.ERROR)
+# ! The modules of the tensorflow backend are imported where they are used, so that runs with the numpy backend never
+# import TensorFlow
+from . import numpy_backend
+from .data_process import createDir, read_1D_data, ResultStore, RESULTS_FILE, writeCheckpoint, readCheckpoint
+from .constants import solver_params, TensorflowParams, dumpConstants, backends, searches, time_searches
+from .workers import initWorker, spawnContext
+from .surrogate import proposeCombinations, updateTrustRegion
+from .sampling import samplers, sampleCombinations
 
 
 def getCombinations(
         trainable_vars_limits, train_sites=TensorflowParams['train_sites'],
-        method='bins', grid=solver_params['Npoints']
+        method='bins', grid=solver_params['Npoints'], history=None, samples=None, trust_region=None
 ):
     """
     Creates a list of initial guess pairs to be fed to an optimizer call
@@ -26,6 +30,9 @@ def getCombinations(
         trainable_vars_limits (dict): The keys are the nonlinearity parameters of each site and the values include a list with the limits of the said variable.
         method (str, optional): Method to use for creating Combinations list. Defaults to 'bins'.
         grid (int, optional): Number of times to split the parameter space. Defaults to 2.
+        history (tuple, optional): For the 'surrogate' method, the initial guesses of the previous optimizers, of shape [H, len(train_sites)], and their minimum loss, of shape [H]. Without history, 'surrogate' falls back to 'bins'. Defaults to None.
+        samples (int, optional): Number of initial guesses of the 'sobol', 'lhs', 'stratified' and 'surrogate' methods. If None, grid ** len(train_sites), as many as the 'grid' method produces. Defaults to None.
+        trust_region (tuple, optional): For the 'surrogate' method, the centre and the side of the box the initial guesses are proposed in, refer to surrogate.updateTrustRegion. If None, the whole limits. Defaults to None.
 
     Returns:
         list: A list of tuples, of all the initial guesses to try.
@@ -34,65 +41,243 @@ def getCombinations(
     method_list = solver_params['methods']
 
     if method not in method_list:
-        raise ValueError('Provided method not in list of supported methods [\'grid\', \'bins\']')
+        raise ValueError(f'Provided method not in list of supported methods {method_list}')
+
+    limits = [trainable_vars_limits[f'x{i}lims'] for i in train_sites]
+    if samples is None:
+        samples = grid ** len(train_sites)
+
+    # Propose samples initial guesses, by default as many as the other methods produce
+    if method == 'surrogate':
+        if history is not None and len(history[1]):
+            return proposeCombinations(history[0], history[1], limits, n=samples, trust_region=trust_region)
+        method = 'bins'
+
+    # Draw exactly samples low-discrepancy or stratified initial guesses, in any number of dimensions
+    if method in samplers:
+        return sampleCombinations(limits, samples, method=method)
 
-    # Works only in the dimer case
     if method == 'bins':
-        trainable_spans = [
-            np.linspace(trainable_vars_limits[f'x{i}lims'][0], trainable_vars_limits[f'x{i}lims'][1], grid)
-            for i in train_sites
-        ]
-        data = np.array(list(product(*trainable_spans)))
-        data_list = [data[:, i] for i in range(data.shape[1])]
+        trainable_spans = [np.linspace(lim[0], lim[1], grid) for lim in limits]
+        # The points of product(*trainable_spans), in the same order
+        data = np.stack(np.meshgrid(*trainable_spans, indexing='ij'), axis=-1).reshape(-1, len(limits))
 
         # Extent of bins needs to be a bit smaller than parameter range
-        extents = [
-            (trainable_vars_limits[f'x{i}lims'][0] - 0.1, trainable_vars_limits[f'x{i}lims'][1] + 0.1)
-            for i in train_sites
-        ]
-
-        # Produce _bin edges.Default returning: H,xedges,yedges.
-        _, *edges = np.histogramdd(data_list, bins=grid, range=extents)
-
-        # create an indexed list of possible choices for initial guess
-        hit = [np.digitize(data_list[i], edges[0][i]) for i, _ in enumerate(data_list)]
-        hitbins = list(zip(*hit))
-        data_and_bins = list(zip(data, hitbins))
-        it = [range(1, grid + 1) for _ in train_sites]
-        combinations = []
-        for _bin in list(product(*it)):
-            test_item = []
-            for item in data_and_bins:
-                if item[1] == _bin:
-                    test_item.append(item[0])
-            # choose initial conditions and append them to the combination list
-            if len(test_item) != 0:
-                choice = np.random.choice(list(range(len(test_item))))
-                combinations.append(test_item[choice])
+        edges = [np.linspace(lim[0] - 0.1, lim[1] + 0.1, grid + 1) for lim in limits]
+
+        # ! Flat index of the bin of every point, in the order of product(*[range(1, grid + 1)] * len(train_sites))
+        hit = np.stack([np.clip(np.digitize(data[:, k], edges[k]), 1, grid) - 1 for k in range(len(limits))])
+        flat_bins = np.ravel_multi_index(hit, (grid,) * len(limits))
+
+        # choose one random point of every hit bin: the first one of each bin after a shuffle
+        order = np.random.permutation(len(data))
+        _, first = np.unique(flat_bins[order], return_index=True)
+        combinations = list(data[order[first]])
 
         return combinations
 
     elif method == 'grid':
         # make a grid of uniformly distributed initial parameter guesses
-        trainable_spans = [
-            np.linspace(trainable_vars_limits[f'x{i}lims'][0], trainable_vars_limits[f'x{i}lims'][1], grid)
-            for i in train_sites
-        ]
+        trainable_spans = [np.linspace(lim[0], lim[1], grid) for lim in limits]
 
         combinations = list(product(*trainable_spans))
 
         return combinations
 
 
+class WorkerPool:
+    """
+    A pool of worker processes that outlives the iterations of solver_mp, so that each worker imports TensorFlow and
+    traces the functions of its optimizers once. It can be passed to several calls of solver_mp, and has to be closed
+    when it is no longer needed, or used as a context manager.
+
+    Args:
+        cpu_count (int, optional): Number of worker processes. Defaults to mp.cpu_count() // 2.
+    """
+
+    def __init__(self, cpu_count=mp.cpu_count() // 2):
+        context = spawnContext()
+        # Set to cancel the outstanding jobs, refer to workers.py
+        self.stop_event = context.Event()
+        self.pool = context.Pool(cpu_count, initializer=initWorker, initargs=(self.stop_event,))
+        self.handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    # Publish the operators of a system to the workers, they stay alive as long as the pool
+    def share(self, const):
+        from .HamiltonianLoss import shareOperators
+        handles = shareOperators(const)
+        if handles not in self.handles:
+            self.handles.append(handles)
+        return handles
+
+    # Run the jobs without waiting for them, each result or exception is put in results_queue as soon as it is ready,
+    # along with the first argument of its job, the job id
+    def submit(self, func, args, results_queue, tag=None):
+        for job in args:
+            self.pool.apply_async(
+                func, job,
+                callback=lambda result, i=job[0]: results_queue.put((tag, i, result, None)),
+                error_callback=lambda error, i=job[0]: results_queue.put((tag, i, None, error))
+            )
+
+    # Wait for the jobs to finish, once the run has completed
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self._release()
+
+    # ! Stop the workers without waiting for their jobs. After an error or an interrupt the workers may be busy, or dead
+    # from the SIGINT with their jobs lost, so join() after close() would never return
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+        self._release()
+
+    def _release(self):
+        if self.handles:
+            from .HamiltonianLoss import releaseOperators
+        for handles in self.handles:
+            releaseOperators(handles)
+        self.handles = []
+
+
+class JobStream:
+    """
+    Schedules the jobs of the iterations of solver_mp on a WorkerPool and hands their results back in the order they
+    complete, instead of waiting for a whole iteration. It keeps the global best of all the results, and sets the stop
+    event of the pool once it reaches TET, so that the jobs still queued or running return early. The jobs are grouped
+    under a tag, e.g. the iteration, or the iteration and the round of a successive halving search.
+
+    Args:
+        pool (WorkerPool): The pool that runs the jobs.
+        sites (int): Number of nonlinearity parameters of the system.
+        tet_loss (float, optional): Value of the loss function below which TET has been reached. Defaults to 0.1.
+        checkpoint (callable, optional): Called without arguments at most every checkpoint_interval seconds while results arrive, to save the progress of the run. Defaults to None.
+        checkpoint_interval (float, optional): Seconds between two calls of checkpoint. Defaults to 60.
+    """
+
+    def __init__(self, pool, sites, tet_loss=0.1, checkpoint=None, checkpoint_interval=60.):
+        self.pool = pool
+        self.sites = sites
+        self.tet_loss = tet_loss
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_time = time.time()
+        self.results = queue.Queue()
+        self.outstanding = {}
+        self.rows = {}
+        self.jobs = {}
+        self.records = {}
+        self.paths = {}
+        self.proxies = set()
+        self.best_vars, self.best_loss = None, np.inf
+
+    # Results of jobs of a tag that finished before the run was interrupted, they count as returned jobs of the tag
+    def restore(self, tag, jobs, rows):
+        self.jobs[tag] = list(jobs)
+        self.rows[tag] = [np.asarray(row, dtype=np.float64) for row in rows]
+
+    # Jobs of a proxy of the system, e.g. with fewer timesteps, do not compete for the global best
+    def submit(self, tag, func, args, iteration_path=None, proxy=False):
+        self.outstanding[tag] = self.outstanding.get(tag, 0) + len(args)
+        self.rows.setdefault(tag, [])
+        self.jobs.setdefault(tag, [])
+        self.records.setdefault(tag, [])
+        self.paths[tag] = iteration_path
+        if proxy:
+            self.proxies.add(tag)
+        self.pool.submit(func, args, self.results, tag=tag)
+
+    @property
+    def tet(self):
+        return self.best_loss <= self.tet_loss
+
+    # ! Wait for the next result, keep it and write the records of a tag once all its jobs have returned
+    def next(self):
+        tag, job, result, error = self.results.get()
+        self.outstanding[tag] -= 1
+        if error is not None:
+            raise error
+
+        # Jobs cancelled before they started return None
+        if result is not None:
+            if isinstance(result, tuple):
+                result, record = result
+                self.records[tag].append(record)
+            self.rows[tag].append(result)
+            self.jobs[tag].append(job)
+            if tag not in self.proxies and result[self.sites] < self.best_loss:
+                self.best_vars, self.best_loss = [float(x) for x in result[:self.sites]], float(result[self.sites])
+                if self.tet:
+                    self.pool.stop_event.set()
+
+        if self.outstanding[tag] == 0:
+            self.flush(tag)
+        if self.checkpoint is not None and time.time() - self.checkpoint_time >= self.checkpoint_interval:
+            self.checkpoint()
+            self.checkpoint_time = time.time()
+        return tag
+
+    # Write the records of the returned jobs of a tag, or of every tag, to the result store of their iteration
+    def flush(self, tag=None):
+        for _tag in ([tag] if tag is not None else list(self.records)):
+            if self.records[_tag]:
+                ResultStore(os.path.join(self.paths[_tag], RESULTS_FILE), sites=self.sites).write(self.records[_tag])
+                self.records[_tag] = []
+
+    def collect(self, tag, fraction=1.):
+        """
+        Consumes results until a fraction of the jobs of a tag have returned, or all of them once TET is reached.
+        Results of earlier tags that are still running are kept as they arrive.
+
+        Args:
+            tag (hashable): The tag of the jobs to wait for.
+            fraction (float, optional): Fraction of the jobs of the tag to wait for. Defaults to 1.
+
+        Returns:
+            np.ndarray: One row per returned job with its best parameters and minimum loss. The ids of the jobs of the
+            rows are in self.jobs[tag].
+        """
+        total = len(self.rows[tag]) + self.outstanding[tag]
+        needed = int(np.ceil(fraction * total))
+        while self.outstanding[tag] > 0 and (self.tet or total - self.outstanding[tag] < needed):
+            self.next()
+        return np.array(self.rows[tag]).reshape(-1, self.sites + 1)
+
+    # Cancel the jobs that are still running and wait for them, so that their records are written
+    def drain(self):
+        self.pool.stop_event.set()
+        checkpoint, self.checkpoint = self.checkpoint, None
+        while any(self.outstanding.values()):
+            self.next()
+        self.checkpoint = checkpoint
+        self.pool.stop_event.clear()
+
+
 def solver_mp(
         trainable_vars_limits: dict, const: dict, grid=solver_params['Npoints'], lr=0.1, beta_1=0.9, amsgrad=False,
         write_data=False, iterations=1, method='bins', epochs_bins=solver_params['epochs_bins'],
         epochs_grid=solver_params['epochs_grid'], target_site=solver_params['target'], main_opt=False, 
-        data_path=os.path.join(os.getcwd(), 'data'), cpu_count=mp.cpu_count() // 2
+        data_path=os.path.join(os.getcwd(), 'data'), cpu_count=mp.cpu_count() // 2, cache=False, cache_path=None,
+        pool=None, batched=False, jit_compile=False, graph_loop=False, backend='tensorflow', overlap=1.,
+        search='full', eta=3, rungs=3, proxy_timesteps=None, samples=None, time_search='grid', resume=False, checkpoint_interval=60.
 ) -> dict[float, Any]:
     """
     Function that utilizes multiple workers on the cpu to optimize the nonlinearity parameters for TET.
-    It uses the Optimizer class to write trajectory data to multiple files, so it can be parsed later if needed.
+    With write_data, the results of the optimizers of each iteration are appended to one binary file of the iteration
+    directory, which can be read later with tet.data_process.readResults.
+    The state of the run, i.e. the limits, the learning rate, the best parameters and the finished jobs of the current
+    iteration, is saved in the checkpoint file of data_path after every round of jobs and every checkpoint_interval
+    seconds, so that an interrupted run can continue with resume=True.
 
     Args:
         trainable_vars_limits (Dictionary): The keys are the nonlinearity parameters of each site and the values include a list with the limits of the said variable.
@@ -101,7 +286,7 @@ def solver_mp(
         lr (float, optional): Learning rate of the optimizer. Defaults to 0.1.
         beta_1 (float, optional): beta_1 parameter of ADAM. Defaults to 0.9.
         amsgrad (bool, optional): Whether to use the amsgrad version of ADAM. Defaults to False.
-        write_data (bool, optional): Whether to write trajectory and loss data of the optimizers in files. Defaults to False.
+        write_data (bool, optional): Whether to write trajectory and loss data of the optimizers in the result store of each iteration. Defaults to False.
         iterations (int, optional): Number of iterations of solver. Defaults to 1.
         method (str, optional): Defines the method of optimization to be used. Defaults to 'bins'.
         epochs_bins (int, optional): Epochs that the optimizer is going to run for using the bins method for initial guesses. Defaults to 1000.
@@ -110,17 +295,72 @@ def solver_mp(
         main_opt (bool, optional): If to further optimize with an optimizer with initial guesses provided by the best performing test optimizer.
         data_path (str, optional): Path to create the data directory. Defaults to cwd/data.
         cpu_count (int, optional): Number of cpu cores to use for multiprocessing
+        cache (bool, optional): Whether the workers memoize the evaluations of the loss function, so that optimizers revisiting the same chis skip the diagonalization. Defaults to False.
+        cache_path (str, optional): Directory of an on-disk cache of the loss function shared by the workers and across runs. Defaults to None.
+        pool (WorkerPool, optional): Pool of workers to reuse. If None, a pool of cpu_count workers is created for the duration of the call. Defaults to None.
+        batched (bool, optional): If True, train all the initial guesses of an iteration together in this process with a BatchOptimizer, instead of one optimizer per guess in the pool. Defaults to False.
+        jit_compile (bool, optional): Whether the optimizers of the pool compile the loss function and its gradients with XLA. Defaults to False.
+        graph_loop (bool, optional): Whether the optimizers of the pool run their training loop inside one tf.function. Defaults to False.
+        backend (str, optional): Implementation of the loss function and of the optimizers of the pool, one of 'tensorflow' or 'numpy'. The numpy backend does not support the batched, cache, cache_path, jit_compile and graph_loop options, which raise a ValueError. Defaults to 'tensorflow'.
+        overlap (float, optional): Fraction of the jobs of an iteration that have to return before the limits of the next iteration are chosen and its jobs start, while the remaining jobs keep running. With 1, every iteration waits for all its jobs. The 'grid' method needs 1, since all its iterations start from the same grid. Defaults to 1.
+        search (str, optional): How to spend the epochs of an iteration, one of 'full' or 'halving'. 'full' trains every initial guess for all the epochs. 'halving' runs rungs rounds of successive halving, where the last round trains for all the epochs and every previous round for eta times fewer, continuing the best 1/eta of the optimizers of the previous round. Defaults to 'full'.
+        eta (int, optional): Reduction factor of successive halving. Defaults to 3.
+        rungs (int, optional): Number of rounds of successive halving. Defaults to 3.
+        proxy_timesteps (int, optional): If given, the rounds of successive halving before the last one use this number of timesteps, as a cheaper proxy of the loss function. Defaults to None.
+        samples (int, optional): Number of initial guesses per iteration of the 'sobol', 'lhs', 'stratified' and 'surrogate' methods. If None, grid ** len(train_sites). Defaults to None.
+        time_search (str, optional): Method of finding the extremum of the average occupation in time, one of 'grid' or 'refine', refer to HamiltonianLoss.Loss. 'refine' needs the tensorflow backend and does not support jit_compile. Defaults to 'grid'.
+        resume (bool, optional): Whether to continue the run checkpointed in data_path, with the same arguments. The finished jobs are not run again. Defaults to False.
+        checkpoint_interval (float, optional): Seconds between two checkpoints while the jobs of a round return. Defaults to 60.
     
     Returns:
         dict: If return_values is True, return a dictionary of the resulting parameters of the optimization process.
     """
 
+    if backend not in backends:
+        raise ValueError(f'Provided backend not in list of supported backends {backends}')
+    if backend == 'numpy' and batched:
+        raise ValueError('The batched optimizer needs the tensorflow backend.')
+    if backend == 'numpy' and (cache or cache_path is not None):
+        raise ValueError('The cache of the loss function needs the tensorflow backend.')
+    if backend == 'numpy' and (jit_compile or graph_loop):
+        raise ValueError('jit_compile and graph_loop compile tensorflow graphs, they need the tensorflow backend.')
+    if not 0 < overlap <= 1:
+        raise ValueError('overlap is a fraction of the jobs of an iteration, it must be in (0, 1].')
+    if overlap < 1 and method == 'grid':
+        # The grid does not depend on the results, overlapping iterations would train the same initial guesses
+        raise ValueError("The grid method gives every iteration the same initial guesses, it needs overlap=1.")
+    if search not in searches:
+        raise ValueError(f'Provided search not in list of supported searches {searches}')
+    if not isinstance(rungs, (int, np.integer)) or rungs < 1:
+        raise ValueError('Successive halving needs an integer number of rungs >= 1.')
+    if not isinstance(eta, (int, np.integer)) or eta < 2:
+        raise ValueError('The reduction factor eta of successive halving must be an integer >= 2.')
+    if time_search not in time_searches:
+        raise ValueError(f'Provided time search not in list of supported methods {time_searches}')
+    if time_search != 'grid' and backend == 'numpy':
+        raise ValueError('The refine time search needs the tensorflow backend.')
+    if time_search != 'grid' and jit_compile:
+        raise ValueError('The refine time search is not graph-pure, it can not be compiled with jit_compile.')
+
     # ! Use cpu since we are doing parallelization on the cpu
     os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 
+    if backend == 'tensorflow':
+        import tensorflow as tf
+        from .Optimizer import mp_opt, BatchOptimizer
+        tf.compat.v1.logging.set_verbosity(tf.compat.v1.logging.ERROR)
+
     # Create data directory to save results
     createDir(destination=data_path, replace_query=False)
 
+    # ! Arguments that define the run, a checkpoint only resumes a run with the same ones
+    arguments = json.loads(json.dumps(dict(
+        trainable_vars_limits=trainable_vars_limits, const=const, grid=grid, lr=lr, beta_1=beta_1, amsgrad=amsgrad,
+        write_data=write_data, method=method, epochs_bins=epochs_bins, epochs_grid=epochs_grid,
+        target_site=target_site, batched=batched, backend=backend, overlap=overlap, search=search, eta=eta,
+        rungs=rungs, proxy_timesteps=proxy_timesteps, samples=samples, time_search=time_search
+    ), default=lambda value: value.tolist()))
+
     # Initialize helper parameters
     lims = list(trainable_vars_limits.values())
 
@@ -138,40 +378,199 @@ def solver_mp(
     # get train_sites from limits of trainable parameters by parsing elements in strings
     train_sites = [int(list(trainable_vars_limits.keys())[i][1]) for i in range(len(trainable_vars_limits))]
 
+    # Initial guess and minimum loss of every optimizer so far, and the trust region, for the surrogate method
+    history_x, history_y = np.zeros((0, len(train_sites))), np.zeros(0)
+    trust_region = None
+
+    # Rounds of jobs of the current iteration, one per round of successive halving, with their candidates and the ids
+    # and rows of their finished jobs
+    rounds = []
+    finished = False
+
+    if resume:
+        state = readCheckpoint(data_path)
+        if state['arguments'] != arguments:
+            raise ValueError(f'{data_path} holds a run with different arguments, it can not be resumed with these.')
+        iteration, lims, lr, lim_changes = state['iteration'], state['lims'], state['lr'], state['lim_changes']
+        optimal_vars, min_loss = state['optimal_vars'], state['min_loss']
+        history_x = np.array(state['history_x'], dtype=np.float64).reshape(-1, len(train_sites))
+        history_y = np.array(state['history_y'], dtype=np.float64)
+        trust_region = state['trust_region']
+        rounds, finished = state['rounds'], state['finished']
+
+        # Cut the chunks that the interruption left incomplete, the resumed jobs append after the whole ones
+        for name in os.listdir(data_path):
+            ResultStore(os.path.join(data_path, name, RESULTS_FILE)).truncate()
+        if finished:
+            print(10 * '-', f'The run of {data_path} has finished', 10 * '-')
+        else:
+            print(10 * '-', f'Resuming iteration {iteration}, finished jobs: {sum(len(r["jobs"]) for r in rounds)}', 10 * '-')
+
+    # The surrogate method and the samplers replace the random sampling of the bins method
+    if method in ('bins', 'surrogate', *samplers):
+        epochs = epochs_bins
+    else:
+        epochs = epochs_grid
+
+    # Keep the workers alive across the iterations, and across calls if a pool is given
+    own_pool = pool is None and not batched
+    if own_pool:
+        pool = WorkerPool(cpu_count)
+
+    if batched:
+        batch_opt = BatchOptimizer(
+            const=const, target_site=target_site, iterations=epochs, train_sites=train_sites,
+            beta_1=beta_1, amsgrad=amsgrad, Print=False, time_search=time_search
+        )
+    else:
+        stream = JobStream(pool, sites=len(const['chis']), checkpoint_interval=checkpoint_interval)
+        if resume and state['best_vars'] is not None:
+            stream.best_vars, stream.best_loss = state['best_vars'], state['best_loss']
+        pool.stop_event.clear()
+    if not batched and backend == 'tensorflow':
+        # Build the basis and the chi independent part of the Hamiltonian once, the workers attach to them
+        handles = pool.share(const)
+
+    batch_opts = {const['timesteps']: batch_opt} if batched else {}
+
+    def roundTag(rung):
+        return (iteration, rung) if search == 'halving' else iteration
+
+    def saveCheckpoint():
+        if not batched:
+            # ! The records reach the result stores before the checkpoint counts their jobs as finished
+            stream.flush()
+            for rung, entry in enumerate(rounds):
+                if roundTag(rung) in stream.jobs:
+                    entry['jobs'] = [int(job) for job in stream.jobs[roundTag(rung)]]
+                    entry['rows'] = np.array(stream.rows[roundTag(rung)]).reshape(-1, const['sites'] + 1).tolist()
+        writeCheckpoint({
+            'arguments': arguments, 'iterations': iterations, 'finished': finished,
+            'iteration': iteration, 'lims': lims, 'lr': lr, 'lim_changes': lim_changes,
+            'optimal_vars': optimal_vars, 'min_loss': min_loss,
+            'best_vars': None if batched else stream.best_vars, 'best_loss': None if batched else stream.best_loss,
+            'history_x': history_x, 'history_y': history_y, 'trust_region': trust_region, 'rounds': rounds,
+        }, data_path)
+
+    if not batched:
+        stream.checkpoint = saveCheckpoint
+
+    def runJobs(candidates, round_epochs, round_const, iteration_path, rung=0, job_offset=0, proxy=False):
+        """
+        Trains one optimizer per row of candidates, as the round rung of the current iteration. Returns one row per
+        optimizer with its best parameters and its minimum loss, and the candidates the optimizers of the rows started
+        from. The job ids start from job_offset. A round of a resumed run keeps its candidates and only runs the jobs
+        that had not finished.
+        """
+        if rung < len(rounds):
+            candidates = rounds[rung]['candidates']
+        else:
+            rounds.append({'candidates': np.asarray(candidates, dtype=np.float64).tolist(), 'jobs': [], 'rows': []})
+            saveCheckpoint()
+        entry = rounds[rung]
+        candidates = np.array(candidates, dtype=np.float64).reshape(len(candidates), -1)
+        if batched:
+            # The batched optimizer saves whole rounds
+            if len(entry['jobs']) == len(candidates):
+                return np.array(entry['rows']).reshape(-1, const['sites'] + 1), candidates
+
+            # Initial guesses of all the nonlinearity parameters, the non-trainable ones start from 0 as in mp_opt()
+            if round_const['timesteps'] not in batch_opts:
+                batch_opts[round_const['timesteps']] = BatchOptimizer(
+                    const=round_const, target_site=target_site, iterations=round_epochs, train_sites=train_sites,
+                    beta_1=beta_1, amsgrad=amsgrad, Print=False, time_search=time_search
+                )
+            _batch_opt = batch_opts[round_const['timesteps']]
+            input_chis = np.zeros((len(candidates), len(const['chis'])))
+            input_chis[:, train_sites] = candidates
+            _batch_opt.lr = lr
+            _batch_opt.iter = round_epochs
+            results = _batch_opt.train(input_chis)
+            if write_data:
+                _batch_opt.saveResults(results, input_chis, iteration_path, job_offset=job_offset)
+            rows = np.concatenate([results['best_vars'], results['min_loss'][:, None]], axis=1)
+            entry['jobs'], entry['rows'] = list(range(job_offset, job_offset + len(candidates))), rows.tolist()
+            return rows, candidates
+
+        # Jobs of the round that have not finished yet
+        done = set(entry['jobs'])
+        pending = [i for i in range(len(candidates)) if job_offset + i not in done]
+
+        # Set input arg list for mp_opt() function
+        if backend == 'numpy':
+            func = numpy_backend.mp_opt
+            args = [
+                (job_offset + i, candidates[i], iteration_path, round_const, target_site,
+                 round_epochs, lr, beta_1, amsgrad, write_data, train_sites)
+                for i in pending
+            ]
+        else:
+            func = mp_opt
+            args = [
+                (job_offset + i, candidates[i], iteration_path, round_const, target_site,
+                 round_epochs, lr, beta_1, amsgrad, write_data, train_sites, cache, cache_path, handles,
+                 jit_compile, graph_loop, time_search)
+                for i in pending
+            ]
+
+        try:
+            # Start the jobs and consume their results as they complete
+            tag = roundTag(rung)
+            stream.restore(tag, entry['jobs'], entry['rows'])
+            stream.submit(tag, func, args, iteration_path=iteration_path, proxy=proxy)
+            rows = stream.collect(tag, fraction=overlap)
+            return rows, candidates[np.array(stream.jobs[tag], dtype=int) - job_offset]
+        except BaseException:
+            # Keep the jobs that returned, cancel the jobs in flight, and stop the workers of our pool without waiting
+            saveCheckpoint()
+            pool.stop_event.set()
+            if own_pool:
+                pool.terminate()
+            raise
+        finally:
+            # Garbage collector
+            gc.collect()
+
     t0 = time.time()
-    while iteration < iterations:
+    while not finished and iteration < iterations:
 
         # Create directory of current iteration
         data_path2 = os.path.join(data_path, f'iteration_{iteration}')
         createDir(destination=data_path2, replace_query=False)
 
-        combinations = getCombinations(trainable_vars_limits, train_sites=train_sites, method=method, grid=grid)
-        if method == 'bins':
-            epochs = epochs_bins
+        # The initial guesses of a resumed iteration are the candidates of its first round
+        if rounds:
+            combinations = rounds[0]['candidates']
         else:
-            epochs = epochs_grid
+            combinations = getCombinations(
+                trainable_vars_limits, train_sites=train_sites, method=method, grid=grid,
+                history=(history_x, history_y), samples=samples, trust_region=trust_region
+            )
         print(10 * '-', f'Iteration: {iteration}, Method: {method}, Jobs: {len(combinations)}, lims: {lims}', 10 * '-')
 
         t2 = time.time()
-        # Initialize processing pool
-        pool = mp.Pool(cpu_count)
-
-        # Set input arg list for mp_opt() function
-        args = [
-            (i, combination, data_path2, const, target_site,
-             epochs, lr, beta_1, amsgrad, write_data, train_sites)
-            for i, (combination) in enumerate(combinations)
-        ]
 
-        try:
-            # Run multiprocess map 
-            _all_losses = pool.starmap_async(mp_opt, args).get()
-        finally:
-            # Make sure to close pool so no more processes start
-            pool.close()
-            pool.join()
-            # Garbage collector
-            gc.collect()
+        if search == 'halving':
+            # ! Successive halving: every round trains the candidates for eta times more epochs than the previous one,
+            # starting from where they stopped, and keeps the best 1/eta of them for the next round
+            candidates = combinations
+            for rung in range(rungs):
+                rung_epochs = max(1, epochs // eta ** (rungs - 1 - rung))
+                proxy = proxy_timesteps is not None and rung < rungs - 1
+                rung_const = {**const, 'timesteps': proxy_timesteps} if proxy else const
+                print(f'Round: {rung}, Jobs: {len(candidates)}, Epochs: {rung_epochs}' + (', proxy' if proxy else ''))
+                _all_losses, starts = runJobs(
+                    candidates, rung_epochs, rung_const, data_path2, rung=rung,
+                    job_offset=rung * len(combinations), proxy=proxy
+                )
+                # Stop early if TET has already been reached by the real system, the cancelled jobs return no rows
+                if rung == rungs - 1 or len(_all_losses) == 0 or (
+                        not proxy and np.min(_all_losses[:, const['sites']]) <= 0.1):
+                    break
+                ranked = _all_losses[np.argsort(_all_losses[:, const['sites']])]
+                candidates = ranked[:max(1, int(np.ceil(len(ranked) / eta))), train_sites]
+        else:
+            _all_losses, starts = runJobs(combinations, epochs, const, data_path2)
 
         t3 = time.time()
 
@@ -179,14 +578,26 @@ def solver_mp(
         dt = t3 - t2
 
         # Gather results
-        all_losses = np.array(_all_losses)
-        optimal_vars = [float(all_losses[np.argmin(all_losses[:, const['sites']]), i]) for i in range(const['sites'])]
-        min_loss = float(all_losses[np.argmin(all_losses[:, const['sites']]), const['sites']])
+        all_losses = np.array(_all_losses).reshape(-1, const['sites'] + 1)
+        if len(all_losses):
+            optimal_vars = [float(all_losses[np.argmin(all_losses[:, const['sites']]), i]) for i in range(const['sites'])]
+            min_loss = float(all_losses[np.argmin(all_losses[:, const['sites']]), const['sites']])
+
+        # With overlap, a job of an earlier iteration may have reached TET while this one was running
+        if not batched and stream.tet:
+            optimal_vars, min_loss = stream.best_vars, stream.best_loss
 
         # Print results of run
         print(f"Best parameters of tries: loss={min_loss}, optimal_vars = {optimal_vars}")
         print("Code run time: ", dt, " s")
 
+        # Optimizers of a proxy of the system do not inform the surrogate
+        if not (search == 'halving' and proxy) and len(all_losses):
+            best = all_losses[np.argmin(all_losses[:, const['sites']])]
+            trust_region = updateTrustRegion(trust_region, best[train_sites], best[const['sites']], history_y)
+            history_x = np.concatenate([history_x, starts])
+            history_y = np.concatenate([history_y, all_losses[:, const['sites']]])
+
         if min_loss <= const["max_N"] / 2:
             lim_changes += 1
             edge = _edge[iteration]
@@ -198,6 +609,7 @@ def solver_mp(
 
         # advance iteration
         iteration += 1
+        rounds = []
 
         # if loss has not been reduced for more than 5 iterations stop
         if lim_changes >= 5 and min_loss >= const['max_N'] / 2:
@@ -210,12 +622,29 @@ def solver_mp(
             print(f'OptimalParams:{optimal_vars}')
             break
 
+        saveCheckpoint()
+
+    # Cancel the jobs of the last iterations that are still running, and keep the best result of all the iterations
+    if not batched:
+        stream.drain()
+        if stream.best_loss < min_loss:
+            optimal_vars, min_loss = stream.best_vars, stream.best_loss
+
+    # Resuming a finished run only returns its result
+    finished = True
+    saveCheckpoint()
+
     t1 = time.time()
 
+    # Stop the workers and free the shared operators, unless the pool belongs to the caller
+    if own_pool:
+        pool.close()
+
     const['chis'] = optimal_vars
     const['min_n'] = min_loss
 
     if main_opt:
+        from .Optimizer import Optimizer
         data_path3 = os.path.join(data_path, f'main_opt')
         _opt = Optimizer(
             target_site=solver_params['target'], DataExist=False,
@@ -0,0 +1,190 @@
+import math
+import numpy as np
+
+try:
+    from scipy.special import erf
+except ImportError:
+    erf = np.vectorize(math.erf, otypes=[float])
+
+# Offset of the logarithm of the loss function that the surrogate models, so that the values close to TET are resolved
+LOG_OFFSET = 1e-2
+
+# Candidate length scales of the kernel, in units of the limits of the parameters
+LENGTH_SCALES = (0.05, 0.1, 0.2, 0.4)
+
+# Largest number of points of the history the surrogate is fitted to, refer to proposeCombinations
+MAX_HISTORY = 512
+
+# Smallest side of the trust region of proposeCombinations, as a fraction of the limits
+MIN_TRUST_LENGTH = 1 / 16
+
+
+class GaussianProcess:
+    """
+    A Gaussian process regressor with a Matern 5/2 kernel, used as a surrogate of the minimum loss that an optimizer
+    reaches from a point of the parameter space. The inputs are expected in the unit box and the targets are
+    standardized. The length scale is chosen by maximizing the log marginal likelihood over length_scales.
+
+    Args:
+        length_scales (tuple, optional): Candidate length scales of the kernel. Defaults to LENGTH_SCALES.
+        noise (float, optional): Variance of the noise of the standardized targets. Defaults to 1e-3.
+    """
+
+    def __init__(self, length_scales=LENGTH_SCALES, noise=1e-3):
+        self.length_scales = length_scales
+        self.noise = noise
+
+    @staticmethod
+    def kernel(xa, xb, length_scale):
+        r = np.sqrt(np.maximum(np.sum((xa[:, None, :] - xb[None, :, :]) ** 2, axis=-1), 0.)) * math.sqrt(5) / length_scale
+        return (1 + r + r ** 2 / 3) * np.exp(-r)
+
+    def fit(self, x, y):
+        self.x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.y_mean, self.y_std = np.mean(y), max(np.std(y), 1e-12)
+        z = (y - self.y_mean) / self.y_std
+
+        best = -np.inf
+        for length_scale in self.length_scales:
+            K = self.kernel(self.x, self.x, length_scale) + self.noise * np.eye(len(self.x))
+            L = np.linalg.cholesky(K)
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, z))
+            log_likelihood = -0.5 * z @ alpha - np.sum(np.log(np.diag(L)))
+            if log_likelihood > best:
+                best = log_likelihood
+                self.length_scale, self.L, self.alpha = length_scale, L, alpha
+        # Whitened targets L^-1 z, the mean of a prediction is their product with L^-1 K(x, points)
+        self.w = self.L.T @ self.alpha
+        return self
+
+    def predict(self, x):
+        """
+        Args:
+            x (np.ndarray): Array of shape [M, d] of points in the unit box.
+
+        Returns:
+            tuple: The mean and the standard deviation of the prediction at each point, in the units of the targets.
+        """
+        Ks = self.kernel(np.asarray(x, dtype=np.float64), self.x, self.length_scale)
+        v = np.linalg.solve(self.L, Ks.T)
+        variance = np.maximum(1 - np.sum(v ** 2, axis=0), 1e-12)
+        return self.y_mean + self.y_std * (Ks @ self.alpha), self.y_std * np.sqrt(variance)
+
+
+def expectedImprovement(mean, std, best, xi=0.01):
+    """
+    Expected improvement of a minimization below best, for Gaussian predictions.
+
+    Args:
+        mean (np.ndarray): Means of the predictions.
+        std (np.ndarray): Standard deviations of the predictions.
+        best (float): The lowest value seen so far.
+        xi (float, optional): Margin that favours exploration. Defaults to 0.01.
+
+    Returns:
+        np.ndarray: The expected improvement at each point.
+    """
+    improvement = best - mean - xi
+    z = improvement / std
+    cdf = 0.5 * (1 + erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + std * pdf
+
+
+def updateTrustRegion(trust_region, best_vars, best_loss, history_y):
+    """
+    Moves the trust region of proposeCombinations after an iteration. If the iteration improved on the lowest loss of
+    the history, the region is centred on its best parameters and its side doubles, otherwise its side halves. Once
+    the side would shrink below MIN_TRUST_LENGTH, the region is stuck around a local minimum and it restarts from the
+    whole limits.
+
+    Args:
+        trust_region (tuple): The centre and the side of the trust region, or None before the first iteration.
+        best_vars (np.ndarray): The trained parameters of the best optimizer of the iteration.
+        best_loss (float): Its minimum loss.
+        history_y (np.ndarray): The minimum loss of the optimizers of the previous iterations.
+
+    Returns:
+        tuple: The centre and the side of the trust region of the next iteration.
+    """
+    if trust_region is None or best_loss < np.min(history_y, initial=np.inf):
+        length = 1. if trust_region is None else min(1., 2 * trust_region[1])
+        return [float(v) for v in best_vars], length
+    centre, length = trust_region
+    return centre, length / 2 if length / 2 >= MIN_TRUST_LENGTH else 1.
+
+
+def proposeCombinations(history_x, history_y, limits, n, candidates=2048, trust_region=None, max_history=MAX_HISTORY):
+    """
+    Proposes the initial guesses of the next optimizers. A GaussianProcess is fitted to log(loss + LOG_OFFSET) of the
+    (initial guess, minimum loss) pairs of the previous optimizers, and the n points of highest expected improvement
+    are picked from random candidates in the trust region, one at a time. The trust region is a box around the best
+    parameters found so far, refer to updateTrustRegion. Every picked point enters the model with the lowest value seen
+    so far (constant liar), so that the batch spreads out.
+
+    The model is fitted once per batch. A picked point extends the Cholesky factor of the kernel matrix by one row, and
+    the predictions at the candidates are updated in O(H * candidates) instead of refitting in O(H^3). Only the best
+    max_history // 2 points of the history and a random subset of the others are used for the fit.
+
+    Args:
+        history_x (np.ndarray): Array of shape [H, d] with the initial guesses of the previous optimizers.
+        history_y (np.ndarray): Array of shape [H] with the minimum loss each of them reached.
+        limits (list): The [lower, upper] limits of each of the d parameters.
+        n (int): Number of initial guesses to propose.
+        candidates (int, optional): Number of random candidates to rank. Defaults to 2048.
+        trust_region (tuple, optional): The centre of the trust region, in the units of the limits, and its side, as a fraction of the limits. If None, the candidates are drawn in the whole limits. Defaults to None.
+        max_history (int, optional): Largest number of points of the history used for the fit. Defaults to MAX_HISTORY.
+
+    Returns:
+        list: A list of n tuples of initial guesses.
+    """
+    limits = np.asarray(limits, dtype=np.float64)
+    lower, span = limits[:, 0], limits[:, 1] - limits[:, 0]
+    x = (np.asarray(history_x, dtype=np.float64).reshape(len(history_y), -1) - lower) / span
+    y = np.log(np.asarray(history_y, dtype=np.float64) + LOG_OFFSET)
+    d = limits.shape[0]
+
+    # ! Candidates: uniform in the trust region, shifted to lie inside the limits
+    centre, length = (np.full(d, 0.5), 1.) if trust_region is None else trust_region
+    corner = np.clip((np.asarray(centre, dtype=np.float64) - lower) / span - length / 2, 0, 1 - length)
+    pool = corner + length * np.random.uniform(size=(candidates, d))
+
+    # Keep the best half of the fitted points and a random subset of the others
+    best = np.min(y)
+    if len(y) > max_history:
+        ranked = np.argsort(y)
+        keep = np.concatenate([
+            ranked[:max_history // 2],
+            np.random.choice(ranked[max_history // 2:], max_history - max_history // 2, replace=False)
+        ])
+        x, y = x[keep], y[keep]
+
+    gp = GaussianProcess().fit(x, y)
+    lie = (best - gp.y_mean) / gp.y_std
+
+    # ! V = L^-1 K(x, pool) and w = L^-1 z gain one row per picked point, the standardized predictions at the pool
+    # are V^T w and 1 - sum(V^2)
+    V = np.zeros((len(x) + n, len(pool)))
+    V[:len(x)] = np.linalg.solve(gp.L, gp.kernel(x, pool, gp.length_scale))
+    w = np.concatenate([gp.w, np.zeros(n)])
+    mean, explained = V[:len(x)].T @ w[:len(x)], np.sum(V[:len(x)] ** 2, axis=0)
+    picked = np.zeros(len(pool), dtype=bool)
+
+    proposals = []
+    for j in range(len(x), len(x) + n):
+        std = np.sqrt(np.maximum(1 - explained, 1e-12))
+        improvement = expectedImprovement(gp.y_mean + gp.y_std * mean, gp.y_std * std, best)
+        k = int(np.argmax(np.where(picked, -np.inf, improvement)))
+        proposals.append(pool[k])
+        picked[k] = True
+
+        # Rank-1 extension of the Cholesky factor with the picked point, whose column of V is L^-1 K(x, point)
+        l = V[:j, k].copy()
+        diagonal = np.sqrt(max(1 + gp.noise - l @ l, 1e-12))
+        V[j] = (gp.kernel(pool[k:k + 1], pool, gp.length_scale)[0] - l @ V[:j]) / diagonal
+        w[j] = (lie - l @ w[:j]) / diagonal
+        mean += V[j] * w[j]
+        explained += V[j] ** 2
+
+    return [tuple(lower + span * p) for p in proposals]
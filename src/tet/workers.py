@@ -0,0 +1,43 @@
+import multiprocessing as mp
+import signal
+
+# ----------------------------- Worker Process State ----------------------------- #
+
+# Event shared by the parent process with the workers of a WorkerPool. Once it is set, the jobs that have not started
+# return at once and the optimizers in flight stop after their current epoch
+_stop_event = None
+
+
+def initWorker(stop_event):
+    """
+    Initializer of the worker processes of solver_mp.WorkerPool and landscape.scan. It is kept apart from solver_mp so
+    that the workers of the numpy backend do not import TensorFlow. The workers ignore SIGINT: a Ctrl-C reaches the
+    whole process group, and a worker killed by it while waiting for a job dies holding the lock of the job queue,
+    which deadlocks even Pool.terminate(). The parent process handles the interrupt and terminates the workers.
+
+    Args:
+        stop_event (multiprocessing.Event): Event that the parent process sets to cancel the outstanding jobs, or None if the jobs are never cancelled.
+    """
+    global _stop_event
+    _stop_event = stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def stopRequested() -> bool:
+    """
+    Returns:
+        bool: Whether the parent process asked the jobs of this worker to stop. Always False outside of a WorkerPool.
+    """
+    return _stop_event is not None and _stop_event.is_set()
+
+
+def spawnContext():
+    """
+    The multiprocessing context of the worker processes of solver_mp.WorkerPool and landscape.scan. TensorFlow
+    deadlocks in processes forked after its runtime has started, so the workers are always spawned, whichever the
+    backend and the default start method of the platform.
+
+    Returns:
+        multiprocessing.context.SpawnContext: The spawn context.
+    """
+    return mp.get_context('spawn')
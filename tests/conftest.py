@@ -0,0 +1,29 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# The package lives in src/, run the tests without installing it
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+@pytest.fixture
+def make_const():
+    """
+    Copies system_constants with the given changes. The number of sites follows the omegas, and the nonlinearity
+    parameters start from 0 unless chis is given.
+    """
+    from tet.constants import system_constants
+
+    def make(**changes):
+        const = copy.deepcopy(system_constants)
+        const.update(changes)
+        const['sites'] = len(const['omegas'])
+        if 'chis' not in changes:
+            const['chis'] = [0] * const['sites']
+        return const
+
+    return make
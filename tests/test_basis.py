@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from tet import basis
+from tet.basis import createBasis, getBasis, getDimension, getRankTable, rankStates, unrankStates
+
+SYSTEMS = [(3, 2), (3, 3), (2, 4), (5, 4), (4, 5)]
+
+
+def _deriveBasis(max_N, sites):
+    # The enumeration of the original Loss.derive, one state after the other
+    dim = getDimension(max_N, sites)
+    states = np.zeros((dim, sites))
+    states[0, 0] = max_N
+    v, k = 0, 0
+    while v < dim - 1:
+        for i in range(k):
+            states[v + 1, i] = states[v, i]
+        states[v + 1, k] = states[v, k] - 1
+        states[v + 1, k + 1] = max_N - np.sum(states[v + 1, :k + 1])
+        for j in range(k + 2, sites):
+            states[v + 1, j] = 0
+
+        _k = 0
+        condition = True
+        while _k < sites - 1:
+            _i = _k + 1
+            if _i >= sites - 1:
+                condition = states[v + 1, sites - 1] == 0
+            else:
+                while _i < sites - 1:
+                    condition = states[v + 1, _i] == 0
+                    if not condition:
+                        break
+                    _i += 1
+            if not condition:
+                _k += 1
+            else:
+                break
+        if condition:
+            k = _k
+        v += 1
+    return states
+
+
+@pytest.mark.parametrize('max_N, sites', SYSTEMS)
+def test_create_basis_matches_the_original_enumeration(max_N, sites):
+    np.testing.assert_array_equal(createBasis(max_N, sites), _deriveBasis(max_N, sites))
+
+
+@pytest.mark.parametrize('max_N, sites', SYSTEMS)
+def test_rank_and_unrank_round_trip(max_N, sites):
+    states = createBasis(max_N, sites)
+    table = getRankTable(max_N, sites)
+    ranks = rankStates(states, table)
+    np.testing.assert_array_equal(ranks, np.arange(len(states)))
+    np.testing.assert_array_equal(unrankStates(ranks, max_N, table), states)
+
+
+@pytest.mark.parametrize('content', [b'', b'\x93NUMPY', b'not a numpy file'], ids=['empty', 'truncated', 'garbage'])
+def test_corrupt_cache_file_is_replaced(content, tmp_path, monkeypatch):
+    monkeypatch.setattr(basis, '_basis_cache', {})
+    path = tmp_path / 'basis_N3_f3.npy'
+    path.write_bytes(content)
+
+    np.testing.assert_array_equal(getBasis(3, 3, cache_dir=str(tmp_path)), createBasis(3, 3))
+    np.testing.assert_array_equal(np.load(path), createBasis(3, 3))
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+
+def test_cache_file_cut_after_its_header_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(basis, '_basis_cache', {})
+    path = tmp_path / 'basis_N3_f3.npy'
+    # A file cut short after a whole header
+    np.save(path, createBasis(3, 3))
+    path.write_bytes(path.read_bytes()[:-16])
+
+    np.testing.assert_array_equal(getBasis(3, 3, cache_dir=str(tmp_path)), createBasis(3, 3))
+    np.testing.assert_array_equal(np.load(path), createBasis(3, 3))
@@ -0,0 +1,72 @@
+import copy
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.constants import system_constants
+from tet.HamiltonianLoss import Loss, LossCache
+from tet.Optimizer import Optimizer
+
+
+@pytest.fixture
+def const():
+    return copy.deepcopy(system_constants)
+
+
+def _optimizer(const, train_sites, cache, iterations=5):
+    return Optimizer(
+        const=const, target_site=1, Print=False, iterations=iterations, train_sites=train_sites, cache=cache,
+        opt=tf.keras.optimizers.Adam(learning_rate=0.1)
+    )
+
+
+def test_grads_entries_depend_on_train_sites(const, tmp_path):
+    # A run that trains every site fills the shared disk cache
+    _optimizer(const, [0, 1], LossCache(path=str(tmp_path)))(1., -2.)
+
+    # A run from the same chis that only trains chi0 must not reuse its gradients
+    opt = _optimizer(const, [0], LossCache(path=str(tmp_path)))
+    opt(1., -2.)
+    assert opt.vars[1].numpy() == -2.
+
+
+def test_loss_entries_do_not_answer_grads_lookups(const):
+    cache = LossCache()
+    value = Loss(const=const).evaluate([1., -2.], site=1, cache=cache)
+
+    # The first step of the optimizer looks up the same chis and site
+    opt = _optimizer(const, [0, 1], cache, iterations=1)
+    opt(1., -2.)
+    assert np.isclose(float(opt.results['loss'][0]), value)
+
+
+def test_disk_entries_are_written_in_batches(const, tmp_path):
+    cache = LossCache(path=str(tmp_path), flush_size=4)
+    loss = Loss(const=const)
+    values = [loss.evaluate([chi, -2.], site=1, cache=cache) for chi in np.linspace(-1, 1, 10)]
+    # Two full batches, the last two entries are still buffered
+    assert len(list(tmp_path.glob('*.npz'))) == 2
+    cache.flush()
+    assert len(list(tmp_path.glob('*.npz'))) == 3
+
+    # Another cache on the same directory finds every entry
+    other = LossCache(path=str(tmp_path))
+    for chi, value in zip(np.linspace(-1, 1, 10), values):
+        entry = other.get(other.key(loss.system_key, [chi, -2.], 1), fields=('loss',))
+        assert entry is not None and float(entry['loss']) == value
+    assert other.stats()['hits'] == 10
+
+
+def test_an_optimizer_run_writes_one_batch(const, tmp_path):
+    _optimizer(const, [0, 1], LossCache(path=str(tmp_path)), iterations=20)(1., -2.)
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+
+
+def test_buffered_entries_are_written_when_the_cache_is_dropped(const, tmp_path):
+    cache = LossCache(path=str(tmp_path))
+    Loss(const=const).evaluate([1., -2.], site=1, cache=cache)
+    assert not list(tmp_path.glob('*.npz'))
+    del cache
+    assert len(list(tmp_path.glob('*.npz'))) == 1
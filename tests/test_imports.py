@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+
+def _run(code, *args):
+    # A fresh interpreter, so that the modules imported by the other tests do not count
+    return subprocess.run(
+        [sys.executable, *args] if args else [sys.executable, '-c', code],
+        cwd=SRC, env={**os.environ, 'PYTHONPATH': SRC}, capture_output=True, text=True
+    )
+
+
+@pytest.mark.parametrize('module', ['tet', 'tet.solver_mp', 'tet.numpy_backend', 'tet.landscape'])
+def test_import_does_not_import_tensorflow(module):
+    result = _run(f"import {module}, sys; assert 'tensorflow' not in sys.modules")
+    assert result.returncode == 0, result.stderr
+
+
+def test_cli_help_does_not_import_tensorflow():
+    code = (
+        "import runpy, sys; sys.argv = ['qtet.py', '--help']\n"
+        "try:\n"
+        "    runpy.run_path('qtet.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "assert 'tensorflow' not in sys.modules"
+    )
+    result = _run(code)
+    assert result.returncode == 0, result.stderr
+    assert 'usage' in result.stdout
@@ -0,0 +1,100 @@
+import copy
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from tet import landscape
+from tet.constants import system_constants
+from tet.landscape import scan, scanTile
+
+LIMITS = {'x0lims': [-3, 3], 'x1lims': [-2, 2]}
+
+
+def test_resumed_scan_matches_a_full_scan(tmp_path):
+    const = copy.deepcopy(system_constants)
+    full = scan(LIMITS, const, grid=[7, 5], data_path=str(tmp_path / 'full'), cpu_count=2, tile_size=8, backend='numpy')
+
+    # Drop two tiles as if the scan had been interrupted before they completed
+    path = str(tmp_path / 'resumed')
+    scan(LIMITS, const, grid=[7, 5], data_path=path, cpu_count=2, tile_size=8, backend='numpy')
+    done = np.lib.format.open_memmap(str(tmp_path / 'resumed' / landscape.PROGRESS_FILE), mode='r+')
+    values = np.lib.format.open_memmap(str(tmp_path / 'resumed' / landscape.LANDSCAPE_FILE), mode='r+')
+    done[[1, 3]] = False
+    values.reshape(-1)[8:16] = np.nan
+    values.reshape(-1)[24:32] = np.nan
+    done.flush()
+    values.flush()
+    del done, values
+
+    resumed = scan(LIMITS, const, grid=[7, 5], data_path=path, cpu_count=2, tile_size=8, backend='numpy')
+    np.testing.assert_array_equal(resumed['landscape'], full['landscape'])
+    assert resumed['chis'] == full['chis'] and resumed['min_n'] == full['min_n']
+
+
+def test_backends_scan_the_same_landscape(tmp_path):
+    pytest.importorskip('tensorflow')
+    const = copy.deepcopy(system_constants)
+    values = [
+        scan(LIMITS, const, grid=[4, 3], data_path=str(tmp_path / backend), cpu_count=1, tile_size=5,
+             backend=backend)['landscape']
+        for backend in ('numpy', 'tensorflow')
+    ]
+    np.testing.assert_allclose(values[0], values[1], rtol=1e-8, atol=1e-10)
+
+
+def test_chebyshev_tiles_match_the_dense_engine():
+    pytest.importorskip('tensorflow')
+    from tet.HamiltonianLoss import Loss
+
+    # A short time span keeps the expansion of the chebyshev engine short
+    const = {**copy.deepcopy(system_constants), 'max_t': 5, 'timesteps': 10}
+    axes = [np.linspace(-3, 3, 4), np.linspace(-2, 2, 3)]
+    tiles = {}
+    for engine in ('dense', 'chebyshev'):
+        landscape._worker_losses.clear()
+        landscape._worker_losses[landscape._workerLossKey(const, 'tensorflow')] = Loss(const, engine=engine)
+        tiles[engine] = scanTile(0, 0, 12, axes, [0, 1], const, 1, 'tensorflow')[1]
+    landscape._worker_losses.clear()
+    np.testing.assert_allclose(tiles['chebyshev'], tiles['dense'], rtol=1e-8, atol=1e-10)
+
+
+# ! A scan interrupted as by a Ctrl-C once its first tile has returned: the workers get the SIGINT too, and the parent
+# a KeyboardInterrupt
+INTERRUPTED_SCAN = '''
+import builtins, copy, multiprocessing, os, signal, sys, time
+from tet.constants import system_constants
+from tet.landscape import scan
+
+def interrupted(*args, **kwargs):
+    if str(args[0]).startswith('Tile'):
+        workers = multiprocessing.active_children()
+        for worker in workers:
+            os.kill(worker.pid, signal.SIGINT)
+        # A worker killed while it waits for a tile would hold the lock of the job queue
+        time.sleep(1)
+        if not all(worker.is_alive() for worker in workers):
+            sys.exit(2)
+        raise KeyboardInterrupt
+
+builtins.print = interrupted
+try:
+    scan({{'x0lims': [-3, 3], 'x1lims': [-2, 2]}}, copy.deepcopy(system_constants), grid=[40, 40],
+         data_path={data_path!r}, cpu_count=2, tile_size=8, backend='numpy')
+except KeyboardInterrupt:
+    sys.exit(0)
+sys.exit(1)
+'''
+
+
+def test_interrupted_scan_returns(tmp_path):
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    # A hung parent is killed by the timeout, which fails the test
+    result = subprocess.run(
+        [sys.executable, '-c', INTERRUPTED_SCAN.format(data_path=str(tmp_path))],
+        env={**os.environ, 'PYTHONPATH': src}, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert np.sum(np.load(str(tmp_path / landscape.PROGRESS_FILE))) == 1
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.HamiltonianLoss import Loss
+
+
+# Loss of the acceptor site computed by the original per-element implementation of the Hamiltonian, with its time
+# evolution in complex128 instead of complex64
+BASELINE = [
+    ([-3, 3], [-1.3, 2.1], 2.893193789235196),
+    ([-3, 0, 3], [-1.3, 0.5, 2.1], 2.9845723850754804),
+    ([-3, -1, 1, 3], [-1.3, 0.5, -0.2, 2.1], 2.995125326494759),
+]
+
+
+@pytest.mark.parametrize('omegas, chis, expected', BASELINE, ids=['dimer', 'trimer', 'tetramer'])
+def test_loss_matches_the_baseline(omegas, chis, expected, make_const):
+    loss = Loss(make_const(omegas=omegas))
+    site = len(omegas) - 1
+    assert abs(float(loss(chis, site=site)) - expected) < 1e-12
+    assert abs(float(loss([tf.constant(chi, dtype=tf.float64) for chi in chis], site=site)) - expected) < 1e-12
+
+
+@pytest.mark.parametrize('omegas', [[-3, 3], [-3, 0, 3], [-3, -1, 1, 3]], ids=['dimer', 'trimer', 'tetramer'])
+def test_batch_loss_matches_the_per_row_loss(omegas, make_const):
+    rng = np.random.default_rng(0)
+    chis = rng.uniform(-4, 4, (5, len(omegas)))
+    loss = Loss(make_const(omegas=omegas))
+    site = len(omegas) - 1
+    batched = loss.batch_loss(chis, site=site).numpy()
+    rows = [float(loss(list(row), site=site)) for row in chis]
+    np.testing.assert_allclose(batched, rows, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('engine', ['dense', 'tridiagonal', 'chebyshev'])
+def test_compare_gradients_agrees_with_finite_differences(engine, make_const):
+    # A shorter time span keeps the expansion of the chebyshev engine short
+    const = make_const(omegas=[-3, 3], max_t=5, timesteps=10)
+    loss = Loss(const, engine=engine)
+    chis, site = [-1.3, 2.1], 1
+    grads = loss.compareGradients(chis, site=site)
+
+    # Central differences of the loss
+    h = 1e-6
+    reference = []
+    for k in range(len(chis)):
+        up, down = list(chis), list(chis)
+        up[k] += h
+        down[k] -= h
+        reference.append((float(loss(up, site=site)) - float(loss(down, site=site))) / (2 * h))
+
+    np.testing.assert_allclose(grads['analytic'].numpy(), grads['autodiff'].numpy(), rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(grads['analytic'].numpy(), reference, rtol=1e-5, atol=1e-7)
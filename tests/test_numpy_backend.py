@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.HamiltonianLoss import Loss
+from tet.numpy_backend import NumpyLoss
+
+
+@pytest.mark.parametrize('changes, chis', [
+    ({}, [-1.3, 2.1]),
+    ({'max_N': 120}, [0.4, -0.7]),
+    ({'omegas': [-3, 0, 3]}, [-1.3, 0.5, 2.1]),
+], ids=['dimer', 'dimer_tridiagonal', 'trimer'])
+def test_numpy_loss_matches_the_tensorflow_loss(changes, chis, make_const):
+    const = make_const(**changes)
+    site = const['sites'] - 1
+    numpy_loss, numpy_grads = NumpyLoss(const).valueAndGrad(np.array(chis), site=site)
+
+    loss = Loss(const)
+    variables = tf.Variable(chis, dtype=tf.float64)
+    with tf.GradientTape() as t:
+        value = loss(variables, site=site)
+    grads = t.gradient(value, variables)
+
+    np.testing.assert_allclose(numpy_loss, value.numpy(), rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(numpy_grads, grads.numpy(), rtol=1e-6, atol=1e-8)
@@ -0,0 +1,108 @@
+import copy
+import importlib
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.constants import system_constants
+from tet.Optimizer import Optimizer, BatchOptimizer, mp_opt
+
+
+def _run(graph_loop, train_sites, init_chis, iterations):
+    opt = Optimizer(
+        const=copy.deepcopy(system_constants), target_site=1, Print=False, iterations=iterations,
+        train_sites=train_sites, opt=tf.keras.optimizers.Adam(learning_rate=0.1), graph_loop=graph_loop
+    )
+    return opt(*init_chis)
+
+
+@pytest.mark.parametrize('train_sites, init_chis, iterations', [
+    ([0, 1], [1., -2.], 60),
+    ([0], [0.5, -1.5], 45),
+    ([0, 1], [-3., 3.], 1000),
+], ids=['tet', 'one_site_iterations', 'tolerance'])
+def test_graph_loop_matches_the_eager_loop(train_sites, init_chis, iterations):
+    # The runs stop at TET, after all the iterations and on the tolerance rule
+    eager = _run(False, train_sites, init_chis, iterations)
+    graph = _run(True, train_sites, init_chis, iterations)
+
+    assert len(graph['loss']) == len(eager['loss'])
+    np.testing.assert_allclose(graph['loss'], eager['loss'], rtol=1e-10, atol=1e-12)
+    for graph_data, eager_data in zip(graph['var_data'], eager['var_data']):
+        np.testing.assert_allclose(graph_data, eager_data, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(graph['best_vars'], eager['best_vars'], rtol=1e-10, atol=1e-12)
+
+
+# ! Keras computes the Adam coefficients in float32, these are exact in float32 so that the trajectories of Optimizer
+# and of the float64 Adam of BatchOptimizer agree
+ADAM = dict(lr=0.125, beta_1=0.875, beta_2=1 - 2 ** -10)
+
+
+def test_batch_optimizer_matches_the_optimizer():
+    # The first row reaches TET at epoch 25, the others train for all the epochs
+    starts = np.array([[1., -2.], [0.5, -1.5], [-3., 3.]])
+    batch = BatchOptimizer(
+        const=copy.deepcopy(system_constants), target_site=1, iterations=30, train_sites=[0, 1], Print=False, **ADAM
+    ).train(starts)
+
+    epochs = []
+    for row, start in enumerate(starts):
+        opt = Optimizer(
+            const=copy.deepcopy(system_constants), target_site=1, Print=False, iterations=30, train_sites=[0, 1],
+            opt=tf.keras.optimizers.Adam(learning_rate=ADAM['lr'], beta_1=ADAM['beta_1'], beta_2=ADAM['beta_2'])
+        )
+        single = opt(*start)
+        epochs.append(len(single['loss']))
+        assert abs(batch['min_loss'][row] - min(single['loss'])) < 1e-6
+        np.testing.assert_allclose(batch['best_vars'][row], single['best_vars'], rtol=0, atol=1e-6)
+
+    # The converged row is not updated once it has stopped, the others are
+    assert batch['min_loss'][0] < 0.1 and epochs[0] < 30
+    assert list(np.sum(~np.isnan(batch['loss']), axis=0)) == epochs
+    assert np.all(np.isnan(batch['var_data'][-1, 0])) and not np.any(np.isnan(batch['var_data'][-1, 1:]))
+
+
+def test_reused_worker_optimizer_matches_fresh_ones(tmp_path, monkeypatch):
+    # The first job reaches TET and lowers the learning rate, the next jobs of the worker reuse its optimizer with
+    # other starts and learning rates
+    # tet.Optimizer is also the name of the class that the package exports
+    optimizer_module = importlib.import_module('tet.Optimizer')
+    monkeypatch.setattr(optimizer_module, '_worker_optimizers', {})
+    jobs = [([1., -2.], 0.1), ([0.5, -1.5], 0.2), ([1., -2.], 0.1)]
+    const = copy.deepcopy(system_constants)
+    rows = [
+        mp_opt(i, start, str(tmp_path), const, 1, 60, lr, 0.9, False, False, [0, 1])
+        for i, (start, lr) in enumerate(jobs)
+    ]
+    assert len(optimizer_module._worker_optimizers) == 1
+
+    for row, (start, lr) in zip(rows, jobs):
+        fresh = Optimizer(
+            const=copy.deepcopy(system_constants), target_site=1, Print=False, iterations=60, train_sites=[0, 1],
+            opt=tf.keras.optimizers.Adam(learning_rate=lr, beta_1=0.9, amsgrad=False)
+        )
+        results = fresh(*start)
+        np.testing.assert_allclose(row, [*results['best_vars'], np.min(results['loss'])], rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('omegas, max_N', [([-3, 3], 3), ([-3, 0, 3], 4), ([-3, 0, 3], 6)],
+                         ids=['dimer', 'trimer', 'trimer_6'])
+def test_jit_compiled_gradients_match_the_tape(omegas, max_N, make_const):
+    const = make_const(omegas=omegas, max_N=max_N)
+    site = len(omegas) - 1
+    eager, xla = (
+        Optimizer(const=const, target_site=site, Print=False, train_sites=list(range(len(omegas))), jit_compile=jit)
+        for jit in (False, True)
+    )
+    # The compiled function captures the variables, the following points are assigned to them
+    eager.vars = [tf.Variable(0., dtype=tf.float64) for _ in omegas]
+    xla.vars = [tf.Variable(0., dtype=tf.float64) for _ in omegas]
+    for chis in np.random.default_rng(0).uniform(-3, 3, (4, len(omegas))):
+        for var, eager_var, chi in zip(xla.vars, eager.vars, chis):
+            var.assign(chi)
+            eager_var.assign(chi)
+        (eager_grads, eager_loss), (xla_grads, xla_loss) = eager.get_grads(), xla.get_grads()
+        assert abs(float(xla_loss) - float(eager_loss)) < 1e-10
+        np.testing.assert_allclose([g.numpy() for g in xla_grads], [g.numpy() for g in eager_grads], rtol=0, atol=1e-7)
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from tet.data_process import RESULTS_FILE, ResultStore, readResults
+
+
+def _record(job, losses, points, sites=2):
+    rng = np.random.default_rng(job + 10 * losses)
+    return {
+        'job': job, 'loss': rng.uniform(0, 3, losses), 'init_chis': rng.uniform(-1, 1, sites),
+        'best_vars': rng.uniform(-1, 1, sites), 'trajectory': rng.uniform(-1, 1, (points, sites))
+    }
+
+
+def _assertRecord(entry, record):
+    for field in ('loss', 'init_chis', 'best_vars', 'trajectory'):
+        np.testing.assert_array_equal(entry[field], record[field])
+
+
+def test_result_store_round_trip(tmp_path):
+    path = str(tmp_path / RESULTS_FILE)
+    records = [_record(0, 5, 2), _record(1, 0, 0), _record(2, 7, 3)]
+    ResultStore(path, sites=2).write(records[:2])
+    ResultStore(path, sites=2).write(records[2:])
+
+    store = readResults(str(tmp_path))
+    assert len(store) == 3 and list(store.jobs) == [0, 1, 2] and 1 in store and 3 not in store
+    for record in records:
+        _assertRecord(store[record['job']], record)
+    np.testing.assert_array_equal(store.summary()[[0, 2], :2], [records[0]['best_vars'], records[2]['best_vars']])
+    np.testing.assert_array_equal(store.summary()[[0, 2], 2], [records[0]['loss'].min(), records[2]['loss'].min()])
+    assert np.isnan(store.summary()[1, 2])
+
+    # A job written again keeps its last chunk, and a store that is open sees the appended chunks
+    again = _record(0, 4, 1)
+    ResultStore(path).write([again])
+    assert len(store) == 3
+    _assertRecord(store[0], again)
+
+
+def test_truncate_cuts_an_incomplete_chunk(tmp_path):
+    path = str(tmp_path / RESULTS_FILE)
+    records = [_record(0, 5, 2), _record(1, 6, 2)]
+    ResultStore(path, sites=2).write(records)
+    whole = os.path.getsize(path)
+
+    # An interrupted write leaves a part of the chunk of job 2
+    ResultStore(path).write([_record(2, 5, 2)])
+    os.truncate(path, whole + 30)
+    store = ResultStore(path)
+    assert list(store.jobs) == [0, 1]
+
+    store.truncate()
+    assert os.path.getsize(path) == whole
+    ResultStore(path).write([_record(2, 3, 1)])
+    assert list(store.jobs) == [0, 1, 2]
+    _assertRecord(store[2], _record(2, 3, 1))
+    _assertRecord(store[1], records[1])
+
+
+def test_result_store_checks_its_header(tmp_path):
+    path = str(tmp_path / RESULTS_FILE)
+    ResultStore(path, sites=2).write([_record(0, 1, 1)])
+    with pytest.raises(ValueError):
+        ResultStore(path, sites=3)
+    with pytest.raises(OSError):
+        readResults(str(tmp_path / 'missing'))
+
+    other = tmp_path / 'other.dat'
+    other.write_bytes(b'NOTASTORE' * 4)
+    with pytest.raises(ValueError):
+        ResultStore(str(other))
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from tet import sampling
+from tet.sampling import latinHypercubeSamples, samplers, sampleCombinations
+from tet.solver_mp import getCombinations
+
+LIMITS = {'x0lims': [-4, 2], 'x1lims': [0, 5], 'x2lims': [-1, 1]}
+
+
+@pytest.mark.parametrize('method', list(samplers))
+@pytest.mark.parametrize('samples', [1, 7, 64, 100])
+def test_samplers_draw_the_number_of_samples_within_the_limits(method, samples):
+    np.random.seed(0)
+    combinations = np.array(getCombinations(LIMITS, train_sites=[0, 1, 2], method=method, samples=samples))
+    limits = np.array(list(LIMITS.values()))
+    assert combinations.shape == (samples, 3)
+    assert np.all(combinations >= limits[:, 0]) and np.all(combinations <= limits[:, 1])
+
+
+@pytest.mark.parametrize('method', list(samplers))
+def test_samplers_default_to_the_size_of_the_grid(method):
+    combinations = getCombinations(LIMITS, train_sites=[0, 1, 2], method=method, grid=3)
+    assert len(combinations) == 27
+
+
+@pytest.mark.parametrize('method', list(samplers))
+def test_samplers_are_reproducible_with_a_seed(method):
+    draws = []
+    for seed in (1, 1, 2):
+        np.random.seed(seed)
+        draws.append(np.array(getCombinations(LIMITS, train_sites=[0, 1, 2], method=method, samples=20)))
+    np.testing.assert_array_equal(draws[0], draws[1])
+    assert not np.array_equal(draws[0], draws[2])
+
+
+def test_halton_fallback_without_scipy(monkeypatch):
+    monkeypatch.setattr(sampling, 'qmc', None)
+    np.random.seed(0)
+    combinations = np.array(sampleCombinations(list(LIMITS.values()), 50, method='sobol'))
+    limits = np.array(list(LIMITS.values()))
+    assert combinations.shape == (50, 3)
+    assert np.all(combinations >= limits[:, 0]) and np.all(combinations <= limits[:, 1])
+    assert len(np.unique(combinations, axis=0)) == 50
+
+
+def test_latin_hypercube_fills_every_stratum():
+    np.random.seed(0)
+    samples = latinHypercubeSamples(30, 4)
+    for axis in samples.T:
+        np.testing.assert_array_equal(np.sort(np.floor(axis * 30)), np.arange(30))
@@ -0,0 +1,34 @@
+import copy
+from multiprocessing import shared_memory
+
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.constants import system_constants
+from tet.HamiltonianLoss import Loss
+from tet.solver_mp import WorkerPool
+
+
+def _attachedLoss(handles, const, chis):
+    # Runs in a spawned worker
+    from tet.HamiltonianLoss import _attached_blocks, attachOperators
+    attachOperators(handles)
+    return float(Loss(const)(chis, site=1)), len(_attached_blocks)
+
+
+def test_workers_attach_to_the_shared_operators():
+    const = copy.deepcopy(system_constants)
+    const['max_N'] = 7
+    chis = [-1.3, 2.1]
+    with WorkerPool(1) as pool:
+        handles = pool.share(const)
+        value, attached = pool.pool.apply(_attachedLoss, (handles, const, chis))
+    assert attached == sum(isinstance(handle, tuple) for handle in handles['arrays'].values())
+    assert value == float(Loss(const)(chis, site=1))
+
+    # Closing the pool releases the blocks
+    for handle in handles['arrays'].values():
+        if isinstance(handle, tuple):
+            with pytest.raises(FileNotFoundError):
+                shared_memory.SharedMemory(name=handle[0])
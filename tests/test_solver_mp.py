@@ -0,0 +1,160 @@
+import copy
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from tet.constants import system_constants
+from tet.data_process import readCheckpoint, readResults
+from tet.solver_mp import solver_mp, WorkerPool
+
+
+@pytest.mark.parametrize('overlap', [0, -0.5, 1.5])
+def test_overlap_must_be_a_fraction(overlap, tmp_path):
+    with pytest.raises(ValueError):
+        solver_mp(
+            {'x0lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path), backend='numpy',
+            overlap=overlap
+        )
+
+
+def test_grid_method_does_not_overlap(tmp_path):
+    with pytest.raises(ValueError):
+        solver_mp(
+            {'x0lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path), backend='numpy',
+            method='grid', overlap=0.5
+        )
+
+
+@pytest.mark.parametrize('options', [{'rungs': 0}, {'rungs': 1.5}, {'eta': 0}, {'eta': 1}, {'eta': 2.5}])
+def test_halving_parameters_are_validated(options, tmp_path):
+    with pytest.raises(ValueError):
+        solver_mp(
+            {'x0lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path), backend='numpy',
+            search='halving', **options
+        )
+
+
+@pytest.mark.parametrize('options', [
+    {'cache': True}, {'cache_path': 'cache'}, {'jit_compile': True}, {'graph_loop': True}
+])
+def test_numpy_backend_rejects_tensorflow_options(options, tmp_path):
+    with pytest.raises(ValueError):
+        solver_mp(
+            {'x0lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path), backend='numpy', **options
+        )
+
+
+# ! A run whose collection of results is interrupted as by a Ctrl-C: the workers get the SIGINT too, and the parent a
+# KeyboardInterrupt, after `returned` results or, with returned=0, once the jobs have had time to start
+INTERRUPTED_RUN = '''
+import copy, importlib, os, signal, sys, time
+from tet.constants import system_constants
+
+def interrupted(self, tag, fraction=1.):
+    for _ in range({returned}):
+        self.next()
+    if {returned} == 0:
+        time.sleep(3)
+    for worker in self.pool.pool._pool:
+        os.kill(worker.pid, signal.SIGINT)
+    raise KeyboardInterrupt
+
+# tet.solver_mp is also the name of the function that the package exports
+module = importlib.import_module('tet.solver_mp')
+module.JobStream.collect = interrupted
+try:
+    module.solver_mp({{'x0lims': [-1, 1], 'x1lims': [-1, 1]}}, copy.deepcopy(system_constants), **{options})
+except KeyboardInterrupt:
+    sys.exit(0)
+sys.exit(1)
+'''
+
+RUN_OPTIONS = dict(method='grid', grid=2, backend='numpy', write_data=True, cpu_count=1)
+
+
+def _interruptedRun(data_path, returned, **options):
+    options = {**RUN_OPTIONS, 'data_path': str(data_path), **options}
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    # A hung parent is killed by the timeout, which fails the test
+    return subprocess.run(
+        [sys.executable, '-c', INTERRUPTED_RUN.format(returned=returned, options=options)],
+        env={**os.environ, 'PYTHONPATH': src}, capture_output=True, text=True, timeout=120
+    )
+
+
+def test_interrupted_run_returns(tmp_path):
+    # The jobs are still running when the workers get the SIGINT, so they are lost
+    result = _interruptedRun(tmp_path, returned=0, epochs_grid=10 ** 6, cpu_count=2)
+    assert result.returncode == 0, result.stderr
+    assert readCheckpoint(str(tmp_path))['rounds'][0]['jobs'] == []
+
+
+def test_resume_from_a_checkpoint_written_mid_iteration(tmp_path):
+    # Too few epochs to reach TET, which would cancel the remaining jobs
+    result = _interruptedRun(tmp_path, returned=1, epochs_grid=5)
+    assert result.returncode == 0, result.stderr
+    state = readCheckpoint(str(tmp_path))
+    assert not state['finished'] and state['iteration'] == 0 and len(state['rounds'][0]['jobs']) == 1
+
+    solver_mp(
+        {'x0lims': [-1, 1], 'x1lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path),
+        epochs_grid=5, resume=True, **RUN_OPTIONS
+    )
+    assert readCheckpoint(str(tmp_path))['finished']
+
+    # Every job of the iteration is in its result store once, the finished job was not run again
+    store = readResults(os.path.join(str(tmp_path), 'iteration_0'))
+    assert list(store.jobs) == [0, 1, 2, 3]
+    chunks = sum(24 + 8 * (len(store[job]['loss']) + 2 * 2 + 2 * len(store[job]['trajectory'])) for job in store.jobs)
+    assert os.path.getsize(store.path) == 16 + chunks
+
+
+def test_halving_rounds_and_proxy_losses(tmp_path):
+    # A finer time grid than the real system's makes the proxy losses lower, one of its optimizers even reaches TET
+    const = {**copy.deepcopy(system_constants), 'timesteps': 5}
+    result = solver_mp(
+        {'x0lims': [-2, 2], 'x1lims': [-2, 2]}, const, method='grid', grid=4, epochs_grid=8, search='halving',
+        rungs=2, eta=2, proxy_timesteps=500, backend='numpy', write_data=True, cpu_count=1, data_path=str(tmp_path)
+    )
+    store = readResults(os.path.join(str(tmp_path), 'iteration_0'))
+    proxy, real = [store[job] for job in range(16)], [store[job] for job in range(16, 24)]
+
+    # The second round continues the best half of the first one, with the job ids after the first round's, and
+    # trains for eta times more epochs
+    assert sorted(store.jobs) == list(range(24))
+    assert all(len(record['loss']) <= 4 for record in proxy) and all(len(record['loss']) == 8 for record in real)
+    best = np.argsort([min(record['loss']) for record in proxy])[:8]
+    np.testing.assert_allclose(
+        sorted(map(tuple, (record['init_chis'] for record in real))),
+        sorted(map(tuple, (proxy[job]['best_vars'] for job in best)))
+    )
+
+    # TET on the proxy neither stops the search nor becomes the result, and the proxy round stays out of the history
+    assert min(min(record['loss']) for record in proxy) <= 0.1
+    assert result['min_n'] == min(min(record['loss']) for record in real)
+    assert len(readCheckpoint(str(tmp_path))['history_y']) == 8
+
+
+def test_shared_pool_serves_two_runs(tmp_path):
+    pytest.importorskip('tensorflow')
+    trimer = {**copy.deepcopy(system_constants), 'omegas': [-3, 0, 3], 'chis': [0, 0, 0], 'sites': 3, 'max_N': 2}
+    options = dict(method='grid', grid=2, epochs_grid=20, cpu_count=1)
+
+    # The second run reuses the workers, with the optimizers and the shared operators of another system in them
+    with WorkerPool(1) as pool:
+        solver_mp(
+            {'x0lims': [-1, 1], 'x1lims': [-1, 1]}, copy.deepcopy(system_constants), data_path=str(tmp_path / 'dimer'),
+            pool=pool, **options
+        )
+        shared = solver_mp(
+            {'x0lims': [-2, 2], 'x1lims': [-2, 2]}, copy.deepcopy(trimer), data_path=str(tmp_path / 'shared'),
+            target_site=2, pool=pool, **options
+        )
+    fresh = solver_mp(
+        {'x0lims': [-2, 2], 'x1lims': [-2, 2]}, copy.deepcopy(trimer), data_path=str(tmp_path / 'fresh'),
+        target_site=2, **options
+    )
+    assert shared['min_n'] == fresh['min_n'] and shared['chis'] == fresh['chis']
@@ -0,0 +1,56 @@
+import numpy as np
+
+from tet.surrogate import LENGTH_SCALES, MAX_HISTORY, MIN_TRUST_LENGTH, proposeCombinations, updateTrustRegion
+
+
+def _history(h, d=3):
+    x = np.random.uniform(-5, 5, (h, d))
+    return x, np.sum((x - 1) ** 2, axis=1)
+
+
+def test_proposals_are_distinct_and_within_limits():
+    np.random.seed(0)
+    x, y = _history(100)
+    limits = [[-2, 4], [-5, 5], [0, 3]]
+    proposals = np.array(proposeCombinations(x, y, limits, n=27))
+    assert proposals.shape == (27, 3)
+    assert np.all(proposals >= np.array(limits)[:, 0]) and np.all(proposals <= np.array(limits)[:, 1])
+    assert len(np.unique(proposals, axis=0)) == 27
+
+
+def test_proposals_stay_in_the_trust_region():
+    np.random.seed(0)
+    x, y = _history(100)
+    # A region at the edge of the limits is shifted inside them, its side stays 0.25 * 10
+    proposals = np.array(proposeCombinations(x, y, [[-5, 5]] * 3, n=10, trust_region=([4.5, 0, 0], 0.25)))
+    assert np.all(proposals[:, 0] >= 2.5) and np.all(proposals[:, 0] <= 5)
+    assert np.all(np.abs(proposals[:, 1:]) <= 1.25)
+
+
+def test_trust_region_follows_the_incumbent():
+    history_y = np.array([2., 1.])
+    # Improvement: centred on the new best parameters, twice as large
+    assert updateTrustRegion(([0, 0], 0.25), np.array([1., 2.]), 0.5, history_y) == ([1., 2.], 0.5)
+    # No improvement: same centre, half as large, and the whole limits again once it gets too small
+    assert updateTrustRegion(([0, 0], 0.25), np.array([1., 2.]), 1.5, history_y) == ([0, 0], 0.125)
+    assert updateTrustRegion(([0, 0], MIN_TRUST_LENGTH), np.array([1., 2.]), 1.5, history_y) == ([0, 0], 1.)
+    # The first iteration centres the region on its best parameters, as large as the limits
+    assert updateTrustRegion(None, np.array([1., 2.]), 1.5, np.zeros(0)) == ([1., 2.], 1.)
+
+
+def test_large_batch_is_fitted_once(monkeypatch):
+    # A refit per proposed point took minutes for this size, the batch must factorize the kernel matrix once per
+    # candidate length scale, on at most MAX_HISTORY points of the history
+    sizes = []
+    cholesky = np.linalg.cholesky
+
+    def countedCholesky(a):
+        sizes.append(len(a))
+        return cholesky(a)
+
+    monkeypatch.setattr(np.linalg, 'cholesky', countedCholesky)
+    np.random.seed(0)
+    x, y = _history(2000)
+    proposals = proposeCombinations(x, y, [[-5, 5]] * 3, n=1000)
+    assert len(proposals) == 1000 and len(np.unique(proposals, axis=0)) == 1000
+    assert len(sizes) == len(LENGTH_SCALES) and max(sizes) <= MAX_HISTORY
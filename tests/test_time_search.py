@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from tet.HamiltonianLoss import Loss
+from tet.Optimizer import Optimizer, BatchOptimizer
+from tet.solver_mp import solver_mp
+
+
+def test_optimizers_pass_the_time_search_to_the_loss(make_const):
+    const = make_const()
+    assert Optimizer(const=const, target_site=1, time_search='refine').loss.time_search == 'refine'
+    assert BatchOptimizer(const=const, target_site=1, time_search='refine').loss.time_search == 'refine'
+
+
+def test_refine_is_rejected_where_it_is_not_supported(tmp_path, make_const):
+    const = make_const()
+    with pytest.raises(ValueError):
+        Optimizer(const=const, target_site=1, jit_compile=True, time_search='refine')
+    for options in ({'backend': 'numpy'}, {'jit_compile': True}):
+        with pytest.raises(ValueError):
+            solver_mp({'x0lims': [-1, 1]}, const, data_path=str(tmp_path), time_search='refine', **options)
+
+
+# The dimer with more bosons has many peaks of almost the same height
+SYSTEMS = [([-3, 3], 3), ([-3, 3], 8), ([-3, 0, 3], 4)]
+
+
+@pytest.mark.parametrize('omegas, max_N', SYSTEMS, ids=['dimer', 'dimer_8', 'trimer'])
+@pytest.mark.parametrize('site', ['acceptor', 'donor'])
+def test_refine_matches_a_dense_grid(omegas, max_N, site, make_const):
+    const = make_const(omegas=omegas, max_N=max_N)
+    site = const['sites'] - 1 if site == 'acceptor' else 0
+    refine = Loss(const, time_search='refine')
+    dense = Loss({**const, 'timesteps': 200001})
+    for chis in np.random.default_rng(0).uniform(-4, 4, (6, const['sites'])):
+        value, reference = float(refine(list(chis), site=site)), float(dense(list(chis), site=site))
+        # The dense grid misses the extremum by up to about 1e-8, refine must not miss it by more than 1e-9
+        assert -1e-7 < value - reference < 1e-9
+
+
+@pytest.mark.parametrize('omegas, max_N', SYSTEMS, ids=['dimer', 'dimer_8', 'trimer'])
+def test_batched_refine_matches_the_per_row_refine(omegas, max_N, make_const):
+    const = make_const(omegas=omegas, max_N=max_N)
+    loss = Loss(const, time_search='refine')
+    chis = np.random.default_rng(1).uniform(-4, 4, (8, const['sites']))
+    for site in (0, const['sites'] - 1):
+        rows = [float(loss(list(row), site=site)) for row in chis]
+        np.testing.assert_allclose(loss.batch_loss(chis, site=site).numpy(), rows, rtol=0, atol=1e-10)